@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+
+#  (C) Copyright Wieger Wesselink 2024. Distributed under the GPL-3.0-or-later
+#  Software License, (See accompanying file LICENSE or copy at
+#  https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import argparse
+import asyncio
+import copy
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import simulate_game
+from competitive_sudoku.clock import Clock, TimeControl, parse_time_control
+from competitive_sudoku.execute import solve_sudoku_async
+from competitive_sudoku.gamelog import render_move_diff
+from competitive_sudoku.player_host import encode_game_state
+from competitive_sudoku.records import VERDICT_ACCEPTED, VERDICT_TABOO, VERDICT_TABOO_PLAYED, VERDICT_INVALID, \
+    VERDICT_ILLEGAL, VERDICT_NO_MOVE, VERDICT_CANNOT_MOVE, VERDICT_TIME_FORFEIT
+from competitive_sudoku.sudoku import GameState, Move, SudokuBoard, TabooMove, allowed_squares, parse_properties
+from play_match import print_score
+from simulate_game import GameResult, load_game_state, oracle_input, oracle_verdict
+
+
+class PlayerHost(object):
+    """
+    A SudokuAI that runs in a player host subprocess (see competitive_sudoku/player_host.py), and that is controlled
+    through non-blocking pipes.
+    """
+
+    def __init__(self, name: str, player_number: int):
+        """
+        @param name: The module name of the player.
+        @param player_number: The player number (1 or 2).
+        """
+        self.name = name
+        self.player_number = player_number
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.messages: asyncio.Queue = asyncio.Queue()
+        self.reader: Optional[asyncio.Task] = None
+        self.compute_id = 0
+
+    async def start(self, directory: str, verbose: bool = False) -> None:
+        """
+        Starts the host process.
+        @param directory: The working directory of the host, in which the save files of the player are stored.
+        @param verbose: Show the output of the player.
+        """
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(os.path.abspath(path) for path in sys.path if path)
+        self.process = await asyncio.create_subprocess_exec(sys.executable, '-m', 'competitive_sudoku.player_host',
+                                                            self.name, str(self.player_number),
+                                                            os.path.abspath(simulate_game.SUDOKU_SOLVER),
+                                                            stdin=asyncio.subprocess.PIPE,
+                                                            stdout=asyncio.subprocess.PIPE,
+                                                            stderr=None if verbose else asyncio.subprocess.DEVNULL,
+                                                            cwd=directory,
+                                                            env=env)
+        self.reader = asyncio.create_task(self._read_messages())
+        if await self._receive('ready') is None:
+            raise RuntimeError(f'The player host of {self.name} did not start')
+
+    async def _read_messages(self) -> None:
+        async for line in self.process.stdout:
+            await self.messages.put(json.loads(line))
+        await self.messages.put(None)
+
+    async def _send(self, message: Dict[str, Any]) -> None:
+        self.process.stdin.write((json.dumps(message) + '\n').encode())
+        await self.process.stdin.drain()
+
+    async def _receive(self, message_type: str, compute_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        Waits for a message of the given type. Returns None if the host has stopped.
+        """
+        while True:
+            message = await self.messages.get()
+            if message is None:
+                self.messages.put_nowait(None)
+                return None
+            if message['type'] == message_type and (compute_id is None or message['id'] == compute_id):
+                return message
+
+    async def prepare(self, game_state: GameState) -> None:
+        """
+        Lets the player build its static data in the host process, see SudokuAI.prepare.
+        """
+        self.compute_id += 1
+        try:
+            await self._send({'type': 'prepare', 'id': self.compute_id, 'state': encode_game_state(game_state)})
+        except (BrokenPipeError, ConnectionResetError):
+            return
+        await self._receive('prepared', self.compute_id)
+
+    async def compute_move(self, game_state: GameState, calculation_time: float, clock: Optional[Clock] = None) -> Tuple[int, int, int]:
+        """
+        Lets the player compute a move. Without a clock the player gets calculation_time seconds, with a clock the
+        turn ends when compute_best_move returns or the time of the player runs out.
+        @return: The last proposed move as a tuple (i, j, value), which is (0, 0, 0) if no move was proposed.
+        """
+        self.compute_id += 1
+        message = {'type': 'compute', 'id': self.compute_id, 'state': encode_game_state(game_state), 'time': calculation_time}
+        if clock:
+            message['time_remaining'] = clock.remaining_time(self.player_number)
+            message['time_increment'] = clock.time_control.increment
+        try:
+            await self._send(message)
+            if clock:
+                try:
+                    await asyncio.wait_for(self._receive('returned', self.compute_id), clock.remaining_time(self.player_number))
+                except asyncio.TimeoutError:
+                    pass
+            else:
+                await asyncio.sleep(calculation_time)
+            await self._send({'type': 'stop', 'id': self.compute_id})
+        except (BrokenPipeError, ConnectionResetError):
+            return 0, 0, 0
+        reply = await self._receive('move', self.compute_id)
+        return (0, 0, 0) if reply is None else tuple(reply['move'])
+
+    async def close(self) -> None:
+        if self.process is None:
+            return
+        try:
+            await self._send({'type': 'quit'})
+            await asyncio.wait_for(self.process.wait(), 5.0)
+        except (BrokenPipeError, ConnectionResetError, asyncio.TimeoutError):
+            self.process.kill()
+            await self.process.wait()
+        if self.reader:
+            self.reader.cancel()
+
+
+async def play_game(game_state: GameState,
+                    name1: str,
+                    name2: str,
+                    calculation_time: float,
+                    directory: str,
+                    playmode: str = 'rows',
+                    time_control: Optional[TimeControl] = None,
+                    verbose: bool = False,
+                    label: str = ''
+                   ) -> Tuple[GameResult, str]:
+    """
+    Plays a game between two players that run in player host processes. The rules are the same as in
+    simulate_game.simulate_game; pondering and warm-up are not supported.
+    @param game_state: The start position.
+    @param name1: The module name of the first player.
+    @param name2: The module name of the second player.
+    @param calculation_time: The amount of time in seconds for computing a move.
+    @param directory: The working directory of the players.
+    @param playmode: The playing mode (classic, rows, border, random).
+    @param time_control: If set, each player gets a bank of time for the whole game instead of a fixed time per move.
+    @param verbose: Print one line per move, prefixed by label.
+    @param label: A prefix for the output of the game.
+    @return: The result of the game and the reason why it ended.
+    """
+    players = {1: PlayerHost(name1, 1), 2: PlayerHost(name2, 2)}
+    clock = Clock(time_control) if time_control else None
+    move_number = 0
+    number_of_moves = game_state.board.squares.count(SudokuBoard.empty)
+    finished_players = set()
+
+    def log(player_number: int, move: Optional[Move], verdict: str, reward: int) -> None:
+        if verbose:
+            print(f'{label}{render_move_diff(game_state, player_number, move, verdict, reward)}')
+
+    def loss(player_number: int) -> GameResult:
+        return (0, 1) if player_number == 1 else (1, 0)
+
+    try:
+        await asyncio.gather(*(player.start(directory, verbose) for player in players.values()))
+        await asyncio.gather(*(player.prepare(game_state) for player in players.values()))
+        while move_number < number_of_moves and len(finished_players) < 2:
+            player_number = game_state.current_player
+            player_squares = None if playmode == 'classic' else game_state.player_squares()
+            if player_squares == []:
+                log(player_number, None, VERDICT_CANNOT_MOVE, 0)
+                finished_players.add(player_number)
+                game_state.current_player = 3 - game_state.current_player
+                continue
+
+            loop = asyncio.get_running_loop()
+            start_time = loop.time()
+            i, j, value = await players[player_number].compute_move(game_state, calculation_time, clock)
+            elapsed = loop.time() - start_time
+            # when the bank runs out the proposed move is played, like at the end of a turn without a clock
+            bank_exhausted = clock is not None and clock.is_exhausted(player_number, elapsed)
+            if clock and (not clock.punch(player_number, elapsed) or (bank_exhausted and (i, j, value) == (0, 0, 0))):
+                log(player_number, None, VERDICT_TIME_FORFEIT, 0)
+                return loss(player_number), 'time forfeit'
+            if (i, j, value) == (0, 0, 0):
+                log(player_number, None, VERDICT_NO_MOVE, 0)
+                return loss(player_number), 'no move'
+            square = (i, j)
+            move = Move(square, value)
+            if TabooMove(square, value) in game_state.taboo_moves:
+                log(player_number, move, VERDICT_TABOO_PLAYED, 0)
+                return loss(player_number), 'taboo move'
+            output = await solve_sudoku_async(simulate_game.SUDOKU_SOLVER, *oracle_input(game_state, move, player_squares))
+            verdict, reward = oracle_verdict(output)
+            if verdict == VERDICT_INVALID:
+                log(player_number, move, verdict, 0)
+                return loss(player_number), 'invalid move'
+            if verdict == VERDICT_ILLEGAL:
+                log(player_number, move, verdict, 0)
+                return loss(player_number), 'illegal move'
+            if verdict == VERDICT_TABOO:
+                game_state.moves.append(TabooMove(square, value))
+                game_state.taboo_moves.append(TabooMove(square, value))
+            if verdict == VERDICT_ACCEPTED:
+                game_state.board.put(square, value)
+                game_state.moves.append(move)
+                if playmode != 'classic':
+                    game_state.occupied_squares().append(square)
+                move_number = move_number + 1
+            game_state.scores[player_number - 1] += reward
+            log(player_number, move, verdict, reward)
+            game_state.current_player = 3 - game_state.current_player
+    finally:
+        await asyncio.gather(*(player.close() for player in players.values()))
+
+    score1, score2 = game_state.scores
+    return ((1, 0) if score1 > score2 else (0.5, 0.5) if score1 == score2 else (0, 1)), 'finished'
+
+
+async def play_games(pairs: List[Tuple[str, str]],
+                     board_file: Optional[str],
+                     calculation_time: float,
+                     playmode: str = 'rows',
+                     time_control: Optional[TimeControl] = None,
+                     concurrency: int = 16,
+                     verbose: bool = False
+                    ) -> List[GameResult]:
+    """
+    Plays a list of games on the same start position, with at most concurrency games in flight at the same time.
+    @param pairs: The module names of the first and the second player of every game.
+    @param board_file: A text file containing the start position.
+    @param calculation_time: The amount of time in seconds for computing a move.
+    @param playmode: The playing mode (classic, rows, border, random).
+    @param time_control: If set, the games are played with a clock instead of a fixed time per move.
+    @param concurrency: The maximum number of simultaneous games.
+    @param verbose: Print one line per move.
+    @return: The results of the games, in the order of pairs.
+    """
+    start_position = load_game_state(board_file, playmode)
+    # in random mode, the allowed squares are drawn again for every game, unless they are given in the file
+    properties = parse_properties(Path(board_file).read_text()) if board_file else {}
+    random_squares = playmode == 'random' and 'allowed-squares1' not in properties
+    semaphore = asyncio.Semaphore(concurrency)
+
+    with tempfile.TemporaryDirectory(prefix='sudoku_referee_') as root:
+        async def run(game_number: int, first: str, second: str) -> GameResult:
+            async with semaphore:
+                game_state = copy.deepcopy(start_position)
+                if random_squares:
+                    game_state.allowed_squares1, game_state.allowed_squares2 = allowed_squares(game_state.board, 'random')
+                directory = tempfile.mkdtemp(prefix=f'game{game_number}_', dir=root)
+                result, reason = await play_game(game_state, first, second, calculation_time, directory, playmode,
+                                                 time_control, verbose, f'[game {game_number}] ')
+                print(f'Game {game_number}: {first} - {second} {print_score(result[0])}-{print_score(result[1])} ({reason})')
+                return result
+
+        return await asyncio.gather(*(run(k, first, second) for k, (first, second) in enumerate(pairs, 1)))
+
+
+def main():
+    cmdline_parser = argparse.ArgumentParser(description='Play many games between two sudoku players concurrently in a single referee process.')
+    cmdline_parser.add_argument('first', help="The module name of the first player's SudokuAI class (default: random_player)", default='random_player', nargs='?')
+    cmdline_parser.add_argument('second', help="The module name of the second player's SudokuAI class (default: random_player)", default='random_player', nargs='?')
+    cmdline_parser.add_argument('--count', type=int, default=20, help='The number of games; the players alternate colours (default: 20)')
+    cmdline_parser.add_argument('--concurrency', type=int, default=16, help='The maximum number of simultaneous games (default: 16)')
+    cmdline_parser.add_argument('--board', type=str, default='boards/empty-2x2.txt', help='The text file containing the start position (default: boards/empty-2x2.txt)')
+    cmdline_parser.add_argument('--time', type=float, default=0.5, help="The time (in seconds) for computing a move (default: 0.5)")
+    cmdline_parser.add_argument('--clock', metavar='TOTAL[+INCREMENT]', type=parse_time_control, help="Use a bank of TOTAL seconds per player, plus INCREMENT seconds per move, instead of a fixed time per move")
+    cmdline_parser.add_argument('--playmode', type=str, choices=['classic', 'rows', 'border', 'random'], default='rows', help='The playing mode (default: rows)')
+    cmdline_parser.add_argument('--verbose', help='Print one line per move, and the output of the players', action='store_true')
+    args = cmdline_parser.parse_args()
+
+    pairs = [(args.first, args.second) if k % 2 == 0 else (args.second, args.first) for k in range(args.count)]
+    results = asyncio.run(play_games(pairs, args.board, args.time, args.playmode, args.clock, args.concurrency, args.verbose))
+    first_score = sum(result[k % 2] for k, result in enumerate(results))
+    print(f'Match result: {args.first} - {args.second} {print_score(first_score)}-{print_score(args.count - first_score)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -170,14 +170,16 @@ class ValidEntryFinder:
         self.board = game_state.board
         self.taboo_moves = game_state.taboo_moves
 
-        # get all occupied squares
-        self.occupied_squares = set(game_state.occupied_squares1) | set(game_state.occupied_squares2)
+        # get the occupied squares; membership of the views of GameState takes constant time
+        occupied_squares1 = game_state.occupied_squares1
+        occupied_squares2 = game_state.occupied_squares2
 
         # get the allowed squares attributes for the correct player and exclude the occupied squares
         # self.allowed_squares = (
         #     set(game_state.allowed_squares1) if game_state.current_player == 1 else set(game_state.allowed_squares2)
         # ) - self.occupied_squares
-        self.allowed_squares = set(game_state.player_squares()) - self.occupied_squares
+        self.allowed_squares = set(square for square in game_state.player_squares()
+                                   if square not in occupied_squares1 and square not in occupied_squares2)
 
         # initialize board size # ! can maybe be optimized by using SudokuBoard class methods
         self.size = self.board.n * self.board.m
@@ -0,0 +1,69 @@
+#  (C) Copyright Wieger Wesselink 2024. Distributed under the GPL-3.0-or-later
+#  Software License, (See accompanying file LICENSE or copy at
+#  https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import multiprocessing
+from typing import Iterator, List, Optional
+
+# The layout of the shared array: a sequence number, followed by two buffers of a move (i, j, value)
+_SEQUENCE = 0
+_BUFFERS = (1, 4)
+_SIZE = 7
+
+
+class BestMoveSlot(object):
+    """
+    The best move of a player in shared memory, that is written by a single player process without a lock. A move
+    is written to the buffer that is not in use, after which the sequence number is incremented to publish it. The
+    sequence number is a single integer, so a reader always sees a complete move, even if the writer is killed
+    halfway a write. A reader retries if the writer published twice while it was reading.
+    The slot behaves like the list [i, j, value] that SudokuAI.best_move used to be. Assignments to the fields of
+    the move, as in SudokuAI.propose_move, are collected in the writing process, and the move is published when
+    its value is assigned.
+    """
+
+    def __init__(self):
+        self.values = multiprocessing.RawArray('i', _SIZE)
+        self.staged: Optional[List[int]] = None  # the move of which the value has not been assigned yet
+
+    def publish(self, i: int, j: int, value: int) -> None:
+        """
+        Writes a move. This must only be called by one process at a time.
+        """
+        self.staged = None
+        values = self.values
+        sequence = values[_SEQUENCE]
+        start = _BUFFERS[(sequence + 1) % 2]
+        values[start] = i
+        values[start + 1] = j
+        values[start + 2] = value
+        values[_SEQUENCE] = sequence + 1
+
+    def read(self) -> List[int]:
+        """
+        Returns the last published move as a list [i, j, value].
+        """
+        values = self.values
+        while True:
+            sequence = values[_SEQUENCE]
+            start = _BUFFERS[sequence % 2]
+            move = values[start:start + 3]
+            if values[_SEQUENCE] == sequence:
+                return move
+
+    def __getitem__(self, index):
+        return self.read()[index]
+
+    def __setitem__(self, index: int, value: int) -> None:
+        if self.staged is None:
+            self.staged = self.read()
+        self.staged[index] = value
+        if index % 3 == 2:
+            move, self.staged = self.staged, None
+            self.publish(*move)
+
+    def __len__(self) -> int:
+        return 3
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.read())
@@ -0,0 +1,76 @@
+#  (C) Copyright Wieger Wesselink 2024. Distributed under the GPL-3.0-or-later
+#  Software License, (See accompanying file LICENSE or copy at
+#  https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import json
+import os
+from typing import Any, Dict, Optional
+
+from competitive_sudoku.records import read_records
+
+
+class Checkpoint(object):
+    """
+    An append-only JSON lines file with the results of completed games. Every line contains a JSON object with a
+    field 'key' that identifies a game in the schedule of a match or tournament, and a field 'result'. Lines are
+    synced to disk as soon as they are written, such that an interrupted run can be resumed without replaying the
+    games that were completed.
+    """
+
+    def __init__(self, path: str, resume: bool = False, restart: bool = False):
+        """
+        @param path: The name of the checkpoint file.
+        @param resume: If True, the results in an existing checkpoint file are kept.
+        @param restart: If True, an existing checkpoint file is truncated. If neither resume nor restart is set, a
+         FileExistsError is raised if the checkpoint file contains results, such that the results of an interrupted
+         run are not lost by accident.
+        """
+        self.path = path
+        self.results: Dict[str, Any] = {}
+        cut_off = False
+        exists = os.path.isfile(path) and os.path.getsize(path) > 0
+        if exists and not resume and not restart:
+            raise FileExistsError(f'The checkpoint file {path} contains the results of an earlier run. Use --resume to '
+                                  f'continue it, or --restart to discard it.')
+        if resume and exists:
+            for entry in read_records(path):
+                self.results[entry['key']] = entry['result']
+            with open(path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                cut_off = f.read(1) != b'\n'
+        self.file = open(path, 'a' if resume else 'w', encoding='utf-8')
+        if cut_off:
+            # terminate a line that was cut off by an interrupted run
+            self.file.write('\n')
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.results
+
+    def __len__(self) -> int:
+        return len(self.results)
+
+    def result(self, key: str) -> Optional[Any]:
+        """
+        Returns the result of a completed game, or None if the game was not completed.
+        """
+        return self.results.get(key)
+
+    def add(self, key: str, result: Any) -> None:
+        """
+        Stores the result of a completed game.
+        @param key: A string that identifies the game.
+        @param result: A JSON serializable result.
+        """
+        self.results[key] = result
+        self.file.write(json.dumps({'key': key, 'result': result}, separators=(',', ':')) + '\n')
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self) -> None:
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,87 @@
+#  (C) Copyright Wieger Wesselink 2024. Distributed under the GPL-3.0-or-later
+#  Software License, (See accompanying file LICENSE or copy at
+#  https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from typing import List
+
+
+class TimeControl(object):
+    """
+    A chess style time control: every player has a bank of time for the whole game, and after every move an
+    increment is added to the bank of the player that moved.
+    """
+
+    def __init__(self, total: float, increment: float = 0.0):
+        """
+        @param total: The initial amount of time in seconds of each player.
+        @param increment: The amount of time in seconds that is added after every move.
+        """
+        if total <= 0:
+            raise ValueError('The total time of a time control must be positive.')
+        if increment < 0:
+            raise ValueError('The increment of a time control cannot be negative.')
+        self.total = total
+        self.increment = increment
+
+    def __str__(self):
+        return f'{self.total:g}+{self.increment:g}'
+
+
+def parse_time_control(text: str) -> TimeControl:
+    """
+    Parses a time control in the format 'TOTAL' or 'TOTAL+INCREMENT', e.g. '60+0.5'.
+    @param text: A string representation of a time control.
+    """
+    words = text.split('+')
+    if len(words) not in (1, 2):
+        raise ValueError(f"Unexpected time control '{text}'")
+    total = float(words[0])
+    increment = float(words[1]) if len(words) == 2 else 0.0
+    return TimeControl(total, increment)
+
+
+class Clock(object):
+    """
+    Keeps track of the remaining time of both players in a game.
+    """
+
+    def __init__(self, time_control: TimeControl, margin: float = 0.1):
+        """
+        @param time_control: The time control of the game.
+        @param margin: The time in seconds by which a player may overdraw its bank, to account for the time the
+         referee needs to stop the player when its bank runs out.
+        """
+        self.time_control = time_control
+        self.margin = margin
+        self.remaining: List[float] = [time_control.total, time_control.total]
+
+    def remaining_time(self, player_number: int) -> float:
+        """
+        Returns the remaining time in seconds of the given player (1 or 2).
+        """
+        return self.remaining[player_number - 1]
+
+    def is_exhausted(self, player_number: int, elapsed: float) -> bool:
+        """
+        Returns True if a move that took elapsed seconds used up the bank of the player. The move then counts only
+        if it was proposed before the bank ran out, i.e. the player loses on time if it did not propose a move.
+        """
+        return elapsed >= self.remaining[player_number - 1]
+
+    def punch(self, player_number: int, elapsed: float) -> bool:
+        """
+        Charges the time spent on a move to a player, and adds the increment if the player did not run out of time.
+        A player that used up its bank continues with only the increment.
+        @param player_number: The player that moved (1 or 2).
+        @param elapsed: The time in seconds that was spent on the move.
+        @return: False if the player overdrew its bank by more than the margin.
+        """
+        remaining = self.remaining[player_number - 1] - elapsed
+        if remaining < -self.margin:
+            self.remaining[player_number - 1] = 0.0
+            return False
+        self.remaining[player_number - 1] = max(remaining, 0.0) + self.time_control.increment
+        return True
+
+    def __str__(self):
+        return f'{self.remaining[0]:.2f} - {self.remaining[1]:.2f}'
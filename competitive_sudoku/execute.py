@@ -2,6 +2,7 @@
 #  Software License, (See accompanying file LICENSE or copy at
 #  https://www.gnu.org/licenses/gpl-3.0.txt)
 
+import asyncio
 import os
 from pathlib import Path
 import subprocess
@@ -37,3 +38,22 @@ def solve_sudoku(solve_sudoku_path: str, board_text: str, options: str='') -> st
     Path(filename).write_text(board_text)
     command = f'{solve_sudoku_path} {filename} {options}'
     return execute_command(command)
+
+
+async def solve_sudoku_async(solve_sudoku_path: str, board_text: str, options: str='') -> str:
+    """
+    Execute the solve_sudoku program without blocking the event loop. See solve_sudoku for the parameters.
+    """
+    if not os.path.exists(solve_sudoku_path):
+        raise RuntimeError(f'No oracle found at location "{solve_sudoku_path}"')
+    with tempfile.NamedTemporaryFile('w', prefix='solve_sudoku_', delete=False) as f:
+        f.write(board_text)
+    try:
+        process = await asyncio.create_subprocess_shell(f'{solve_sudoku_path} {f.name} {options}',
+                                                        stdout=asyncio.subprocess.PIPE,
+                                                        stderr=asyncio.subprocess.PIPE)
+        stdout, stderr = await process.communicate()
+    finally:
+        os.remove(f.name)
+    output = stdout.decode() or stderr.decode()
+    return output.strip()
@@ -0,0 +1,61 @@
+#  (C) Copyright Wieger Wesselink 2024. Distributed under the GPL-3.0-or-later
+#  Software License, (See accompanying file LICENSE or copy at
+#  https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from typing import Callable, Optional, Union
+
+from competitive_sudoku.sudoku import GameState, Move, SudokuSettings, print_game_state, pretty_print_game_state
+
+# The log levels of a game
+LOG_QUIET = 0   # only errors and the result of a game
+LOG_MOVES = 1   # one compact line per move
+LOG_BOARDS = 2  # the complete game state after every move
+
+LOG_LEVELS = {'quiet': LOG_QUIET, 'moves': LOG_MOVES, 'boards': LOG_BOARDS}
+
+
+class GameLog(object):
+    """
+    A levelled log for the referee. A message can be passed as a callable that renders it, such that expensive
+    renderings are only computed if the level of the message is enabled.
+    """
+
+    def __init__(self, level: int = LOG_BOARDS):
+        """
+        @param level: The highest level of messages that are printed.
+        """
+        self.level = level
+
+    def enabled(self, level: int) -> bool:
+        return level <= self.level
+
+    def log(self, level: int, message: Union[str, Callable[[], str]]) -> None:
+        """
+        Prints a message if its level is enabled.
+        @param level: The level of the message.
+        @param message: A string, or a function without arguments that returns a string.
+        """
+        if level <= self.level:
+            print(message() if callable(message) else message)
+
+
+def render_game_state(game_state: GameState) -> str:
+    """
+    Renders a game state in the format selected by SudokuSettings.
+    """
+    if SudokuSettings.print_ascii_states:
+        return print_game_state(game_state)
+    return pretty_print_game_state(game_state)
+
+
+def render_move_diff(game_state: GameState, player_number: int, move: Optional[Move], verdict: str, reward: int) -> str:
+    """
+    Renders the changes caused by a single turn on one line, e.g. 'player1 (0,2) -> 3 accepted +1  score 4 - 1'.
+    @param game_state: The game state after the turn.
+    @param player_number: The player that was to move.
+    @param move: The proposed move, or None if no move was proposed.
+    @param verdict: The verdict of the move.
+    @param reward: The reward of the move.
+    """
+    move_text = '-' if move is None else str(move)
+    return f'player{player_number} {move_text} {verdict} +{reward}  score {game_state.scores[0]} - {game_state.scores[1]}'
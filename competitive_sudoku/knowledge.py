@@ -0,0 +1,160 @@
+#  (C) Copyright Wieger Wesselink 2024. Distributed under the GPL-3.0-or-later
+#  Software License, (See accompanying file LICENSE or copy at
+#  https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import contextlib
+import hashlib
+import os
+import shutil
+from typing import Dict, List, Optional
+
+from competitive_sudoku.sudoku import GameState, print_game_state
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # not available on Windows
+
+
+def board_key(game_state: GameState, playmode: str) -> str:
+    """
+    Returns a name that identifies a start position, e.g. 'rows-3f2a9c0d41b7e655'. The hash covers the board, the
+    allowed squares, the moves and the scores of the position.
+    """
+    digest = hashlib.sha1(print_game_state(game_state).encode('utf-8')).hexdigest()
+    return f'{playmode}-{digest[:16]}'
+
+
+def _directory_size(path: str) -> int:
+    size = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                size += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return size
+
+
+class KnowledgeCache(object):
+    """
+    A directory in which players keep data across games and matches that start from the same position, such as
+    opening analysis or transposition table entries. Every start position and playing mode has a directory of its
+    own, with a subdirectory per player module, see SudokuAI.cache_dir. When the cache grows beyond its maximum
+    size, the directories of the positions that were played least recently are removed.
+    The cache may be shared by simultaneous games, e.g. the workers of stream_games. A game holds a shared file
+    lock on the directory of its position until it is released, and directories that are locked are not removed.
+    The files in the cache are replaced atomically by SudokuAI.save, and the logs of SudokuAI.open_store are
+    locked while they are written. File locks are not available on Windows, where the cache must not be shared by
+    simultaneous games.
+    """
+
+    def __init__(self, directory: str, max_size: Optional[int] = None):
+        """
+        @param directory: The root directory of the cache.
+        @param max_size: The maximum size in bytes of the cache, or None for no limit.
+        """
+        self.directory = os.path.abspath(directory)
+        self.max_size = max_size
+        self.locks: Dict[str, int] = {}  # the file descriptors of the position directories that are in use
+
+    def __getstate__(self):
+        # the locks belong to the games of the process that took them
+        state = self.__dict__.copy()
+        state['locks'] = {}
+        return state
+
+    @contextlib.contextmanager
+    def _locked(self):
+        """
+        Holds an exclusive lock on the cache while directories are created or removed.
+        """
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        fd = os.open(os.path.join(self.directory, '.lock'), os.O_RDWR | os.O_CREAT)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+    def directory_for(self, player_name: str, game_state: GameState, playmode: str) -> str:
+        """
+        Returns the cache directory of a player for a start position, and marks the position as recently played.
+        The position is in use until the directory is released, see release.
+        @param player_name: The module name of the player.
+        @param game_state: The start position.
+        @param playmode: The playing mode.
+        """
+        board_directory = os.path.join(self.directory, board_key(game_state, playmode))
+        path = os.path.join(board_directory, player_name)
+        with self._locked():
+            os.makedirs(path, exist_ok=True)
+            os.utime(board_directory)
+            if fcntl and board_directory not in self.locks:
+                fd = os.open(board_directory, os.O_RDONLY)
+                fcntl.flock(fd, fcntl.LOCK_SH)
+                self.locks[board_directory] = fd
+        return path
+
+    def release(self, paths: List[str]) -> None:
+        """
+        Marks cache directories that were returned by directory_for as no longer in use by this process.
+        """
+        for path in paths:
+            fd = self.locks.pop(os.path.dirname(os.path.abspath(path)), None)
+            if fd is not None:
+                os.close(fd)
+
+    def evict(self, keep: Optional[List[str]] = None) -> List[str]:
+        """
+        Removes the directories of the least recently played positions until the cache fits in its maximum size.
+        Positions that are in use by a game, in this or in another process, are not removed.
+        @param keep: Cache directories that are in use, the positions of which are not removed.
+        @return: The removed directories.
+        """
+        if self.max_size is None or not os.path.isdir(self.directory):
+            return []
+        kept = {os.path.dirname(os.path.abspath(path)) for path in keep or []}
+        removed = []
+        with self._locked():
+            entries = []
+            for name in os.listdir(self.directory):
+                path = os.path.join(self.directory, name)
+                if os.path.isdir(path):
+                    entries.append((os.path.getmtime(path), path, _directory_size(path)))
+            total = sum(size for _, _, size in entries)
+            for _, path, size in sorted(entries):
+                if total <= self.max_size:
+                    break
+                if path in kept or path in self.locks:
+                    continue
+                fd = None
+                if fcntl:
+                    fd = os.open(path, os.O_RDONLY)
+                    try:
+                        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        # the position is played by a game in another process
+                        os.close(fd)
+                        continue
+                try:
+                    shutil.rmtree(path, ignore_errors=True)
+                finally:
+                    if fd is not None:
+                        os.close(fd)
+                total -= size
+                removed.append(path)
+        return removed
+
+    @staticmethod
+    def from_options(directory: Optional[str], max_size_mb: Optional[float]) -> Optional['KnowledgeCache']:
+        """
+        Creates a cache from command line options, with the maximum size in megabytes.
+        @return: The cache, or None if no directory is given.
+        """
+        if directory is None:
+            return None
+        return KnowledgeCache(directory, None if max_size_mb is None else int(max_size_mb * 1024 * 1024))
@@ -0,0 +1,85 @@
+#  (C) Copyright Wieger Wesselink 2024. Distributed under the GPL-3.0-or-later
+#  Software License, (See accompanying file LICENSE or copy at
+#  https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import math
+import os
+from typing import Optional
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+# The kinds of resource limits that a player can exceed
+LIMIT_MEMORY = 'memory'
+LIMIT_CPU = 'cpu'
+
+
+def address_space_size() -> Optional[int]:
+    """
+    Returns the size in bytes of the address space of the current process, or None if it is unknown (it is only
+    available on Linux).
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[0]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class ResourceLimits(object):
+    """
+    Resource limits of a player, that are enforced by the referee in the process that runs compute_best_move.
+    The memory limit caps the address space of the process, such that allocations beyond it raise a MemoryError.
+    The CPU limit is a budget for the whole game: the CPU time of every turn is subtracted from it, and the kernel
+    stops the process when the remainder is used up.
+    """
+
+    def __init__(self, memory: Optional[int] = None, cpu_time: Optional[float] = None):
+        """
+        @param memory: The maximum size in bytes of the address space of a player process, or None for no limit.
+        @param cpu_time: The CPU time in seconds that a player may use during a game, or None for no limit.
+        """
+        if memory is not None and memory <= 0:
+            raise ValueError('The memory limit must be positive.')
+        if cpu_time is not None and cpu_time <= 0:
+            raise ValueError('The CPU time limit must be positive.')
+        self.memory = memory
+        self.cpu_time = cpu_time
+
+    def apply(self, cpu_time_remaining: Optional[float], memory_allowance: int = 0) -> None:
+        """
+        Applies the limits to the current process. This is called in the player process before compute_best_move.
+        @param cpu_time_remaining: The remaining CPU budget of the player in this game, or None for no limit.
+        @param memory_allowance: The size in bytes of the address space that the process inherited, but that does not
+         belong to the player, e.g. the data of the opponent that was built by SudokuAI.prepare. It is added to the
+         memory limit.
+        """
+        if resource is None:
+            return
+        if self.memory is not None:
+            memory = self.memory + memory_allowance
+            resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+        if cpu_time_remaining is not None:
+            # the CPU time of a process is counted from zero, SIGXCPU is sent at the soft limit
+            soft = max(1, math.ceil(cpu_time_remaining))
+            resource.setrlimit(resource.RLIMIT_CPU, (soft, soft + 1))
+
+    @staticmethod
+    def from_options(memory_mb: Optional[float], cpu_time: Optional[float]) -> Optional['ResourceLimits']:
+        """
+        Creates resource limits from command line options, with the memory limit in megabytes.
+        @return: The resource limits, or None if neither limit is set.
+        """
+        if memory_mb is None and cpu_time is None:
+            return None
+        return ResourceLimits(None if memory_mb is None else int(memory_mb * 1024 * 1024), cpu_time)
+
+    def __str__(self):
+        items = []
+        if self.memory is not None:
+            items.append(f'memory={self.memory // (1024 * 1024)}MB')
+        if self.cpu_time is not None:
+            items.append(f'cpu={self.cpu_time:g}s')
+        return ' '.join(items) or 'none'
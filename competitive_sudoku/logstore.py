@@ -0,0 +1,195 @@
+#  (C) Copyright Wieger Wesselink 2024. Distributed under the GPL-3.0-or-later
+#  Software License, (See accompanying file LICENSE or copy at
+#  https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import contextlib
+import os
+import pickle
+import struct
+from typing import Any, Dict, Hashable, Iterator, Optional, Set, Tuple
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # not available on Windows
+
+# Every frame of a log file is a 4 byte length followed by a pickle of a pair (updates, deletions)
+_HEADER = struct.Struct('<I')
+
+
+class LogStore(object):
+    """
+    A dictionary that is stored in an append-only log file. Only the entries that were changed since the last
+    flush are appended to the file, such that the cost of a flush does not depend on the size of the dictionary.
+    When the store is opened, the log is replayed into memory. If the log contains many overwritten or deleted
+    entries, it is compacted by rewriting the live entries.
+    The log file may be shared by several processes, e.g. in the knowledge cache. Every write holds an exclusive
+    lock on the file (fcntl.flock, not available on Windows), and first reads the entries that other processes
+    appended since the last read. If two processes change the same key, the last flush wins.
+    """
+
+    def __init__(self, path: str, lock=None, compaction_ratio: float = 2.0, minimum_compaction_size: int = 1000):
+        """
+        Opens the store, and reads the entries in the log file if it exists. A frame that was cut off because the
+        process was killed while writing it is discarded.
+        @param path: The name of the log file.
+        @param lock: If set, the lock is held while the log file is written.
+        @param compaction_ratio: The log is compacted when it contains more than compaction_ratio times as many
+         entries as the store.
+        @param minimum_compaction_size: Logs with fewer entries than this are never compacted.
+        """
+        self.path = path
+        self.lock = lock
+        self.compaction_ratio = compaction_ratio
+        self.minimum_compaction_size = minimum_compaction_size
+        self.data: Dict[Hashable, Any] = {}
+        self.updates: Dict[Hashable, Any] = {}
+        self.deletions: Set[Hashable] = set()
+        self.log_entries = 0  # the number of entries in the log file, including overwritten and deleted ones
+        self.offset = 0  # the size of the part of the log file that has been read
+        self.file_id: Optional[Tuple[int, int]] = None  # the device and inode of the log file that has been read
+        if os.path.isfile(path):
+            with self._locked_file() as f:
+                self._replay(f)
+
+    @contextlib.contextmanager
+    def _locked_file(self):
+        """
+        Opens the log file for reading and appending, and holds the lock and an exclusive lock on the file until
+        it is closed. If the file was replaced by a compaction while waiting for the lock, the new file is opened.
+        """
+        if self.lock:
+            self.lock.acquire()
+        try:
+            while True:
+                f = open(self.path, 'a+b')
+                if fcntl:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                try:
+                    if os.path.samestat(os.fstat(f.fileno()), os.stat(self.path)):
+                        break
+                except FileNotFoundError:
+                    pass
+                f.close()
+            try:
+                yield f
+            finally:
+                f.close()
+        finally:
+            if self.lock:
+                self.lock.release()
+
+    def _replay(self, f) -> None:
+        """
+        Reads the frames that were appended to the locked log file f since the last read. A frame that was cut off
+        is removed. The changes that were not flushed yet are applied on top of the entries that were read.
+        """
+        stat = os.fstat(f.fileno())
+        if (stat.st_dev, stat.st_ino) != self.file_id:
+            # the log file is new, or it was compacted by another process, so it is read from the start
+            self.file_id = (stat.st_dev, stat.st_ino)
+            self.data = {}
+            self.log_entries = 0
+            self.offset = 0
+        f.seek(self.offset)
+        while True:
+            header = f.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                break
+            frame = f.read(_HEADER.unpack(header)[0])
+            try:
+                updates, deletions = pickle.loads(frame)
+            except Exception:
+                break
+            for key in deletions:
+                self.data.pop(key, None)
+            self.data.update(updates)
+            self.log_entries += len(updates) + len(deletions)
+            self.offset = f.tell()
+        if self.offset < stat.st_size:
+            f.truncate(self.offset)
+        for key in self.deletions:
+            self.data.pop(key, None)
+        self.data.update(self.updates)
+
+    def __getitem__(self, key: Hashable) -> Any:
+        return self.data[key]
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        self.data[key] = value
+        self.updates[key] = value
+        self.deletions.discard(key)
+
+    def __delitem__(self, key: Hashable) -> None:
+        del self.data[key]
+        self.updates.pop(key, None)
+        self.deletions.add(key)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.data
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(self.data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        return self.data.get(key, default)
+
+    def items(self) -> Iterator[Tuple[Hashable, Any]]:
+        return iter(self.data.items())
+
+    def flush(self) -> None:
+        """
+        Appends the entries that were changed since the last flush to the log file, and compacts the log if needed.
+        """
+        if not self.updates and not self.deletions:
+            return
+        with self._locked_file() as f:
+            self._replay(f)
+            frame = pickle.dumps((self.updates, list(self.deletions)), protocol=pickle.HIGHEST_PROTOCOL)
+            f.write(_HEADER.pack(len(frame)) + frame)
+            f.flush()
+            self.offset = f.tell()
+            self.log_entries += len(self.updates) + len(self.deletions)
+            self.updates = {}
+            self.deletions = set()
+            if self.log_entries >= self.minimum_compaction_size and self.log_entries > self.compaction_ratio * len(self.data):
+                self._compact()
+
+    def compact(self) -> None:
+        """
+        Rewrites the log file such that it contains only the live entries, including the entries that were appended
+        by other processes. Entries that were not flushed yet are included. The new file replaces the old one
+        atomically.
+        """
+        with self._locked_file() as f:
+            self._replay(f)
+            self._compact()
+
+    def _compact(self) -> None:
+        """
+        Replaces the log file by a file with a single frame that contains the live entries. The lock of the log
+        file must be held by the caller.
+        """
+        frame = pickle.dumps((self.data, []), protocol=pickle.HIGHEST_PROTOCOL)
+        compact_path = '{}.{}.compact'.format(self.path, os.getpid())
+        with open(compact_path, 'wb') as f:
+            f.write(_HEADER.pack(len(frame)) + frame)
+            stat = os.fstat(f.fileno())
+        os.replace(compact_path, self.path)
+        self.file_id = (stat.st_dev, stat.st_ino)
+        self.offset = _HEADER.size + len(frame)
+        self.log_entries = len(self.data)
+        self.updates = {}
+        self.deletions = set()
+
+    def close(self) -> None:
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
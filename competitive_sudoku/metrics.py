@@ -0,0 +1,198 @@
+#  (C) Copyright Wieger Wesselink 2024. Distributed under the GPL-3.0-or-later
+#  Software License, (See accompanying file LICENSE or copy at
+#  https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import multiprocessing
+import os
+import signal
+import sys
+import time
+from typing import Any, Dict, Optional
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+from competitive_sudoku.limits import LIMIT_CPU, LIMIT_MEMORY, ResourceLimits
+from competitive_sudoku.preemption import run_preemptible
+from competitive_sudoku.sudoku import GameState
+from competitive_sudoku.sudokuai import SudokuAI
+from competitive_sudoku.telemetry import format_telemetry
+
+# The slots of the shared array in which a player process reports its usage
+_STARTED = 0         # the perf_counter time at which the process started
+_PROPOSALS = 1       # the number of calls of propose_move
+_FIRST_PROPOSAL = 2  # the perf_counter time of the first call of propose_move, or 0 if there was none
+_CPU_TIME = 3        # the user plus system CPU time in seconds
+_PEAK_RSS = 4        # the peak resident set size in bytes
+_REPORTED = 5        # 1 if the usage was reported
+_VIOLATION = 6       # 1 if the memory limit was exceeded, 2 if the CPU limit was exceeded
+_SLOTS = 7
+
+_VIOLATIONS = {1: LIMIT_MEMORY, 2: LIMIT_CPU}
+
+
+class TurnMetrics(object):
+    """
+    Measurements of a single turn of a player. All times are in seconds. Fields that could not be measured are None.
+    """
+
+    def __init__(self, player_number: int, ply: int):
+        self.player_number = player_number
+        self.ply = ply
+        self.think_time: Optional[float] = None      # the wall clock time of the turn
+        self.cpu_time: Optional[float] = None        # the CPU time of the player process and the processes it ran
+        self.peak_rss: Optional[int] = None          # the peak resident set size in bytes of the player process
+        self.first_proposal: Optional[float] = None  # the time from the start of the turn to the first proposed move
+        self.proposals: Optional[int] = None         # the number of proposed moves
+        self.spawn_time: Optional[float] = None      # the time from the start of the turn until the player process runs
+        self.oracle_time: Optional[float] = None     # the time spent by the sudoku solver on checking the move
+        self.render_time: Optional[float] = None     # the time spent on rendering output
+        self.limit_exceeded: Optional[str] = None    # LIMIT_MEMORY or LIMIT_CPU if a resource limit was exceeded
+        self.search: Optional[Dict[str, Any]] = None  # the statistics reported by the player, see Telemetry.snapshot
+
+    def as_dict(self) -> Dict[str, Any]:
+        """
+        Returns the metrics as a dictionary, with times rounded to microseconds.
+        """
+        return {key: round(value, 6) if isinstance(value, float) else value for key, value in vars(self).items()}
+
+    def __str__(self):
+        def show(value, unit=''):
+            return '-' if value is None else f'{value:.3f}{unit}' if isinstance(value, float) else f'{value}{unit}'
+        rss = None if self.peak_rss is None else self.peak_rss // (1024 * 1024)
+        return f'player{self.player_number} cpu {show(self.cpu_time, "s")} rss {show(rss, "MB")} ' \
+               f'first {show(self.first_proposal, "s")} proposals {show(self.proposals)} ' \
+               f'spawn {show(self.spawn_time, "s")} oracle {show(self.oracle_time, "s")} render {show(self.render_time, "s")}' + \
+               ('' if self.search is None else f' search: {format_telemetry(self.search)}')
+
+
+class _ProposalCounter(object):
+    """
+    Wraps the shared best move of a player, and counts the proposed moves. A proposal is counted when it is
+    published, or when its value is assigned, which is the last assignment in SudokuAI.propose_move.
+    """
+
+    def __init__(self, best_move, usage):
+        self.best_move = best_move
+        self.usage = usage
+
+    def _count(self) -> None:
+        if self.usage[_PROPOSALS] == 0:
+            self.usage[_FIRST_PROPOSAL] = time.perf_counter()
+        self.usage[_PROPOSALS] += 1
+
+    def publish(self, i: int, j: int, value: int) -> None:
+        self.best_move.publish(i, j, value)
+        self._count()
+
+    def __setitem__(self, index, value):
+        self.best_move[index] = value
+        if index == 2:
+            self._count()
+
+    def __getitem__(self, index):
+        return self.best_move[index]
+
+    def __len__(self):
+        return len(self.best_move)
+
+    def __iter__(self):
+        return iter(self.best_move)
+
+
+def _report_usage(usage) -> None:
+    if resource is None:
+        return
+    rusage = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    usage[_CPU_TIME] = rusage.ru_utime + rusage.ru_stime + children.ru_utime + children.ru_stime
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    usage[_PEAK_RSS] = rusage.ru_maxrss if sys.platform == 'darwin' else rusage.ru_maxrss * 1024
+    usage[_REPORTED] = 1
+
+
+def _metered_compute(player: SudokuAI, game_state: GameState, usage, limits: Optional[ResourceLimits],
+                     cpu_time_remaining: Optional[float], profile_path: Optional[str], memory_allowance: int,
+                     ponder: bool) -> None:
+    """
+    Runs compute_best_move (or ponder) in a player process, and reports the usage of the process when it returns or
+    when it is terminated by the referee. If limits are given, they are applied first, and a violation is reported.
+    """
+    usage[_STARTED] = time.perf_counter()
+
+    def on_terminate(signum, frame):
+        _report_usage(usage)
+        os._exit(0)
+
+    def on_cpu_limit(signum, frame):
+        usage[_VIOLATION] = 2
+        _report_usage(usage)
+        os._exit(1)
+
+    signal.signal(signal.SIGTERM, on_terminate)
+    if limits:
+        if hasattr(signal, 'SIGXCPU'):
+            signal.signal(signal.SIGXCPU, on_cpu_limit)
+        limits.apply(cpu_time_remaining, memory_allowance)
+    player.best_move = _ProposalCounter(player.best_move, usage)
+    try:
+        run_preemptible(player.ponder if ponder else player.compute_best_move, player, game_state, profile_path)
+    except MemoryError:
+        usage[_VIOLATION] = 1
+        _report_usage(usage)
+        os._exit(1)
+    _report_usage(usage)
+
+
+class TurnMeter(object):
+    """
+    Starts player processes that report their CPU time, peak memory and proposed moves to the referee, and that
+    optionally run under resource limits.
+    """
+
+    def __init__(self, limits: Optional[ResourceLimits] = None):
+        """
+        @param limits: The resource limits of the player processes, or None for no limits.
+        """
+        self.limits = limits
+        self.usage = multiprocessing.RawArray('d', _SLOTS)
+        self.start_time = 0.0
+
+    def start(self, player: SudokuAI, game_state: GameState, cpu_time_remaining: Optional[float] = None, profile_path: Optional[str] = None, memory_allowance: int = 0, ponder: bool = False) -> multiprocessing.Process:
+        """
+        Starts compute_best_move of player in a new process.
+        @param cpu_time_remaining: The remaining CPU budget of the player in this game, or None for no limit.
+        @param profile_path: If set, the call stacks of the player are sampled and written to this file.
+        @param memory_allowance: The size in bytes that is added to the memory limit, see ResourceLimits.apply.
+        @param ponder: If True, SudokuAI.ponder is started instead of compute_best_move. A meter measures one process
+         at a time, so the pondering process needs a meter of its own.
+        """
+        self.usage[:] = [0.0] * _SLOTS
+        self.start_time = time.perf_counter()
+        process = multiprocessing.Process(target=_metered_compute, args=(player, game_state, self.usage, self.limits, cpu_time_remaining, profile_path, memory_allowance, ponder))
+        process.start()
+        return process
+
+    def collect(self, process: multiprocessing.Process, metrics: TurnMetrics) -> None:
+        """
+        Waits briefly until a terminated player process has reported its usage, and stores it in metrics.
+        """
+        process.join(0.1)
+        killed = process.is_alive()
+        if killed:
+            process.kill()
+        usage = self.usage
+        if usage[_STARTED]:
+            metrics.spawn_time = usage[_STARTED] - self.start_time
+        metrics.proposals = int(usage[_PROPOSALS])
+        if usage[_PROPOSALS]:
+            metrics.first_proposal = usage[_FIRST_PROPOSAL] - self.start_time
+        if usage[_REPORTED]:
+            metrics.cpu_time = usage[_CPU_TIME]
+            metrics.peak_rss = int(usage[_PEAK_RSS])
+        metrics.limit_exceeded = _VIOLATIONS.get(int(usage[_VIOLATION]))
+        if metrics.limit_exceeded is None and self.limits and not killed and process.exitcode == -getattr(signal, 'SIGKILL', 9):
+            # the process was killed by the kernel at the hard CPU limit before it could report
+            metrics.limit_exceeded = LIMIT_CPU
@@ -0,0 +1,114 @@
+#  (C) Copyright Wieger Wesselink 2024. Distributed under the GPL-3.0-or-later
+#  Software License, (See accompanying file LICENSE or copy at
+#  https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""
+Runs a SudokuAI in a separate process that is controlled through its standard input and output, with one JSON
+object per line. Usage: python -m competitive_sudoku.player_host MODULE PLAYER_NUMBER [SOLVER]
+
+The host understands the following commands:
+    {"type": "prepare", "id": ID, "state": STATE}
+        Calls SudokuAI.prepare in the host process, such that the child processes inherit its data. When it has
+        finished, the host reports {"type": "prepared", "id": ID}.
+    {"type": "compute", "id": ID, "state": STATE, "time": S, "time_remaining": T, "time_increment": I}
+        Starts compute_best_move in a child process. STATE is a base64 encoded pickle of a GameState, S is the
+        calculation time of the move, and T and I are the clock of the player if a clock is used. When
+        compute_best_move returns, the host reports {"type": "returned", "id": ID}.
+    {"type": "stop", "id": ID}
+        Kills the child process and reports the last proposed move as {"type": "move", "id": ID, "move": [i, j, value]}.
+    {"type": "quit"}
+        Stops the host.
+When the host is ready to accept commands, it reports {"type": "ready"}. Everything that the player prints is
+redirected to the standard error.
+"""
+
+import base64
+import importlib
+import json
+import multiprocessing
+import multiprocessing.connection
+import os
+import pickle
+import sys
+import threading
+import time
+from typing import Any, Dict
+
+from competitive_sudoku.bestmove import BestMoveSlot
+from competitive_sudoku.sudoku import GameState
+from competitive_sudoku.sudokuai import SearchBudget
+
+
+def encode_game_state(game_state: GameState) -> str:
+    return base64.b64encode(pickle.dumps(game_state)).decode('ascii')
+
+
+def decode_game_state(text: str) -> GameState:
+    return pickle.loads(base64.b64decode(text))
+
+
+def main():
+    name = sys.argv[1]
+    player_number = int(sys.argv[2])
+    solver = sys.argv[3] if len(sys.argv) > 3 else None
+
+    # keep the standard output for the protocol, and send the output of the player to the standard error
+    protocol = os.fdopen(os.dup(1), 'w', buffering=1)
+    os.dup2(2, 1)
+    sys.stdout = os.fdopen(1, 'w', buffering=1)
+    multiprocessing.set_start_method('fork')
+
+    module = importlib.import_module(name + '.sudokuai')
+    player = module.SudokuAI()
+    player.player_number = player_number
+    if solver and name in ('random_player', 'greedy_player', 'random_save_player'):
+        player.solve_sudoku_path = solver
+    player.lock = multiprocessing.Lock()
+    player.best_move = BestMoveSlot()
+
+    lock = threading.Lock()
+
+    def send(message: Dict[str, Any]) -> None:
+        with lock:
+            protocol.write(json.dumps(message) + '\n')
+
+    def report_return(process: multiprocessing.Process, compute_id: int) -> None:
+        multiprocessing.connection.wait([process.sentinel])
+        send({'type': 'returned', 'id': compute_id})
+
+    process = None
+    send({'type': 'ready'})
+    for line in sys.stdin:
+        message = json.loads(line)
+        if message['type'] == 'prepare':
+            try:
+                player.prepare(decode_game_state(message['state']))
+            except Exception as err:
+                print(f'Error: an exception occurred in prepare:\n{err}', file=sys.stderr)
+            send({'type': 'prepared', 'id': message['id']})
+        elif message['type'] == 'compute':
+            game_state = decode_game_state(message['state'])
+            player.best_move.publish(0, 0, 0)
+            player.time_remaining = message.get('time_remaining')
+            player.time_increment = message.get('time_increment')
+            seconds = message.get('time') if player.time_remaining is None else player.time_remaining
+            player.budget = SearchBudget(None if seconds is None else time.monotonic() + seconds, player.time_remaining, player.time_increment)
+            process = multiprocessing.Process(target=player.compute_best_move, args=(game_state,))
+            process.start()
+            threading.Thread(target=report_return, args=(process, message['id']), daemon=True).start()
+        elif message['type'] == 'stop':
+            # the move is read without the lock, like in simulate_game, see BestMoveSlot
+            move = player.best_move.read()
+            if process is not None:
+                player.lock.acquire()
+                process.terminate()
+                player.lock.release()
+                process.join()
+                process = None
+            send({'type': 'move', 'id': message['id'], 'move': move})
+        elif message['type'] == 'quit':
+            break
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+#  (C) Copyright Wieger Wesselink 2024. Distributed under the GPL-3.0-or-later
+#  Software License, (See accompanying file LICENSE or copy at
+#  https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import json
+import random
+from typing import Iterator, List, Optional, Tuple
+
+from competitive_sudoku.sudoku import GameState, SudokuBoard, Square, allowed_squares, parse_game_state, \
+    print_game_state
+
+
+def random_solution(m: int, n: int, rng: random.Random) -> SudokuBoard:
+    """
+    Generates a random completely filled sudoku with regions of size m x n. It starts from a fixed pattern, and
+    applies random transformations that preserve the sudoku rules: relabeling the values, permuting the rows within
+    a band of regions, permuting the bands, permuting the columns within a stack of regions and permuting the stacks.
+    @param m: The number of rows in a region.
+    @param n: The number of columns in a region.
+    @param rng: A random number generator.
+    """
+    N = m * n
+    values = list(range(1, N + 1))
+    rng.shuffle(values)
+
+    def shuffled_lines(size: int, count: int) -> List[int]:
+        # a permutation of count groups of size consecutive lines, that keeps every line in a group
+        groups = list(range(count))
+        rng.shuffle(groups)
+        result = []
+        for group in groups:
+            lines = list(range(group * size, (group + 1) * size))
+            rng.shuffle(lines)
+            result.extend(lines)
+        return result
+
+    rows = shuffled_lines(m, n)     # n bands of m rows
+    columns = shuffled_lines(n, m)  # m stacks of n columns
+    transpose = m == n and rng.random() < 0.5
+
+    board = SudokuBoard(m, n)
+    for i in range(N):
+        for j in range(N):
+            r, c = (columns[j], rows[i]) if transpose else (rows[i], columns[j])
+            board.put((i, j), values[(n * (r % m) + r // m + c) % N])
+    return board
+
+
+def assign_owners(squares: List[Square], allowed_squares1: List[Square], allowed_squares2: List[Square],
+                  rng: random.Random) -> Tuple[List[Square], List[Square]]:
+    """
+    Distributes the given squares over the two players. A square is given to the player with the nearest allowed
+    square (using the king distance), such that both players occupy a connected area around their own allowed
+    squares. Ties are broken randomly.
+    @return: The occupied squares of player 1 and player 2.
+    """
+    def distance(square: Square, targets: List[Square]) -> int:
+        return min(max(abs(square[0] - t[0]), abs(square[1] - t[1])) for t in targets)
+
+    occupied_squares1 = []
+    occupied_squares2 = []
+    for square in squares:
+        d1 = distance(square, allowed_squares1)
+        d2 = distance(square, allowed_squares2)
+        if d1 < d2 or (d1 == d2 and rng.random() < 0.5):
+            occupied_squares1.append(square)
+        else:
+            occupied_squares2.append(square)
+    return occupied_squares1, occupied_squares2
+
+
+def random_position(m: int, n: int, fill: float, playmode: str, rng: random.Random) -> GameState:
+    """
+    Generates a random start position. The filled squares are taken from a complete solution, so the position is
+    guaranteed to be solvable.
+    @param m: The number of rows in a region.
+    @param n: The number of columns in a region.
+    @param fill: The fraction of the squares that is filled, in the range [0, 1).
+    @param playmode: The playing mode (classic, rows, border, random).
+    @param rng: A random number generator.
+    """
+    solution = random_solution(m, n, rng)
+    N = solution.N
+    board = SudokuBoard(m, n)
+    squares = sorted(solution.index2square(k) for k in rng.sample(range(N * N), round(fill * N * N)))
+    for square in squares:
+        board.put(square, solution.get(square))
+
+    if playmode == 'classic':
+        return GameState(board=board)
+
+    if playmode == 'random':
+        # like generate_random_tuples, but using rng such that the positions are reproducible
+        random_squares = [board.index2square(k) for k in rng.sample(range(N * N), 2 * N)]
+        allowed_squares1, allowed_squares2 = random_squares[:N], random_squares[N:]
+    else:
+        allowed_squares1, allowed_squares2 = allowed_squares(board, playmode)
+    occupied_squares1, occupied_squares2 = assign_owners(squares, allowed_squares1, allowed_squares2, rng)
+    return GameState(board=board,
+                     allowed_squares1=allowed_squares1,
+                     allowed_squares2=allowed_squares2,
+                     occupied_squares1=occupied_squares1,
+                     occupied_squares2=occupied_squares2)
+
+
+def generate_positions(m: int, n: int, count: int, fill: Tuple[float, float], playmode: str,
+                       seed: Optional[int] = None) -> Iterator[GameState]:
+    """
+    Generates distinct random start positions.
+    @param m: The number of rows in a region.
+    @param n: The number of columns in a region.
+    @param count: The number of positions.
+    @param fill: The range of the fraction of filled squares; for every position a fraction is drawn uniformly.
+    @param playmode: The playing mode (classic, rows, border, random).
+    @param seed: The seed of the random number generator.
+    """
+    rng = random.Random(seed)
+    seen = set()
+    attempts = 0
+    while len(seen) < count:
+        attempts += 1
+        if attempts > 100 * count:
+            raise RuntimeError(f'Could not generate {count} distinct positions.')
+        game_state = random_position(m, n, rng.uniform(*fill), playmode, rng)
+        text = print_game_state(game_state)
+        if text in seen:
+            continue
+        seen.add(text)
+        yield game_state
+
+
+def write_corpus(path: str, positions: Iterator[GameState], playmode: str) -> int:
+    """
+    Writes positions to a corpus file, with one JSON object per line containing the playing mode and the position
+    in the format of print_game_state.
+    @return: The number of positions that were written.
+    """
+    count = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        for game_state in positions:
+            f.write(json.dumps({'playmode': playmode, 'state': print_game_state(game_state)}) + '\n')
+            count += 1
+    return count
+
+
+def read_corpus(path: str) -> Iterator[Tuple[str, GameState]]:
+    """
+    Reads the positions of a corpus file.
+    @return: Pairs of a playing mode and a game state.
+    """
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                yield entry['playmode'], parse_game_state(entry['state'], entry['playmode'])
@@ -0,0 +1,89 @@
+#  (C) Copyright Wieger Wesselink 2024. Distributed under the GPL-3.0-or-later
+#  Software License, (See accompanying file LICENSE or copy at
+#  https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import multiprocessing
+import multiprocessing.connection
+import os
+import signal
+import sys
+from typing import Callable, List, Optional
+
+from competitive_sudoku.profiler import StackSampler
+from competitive_sudoku.sudoku import GameState
+from competitive_sudoku.sudokuai import Preempted, SudokuAI
+
+# The signal that announces the soft deadline of a turn (not available on Windows)
+PREEMPT_SIGNAL = getattr(signal, 'SIGUSR1', None)
+
+
+def run_preemptible(function: Callable[[GameState], None], player: SudokuAI, game_state: GameState, profile_path: Optional[str] = None) -> None:
+    """
+    Runs compute_best_move or ponder of a player in a player process. When the process receives PREEMPT_SIGNAL,
+    Preempted is raised in the player, after which its on_preempt hook is called.
+    @param function: A bound method of player, i.e. player.compute_best_move or player.ponder.
+    @param player: The player.
+    @param game_state: The game state that is passed to function.
+    @param profile_path: If set, the call stacks of function are sampled and written to this file, see StackSampler.
+     The samples are written before on_preempt is called.
+    """
+    armed = True
+
+    def on_signal(signum, frame):
+        # Preempted is raised at most once, such that a late signal cannot interrupt on_preempt
+        nonlocal armed
+        if armed:
+            armed = False
+            raise Preempted()
+
+    sampler = StackSampler(profile_path) if profile_path else None
+    if sampler:
+        sampler.start(sys._getframe())
+    try:
+        if PREEMPT_SIGNAL is None:
+            function(game_state)
+            return
+        try:
+            signal.signal(PREEMPT_SIGNAL, on_signal)
+            try:
+                function(game_state)
+            finally:
+                # A signal that arrives before the handler is reset raises Preempted here, which is caught below.
+                # Once the handler is reset, a pending signal is discarded by the interpreter.
+                signal.signal(PREEMPT_SIGNAL, signal.SIG_IGN)
+        except Preempted:
+            if sampler:
+                sampler.stop()
+            player.on_preempt(game_state)
+    finally:
+        if sampler:
+            sampler.stop()
+
+
+def preempt(processes: List[multiprocessing.Process], locks: List, grace_period: float) -> None:
+    """
+    Sends the soft deadline signal to the running player processes, and waits at most grace_period seconds until
+    they have finished. The locks must be held by the caller; they are released while waiting, such that the
+    players can save their data, and they are held again when the function returns.
+    @param processes: The player processes of the turn.
+    @param locks: The locks that protect the save files of the players of the processes.
+    @param grace_period: The maximum time in seconds that the players get for saving their data.
+    """
+    processes = [process for process in processes if process is not None and process.is_alive()]
+    if PREEMPT_SIGNAL is None or grace_period <= 0 or not processes:
+        return
+    for process in processes:
+        try:
+            os.kill(process.pid, PREEMPT_SIGNAL)
+        except ProcessLookupError:
+            pass
+    for lock in locks:
+        lock.release()
+    try:
+        multiprocessing.connection.wait([process.sentinel for process in processes], grace_period)
+        for process in processes:
+            # wait for the remaining processes within the same grace period
+            process.join(0)
+    finally:
+        for lock in locks:
+            lock.acquire()
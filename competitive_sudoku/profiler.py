@@ -0,0 +1,139 @@
+#  (C) Copyright Wieger Wesselink 2024. Distributed under the GPL-3.0-or-later
+#  Software License, (See accompanying file LICENSE or copy at
+#  https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import collections
+import os
+import signal
+from typing import Dict, Optional
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # not available on Windows
+
+# The CPU time in seconds between two samples
+SAMPLE_INTERVAL = 0.005
+
+
+def profiling_supported() -> bool:
+    """
+    Returns True if the platform has the profiling timer that is used by StackSampler (not Windows).
+    """
+    return hasattr(signal, 'SIGPROF') and hasattr(signal, 'setitimer')
+
+
+class StackSampler(object):
+    """
+    A sampling profiler for a player process. A profiling timer interrupts the process every SAMPLE_INTERVAL
+    seconds of CPU time, and the current call stack is counted. The counts are written in the collapsed stack
+    format of flamegraph.pl: one line per stack, with the frames separated by semicolons, followed by the count.
+    The samples are also written when the process is terminated by the referee.
+    """
+
+    def __init__(self, path: str, interval: float = SAMPLE_INTERVAL):
+        """
+        @param path: The file to which the samples are written.
+        @param interval: The CPU time in seconds between two samples.
+        """
+        self.path = path
+        self.interval = interval
+        self.counts: Dict[str, int] = collections.Counter()
+        self.base_frame = None
+        self.running = False
+        self.written = False
+
+    def _sample(self, signum, frame) -> None:
+        frames = []
+        while frame is not None and frame is not self.base_frame:
+            code = frame.f_code
+            frames.append(f'{frame.f_globals.get("__name__", "?")}:{code.co_name}')
+            frame = frame.f_back
+        if frames:
+            self.counts[';'.join(reversed(frames))] += 1
+
+    def start(self, base_frame) -> None:
+        """
+        Starts sampling. Frames at or above base_frame are not included in the stacks.
+        """
+        if not profiling_supported():
+            return
+        self.base_frame = base_frame
+        previous = signal.getsignal(signal.SIGTERM)
+
+        def on_terminate(signum, frame):
+            self.stop()
+            signal.signal(signum, signal.SIG_DFL if previous is None else previous)
+            if callable(previous):
+                previous(signum, frame)
+            else:
+                # deliver the signal again with the previous disposition, such that the exit code is unchanged
+                os.kill(os.getpid(), signum)
+
+        signal.signal(signal.SIGTERM, on_terminate)
+        signal.signal(signal.SIGPROF, self._sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+        self.running = True
+
+    def stop(self) -> None:
+        """
+        Stops sampling, and writes the samples. Calling it again has no effect.
+        """
+        if self.running:
+            signal.setitimer(signal.ITIMER_PROF, 0, 0)
+            signal.signal(signal.SIGPROF, signal.SIG_IGN)
+            self.running = False
+        if not self.written:
+            self.written = True
+            write_profile(self.path, self.counts)
+
+
+def read_profile(path: str) -> Dict[str, int]:
+    """
+    Reads a file in the collapsed stack format. Returns an empty profile if the file does not exist.
+    """
+    counts = collections.Counter()
+    if os.path.isfile(path):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                stack, _, count = line.rstrip('\n').rpartition(' ')
+                if stack and count.isdigit():
+                    counts[stack] += int(count)
+    return counts
+
+
+def write_profile(path: str, counts: Dict[str, int]) -> None:
+    """
+    Writes a profile in the collapsed stack format. The file is replaced atomically.
+    """
+    temporary_path = '{}.{}.tmp'.format(path, os.getpid())
+    with open(temporary_path, 'w', encoding='utf-8') as f:
+        for stack, count in sorted(counts.items()):
+            f.write(f'{stack} {count}\n')
+    os.replace(temporary_path, path)
+
+
+def merge_profile(samples_path: str, output_path: str) -> Optional[int]:
+    """
+    Adds the samples of a turn to the profile of a player, and removes the file with the samples. The profile may
+    be shared by simultaneous games: the directory of the profile is locked while it is updated (not on Windows).
+    @param samples_path: The file that was written by a StackSampler.
+    @param output_path: The profile of the player, that contains the samples of earlier turns and games.
+    @return: The number of samples that were added, or None if there was no samples file.
+    """
+    if not os.path.isfile(samples_path):
+        return None
+    samples = read_profile(samples_path)
+    os.remove(samples_path)
+    if samples:
+        directory = os.open(os.path.dirname(output_path) or '.', os.O_RDONLY) if fcntl else None
+        try:
+            if fcntl:
+                fcntl.flock(directory, fcntl.LOCK_EX)
+            counts = read_profile(output_path)
+            counts.update(samples)
+            write_profile(output_path, counts)
+        finally:
+            if directory is not None:
+                os.close(directory)
+    return sum(samples.values())
@@ -0,0 +1,123 @@
+#  (C) Copyright Wieger Wesselink 2024. Distributed under the GPL-3.0-or-later
+#  Software License, (See accompanying file LICENSE or copy at
+#  https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import math
+from typing import Dict, List, Optional, Tuple
+
+# A game result (player1, player2, score of player1), with score 1, 0.5 or 0
+GameOutcome = Tuple[str, str, float]
+
+ELO_SCALE = 400 / math.log(10)
+
+
+def expected_score(elo_difference: float) -> float:
+    """
+    Returns the expected score of a player that is elo_difference points stronger than its opponent.
+    """
+    return 1 / (1 + 10 ** (-elo_difference / 400))
+
+
+def estimate_elo(games: List[GameOutcome], prior_draws: float = 1.0, iterations: int = 1000) -> Dict[str, Tuple[float, float]]:
+    """
+    Estimates Elo ratings from a list of games with a Bradley-Terry model, where a draw counts as half a win for
+    both players. Like in BayesElo, a number of virtual draws is added between every pair of players that met, such
+    that players with a perfect score still get a finite rating. The ratings are shifted to an average of 0.
+    @param games: The results of the games.
+    @param prior_draws: The number of virtual draws between every pair of players that met.
+    @param iterations: The maximum number of iterations of the MM algorithm.
+    @return: A dictionary that maps every player to its rating and the half width of its 95% confidence interval.
+    """
+    players = sorted(set(name for game in games for name in game[:2]))
+    index = {name: i for i, name in enumerate(players)}
+    k = len(players)
+    if k == 0:
+        return {}
+
+    # count[i][j] is the number of games between i and j, score[i] the total score of i
+    count = [[0.0] * k for _ in range(k)]
+    score = [0.0] * k
+    for player1, player2, score1 in games:
+        i, j = index[player1], index[player2]
+        count[i][j] += 1
+        count[j][i] += 1
+        score[i] += score1
+        score[j] += 1 - score1
+    for i in range(k):
+        for j in range(k):
+            if i != j and count[i][j] > 0:
+                count[i][j] += prior_draws
+                score[i] += prior_draws / 2
+
+    # the MM algorithm of Hunter (2004) for the strengths gamma
+    gamma = [1.0] * k
+    for _ in range(iterations):
+        new_gamma = []
+        for i in range(k):
+            denominator = sum(count[i][j] / (gamma[i] + gamma[j]) for j in range(k) if j != i and count[i][j] > 0)
+            new_gamma.append(score[i] / denominator if denominator > 0 else gamma[i])
+        mean_log = sum(math.log(g) for g in new_gamma) / k
+        new_gamma = [g / math.exp(mean_log) for g in new_gamma]
+        converged = max(abs(math.log(a / b)) for a, b in zip(gamma, new_gamma)) < 1e-9
+        gamma = new_gamma
+        if converged:
+            break
+
+    result = {}
+    for i, name in enumerate(players):
+        # the diagonal of the Fisher information gives an approximation of the standard error
+        information = sum(count[i][j] * gamma[i] * gamma[j] / (gamma[i] + gamma[j]) ** 2 for j in range(k) if j != i)
+        error = 1.96 * ELO_SCALE / math.sqrt(information) if information > 0 else math.inf
+        result[name] = (ELO_SCALE * math.log(gamma[i]), error)
+    return result
+
+
+class SPRT(object):
+    """
+    A sequential probability ratio test for the Elo difference between two players, using the normal approximation
+    of the trinomial win/draw/loss distribution. It tests the hypothesis H0: elo = elo0 against H1: elo = elo1.
+    """
+
+    def __init__(self, elo0: float, elo1: float, alpha: float = 0.05, beta: float = 0.05):
+        """
+        @param elo0: The Elo difference of the hypothesis H0.
+        @param elo1: The Elo difference of the hypothesis H1.
+        @param alpha: The probability of accepting H1 when H0 is true.
+        @param beta: The probability of accepting H0 when H1 is true.
+        """
+        if elo0 >= elo1:
+            raise ValueError('The SPRT requires elo0 < elo1.')
+        self.elo0 = elo0
+        self.elo1 = elo1
+        self.lower_bound = math.log(beta / (1 - alpha))
+        self.upper_bound = math.log((1 - beta) / alpha)
+
+    def llr(self, wins: int, draws: int, losses: int) -> float:
+        """
+        Returns the log likelihood ratio of H1 versus H0 for the given results.
+        """
+        if wins == 0 or draws == 0 or losses == 0:
+            # avoid a zero variance in the first games
+            wins, draws, losses = wins + 0.5, draws + 0.5, losses + 0.5
+        n = wins + draws + losses
+        score = (wins + draws / 2) / n
+        variance = (wins + draws / 4) / n - score ** 2
+        if variance <= 0:
+            return 0.0
+        s0 = expected_score(self.elo0)
+        s1 = expected_score(self.elo1)
+        return (s1 - s0) * (2 * score - s0 - s1) / (2 * variance / n)
+
+    def status(self, wins: int, draws: int, losses: int) -> Optional[str]:
+        """
+        Returns 'H1' if H1 is accepted, 'H0' if H0 is accepted, and None if the test should continue.
+        """
+        llr = self.llr(wins, draws, losses)
+        if llr >= self.upper_bound:
+            return 'H1'
+        if llr <= self.lower_bound:
+            return 'H0'
+        return None
+
+    def __str__(self):
+        return f'SPRT elo0={self.elo0:g} elo1={self.elo1:g} bounds=[{self.lower_bound:.2f}, {self.upper_bound:.2f}]'
@@ -0,0 +1,197 @@
+#  (C) Copyright Wieger Wesselink 2024. Distributed under the GPL-3.0-or-later
+#  Software License, (See accompanying file LICENSE or copy at
+#  https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import json
+import os
+from typing import Any, Dict, Iterator, List, Optional
+
+from competitive_sudoku.sudoku import GameState, Move
+
+# The verdicts of a move, as reported in move records
+VERDICT_ACCEPTED = 'accepted'          # the move was played
+VERDICT_TABOO = 'taboo'                # the oracle declared the move taboo, the turn is lost
+VERDICT_TABOO_PLAYED = 'taboo-played'  # the move was already known to be taboo, the game is lost
+VERDICT_INVALID = 'invalid'            # the move violates the sudoku rules, the game is lost
+VERDICT_ILLEGAL = 'illegal'            # the move is not on an allowed square, the game is lost
+VERDICT_NO_MOVE = 'no-move'            # no move was proposed, the game is lost
+VERDICT_CANNOT_MOVE = 'cannot-move'    # the player has no squares to play on, the turn is skipped
+VERDICT_TIME_FORFEIT = 'time-forfeit'  # the player ran out of time on its clock, the game is lost
+VERDICT_MEMORY_LIMIT = 'memory-limit'  # the player exceeded its memory limit, the game is lost
+VERDICT_CPU_LIMIT = 'cpu-limit'        # the player exceeded its CPU time limit, the game is lost
+
+
+class GameRecorder(object):
+    """
+    Writes structured records of games to an append-only JSON lines file. Every line contains a JSON object with a
+    field 'type' that is either 'game-start', 'move' or 'game-end'. Records are flushed as soon as they are written,
+    such that the file can be read while a match is still running.
+    """
+
+    def __init__(self, path: str):
+        """
+        Opens a record file for appending. If the file already contains games, the numbering of games is continued.
+        @param path: The name of the record file.
+        """
+        self.path = path
+        self.game_id = 0
+        cut_off = False
+        if os.path.isfile(path) and os.path.getsize(path) > 0:
+            for record in read_records(path):
+                if record['type'] == 'game-start':
+                    self.game_id = max(self.game_id, record['game'])
+            with open(path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                cut_off = f.read(1) != b'\n'
+        self.file = open(path, 'a', encoding='utf-8')
+        if cut_off:
+            # terminate a line that was cut off by an interrupted run
+            self.file.write('\n')
+        self.ply = 0
+
+    def write(self, record: Dict[str, Any]) -> None:
+        self.file.write(json.dumps(record, separators=(',', ':')) + '\n')
+        self.file.flush()
+
+    def start_game(self, game_state: GameState, player1: str, player2: str, playmode: str, calculation_time: float,
+                   time_control: Optional[str] = None) -> None:
+        """
+        Writes a record for the start of a game.
+        @param game_state: The initial game state.
+        @param player1: The name of the first player.
+        @param player2: The name of the second player.
+        @param playmode: The playing mode.
+        @param calculation_time: The amount of time in seconds for computing a move.
+        @param time_control: The time control of the game, e.g. '60+0.5', or None if a fixed time per move is used.
+        """
+        self.game_id += 1
+        self.ply = 0
+        record = {'type': 'game-start',
+                  'game': self.game_id,
+                  'players': [player1, player2],
+                  'rows': game_state.board.m,
+                  'columns': game_state.board.n,
+                  'empty': game_state.board.squares.count(0),
+                  'playmode': playmode,
+                  'time': calculation_time}
+        if time_control is not None:
+            record['clock'] = time_control
+        self.write(record)
+
+    def record_move(self,
+                    player_number: int,
+                    move: Optional[Move],
+                    verdict: str,
+                    reward: int,
+                    think_time: float,
+                    scores: List[int],
+                    player_squares: Optional[int],
+                    clock: Optional[List[float]] = None,
+                    metrics: Optional[Dict[str, Any]] = None
+                   ) -> None:
+        """
+        Writes a record for a single turn.
+        @param player_number: The player that was to move (1 or 2).
+        @param move: The proposed move, or None if no move was proposed.
+        @param verdict: The verdict of the move, one of the VERDICT_* constants.
+        @param reward: The reward of the move.
+        @param think_time: The time in seconds that was spent on computing the move.
+        @param scores: The scores of both players after the move.
+        @param player_squares: The number of squares the player was allowed to play on, or None if all squares are allowed.
+        @param clock: The remaining time of both players after the move, or None if no clock is used.
+        @param metrics: The CPU, memory and overhead measurements of the turn, see TurnMetrics.as_dict.
+        """
+        self.ply += 1
+        record = {'type': 'move',
+                  'game': self.game_id,
+                  'ply': self.ply,
+                  'player': player_number,
+                  'move': None if move is None else [move.square[0], move.square[1], move.value],
+                  'verdict': verdict,
+                  'reward': reward,
+                  'time': round(think_time, 4),
+                  'scores': list(scores),
+                  'player-squares': player_squares}
+        if clock is not None:
+            record['clock'] = [round(t, 4) for t in clock]
+        if metrics is not None:
+            record['metrics'] = metrics
+        self.write(record)
+
+    def end_game(self, result: tuple, reason: str, scores: List[int]) -> None:
+        """
+        Writes a record for the end of a game.
+        @param result: The result of the game, e.g. (1, 0) if the first player won.
+        @param reason: The reason why the game ended.
+        @param scores: The final scores of both players.
+        """
+        self.write({'type': 'game-end',
+                    'game': self.game_id,
+                    'result': list(result),
+                    'reason': reason,
+                    'scores': list(scores),
+                    'plies': self.ply})
+
+    def append(self, record: Dict[str, Any]) -> None:
+        """
+        Writes a record that was created elsewhere, e.g. by a RecordCollector. The games are renumbered such that
+        they continue the numbering of this file.
+        @param record: A 'game-start', 'move' or 'game-end' record.
+        """
+        if record['type'] == 'game-start':
+            self.game_id += 1
+        self.write(dict(record, game=self.game_id))
+
+    def close(self) -> None:
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class RecordCollector(GameRecorder):
+    """
+    Collects the records of games in memory instead of writing them to a file.
+    """
+
+    def __init__(self, game_id: int = 1):
+        """
+        @param game_id: The number of the first game that is recorded.
+        """
+        self.path = None
+        self.game_id = game_id - 1  # start_game increments the number
+        self.ply = 0
+        self.records: List[Dict[str, Any]] = []
+
+    def write(self, record: Dict[str, Any]) -> None:
+        self.records.append(record)
+
+    def close(self) -> None:
+        pass
+
+
+def read_records(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Reads the records of a record file in the order in which they were written. Empty lines and lines that were cut
+    off by an interrupted run are ignored.
+    @param path: The name of the record file.
+    """
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def read_game_results(path: str) -> List[Dict[str, Any]]:
+    """
+    Returns the 'game-end' records of a record file.
+    @param path: The name of the record file.
+    """
+    return [record for record in read_records(path) if record['type'] == 'game-end']
@@ -5,7 +5,9 @@
 import copy
 import io
 import random
-from typing import List, Tuple, Union, Any, Optional, Iterator
+from array import array
+from collections.abc import MutableSequence
+from typing import Iterable, List, Tuple, Union, Any, Optional, Iterator
 
 # A square consists of a row and column index. Both are zero-based.
 Square = Tuple[int, int]
@@ -50,6 +52,273 @@ class TabooMove(Move):
         super().__init__(square, value)
 
 
+def _pack_move(move: Move) -> Tuple[int, int]:
+    row, col = move.square
+    return row << 8 | col, move.value << 1 | isinstance(move, TabooMove)
+
+
+def _unpack_move(square: int, value: int) -> Move:
+    move_class = TabooMove if value & 1 else Move
+    return move_class((square >> 8, square & 0xFF), value >> 1)
+
+
+def _move_history(data: array) -> 'MoveHistory':
+    history = MoveHistory()
+    history.data = data
+    return history
+
+
+class MoveHistory(MutableSequence):
+    """
+    A list of moves that is stored in a packed array. Every move takes two 16 bit numbers: the square (row << 8 | col)
+    and the value (value << 1 | taboo flag), which supports boards of up to 256 rows and columns. Copying and
+    pickling a history copies a single buffer, instead of an object per move. The elements are created as Move or
+    TabooMove objects when they are first accessed, and they are kept until the history is changed, such that
+    iterating again is as fast as iterating over a list. The elements should not be modified; the array data should
+    only be changed through the methods of the history.
+    """
+
+    __slots__ = ('data', 'elements')
+
+    def __init__(self, moves: Iterable[Move] = ()):
+        self.data = array('H')
+        self.elements: Optional[List[Move]] = None  # the unpacked moves, or None if they have not been created
+        for move in moves:
+            self.data.extend(_pack_move(move))
+
+    def _index(self, index: int) -> int:
+        n = len(self.data) // 2
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError('move index out of range')
+        return 2 * index
+
+    def _elements(self) -> List[Move]:
+        if self.elements is None:
+            data = self.data
+            self.elements = [_unpack_move(data[k], data[k + 1]) for k in range(0, len(data), 2)]
+        return self.elements
+
+    def __len__(self) -> int:
+        return len(self.data) // 2
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return MoveHistory(self._elements()[index])
+        self._index(index)
+        return self._elements()[index]
+
+    def __setitem__(self, index, move: Move) -> None:
+        if isinstance(index, slice):
+            raise TypeError('MoveHistory does not support slice assignment')
+        k = self._index(index)
+        self.data[k], self.data[k + 1] = _pack_move(move)
+        self.elements = None
+
+    def __delitem__(self, index) -> None:
+        if isinstance(index, slice):
+            for i in sorted(range(*index.indices(len(self))), reverse=True):
+                del self[i]
+            return
+        k = self._index(index)
+        del self.data[k:k + 2]
+        self.elements = None
+
+    def insert(self, index: int, move: Move) -> None:
+        n = len(self)
+        index = min(max(index + n if index < 0 else index, 0), n)
+        self.data[2 * index:2 * index] = array('H', _pack_move(move))
+        self.elements = None
+
+    def append(self, move: Move) -> None:
+        square, value = _pack_move(move)
+        self.data.extend((square, value))
+        if self.elements is not None:
+            self.elements.append(_unpack_move(square, value))
+
+    def pop(self, index: int = -1) -> Move:
+        move = self[index]
+        del self[index]
+        return move
+
+    def clear(self) -> None:
+        del self.data[:]
+        self.elements = None
+
+    def copy(self) -> 'MoveHistory':
+        return _move_history(array('H', self.data))
+
+    def __iter__(self) -> Iterator[Move]:
+        return iter(self._elements())
+
+    def __contains__(self, move) -> bool:
+        # moves are compared by square and value, like Move.__eq__, so the taboo flag is ignored
+        try:
+            square, value = _pack_move(move)
+        except (AttributeError, TypeError, ValueError):
+            return False
+        data = self.data
+        value >>= 1
+        for k in range(0, len(data), 2):
+            if data[k] == square and data[k + 1] >> 1 == value:
+                return True
+        return False
+
+    def __eq__(self, other) -> bool:
+        try:
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        except TypeError:
+            return NotImplemented
+
+    def __copy__(self) -> 'MoveHistory':
+        return self.copy()
+
+    def __deepcopy__(self, memo) -> 'MoveHistory':
+        return self.copy()
+
+    def __reduce__(self):
+        return _move_history, (self.data,)
+
+    def __repr__(self) -> str:
+        return f'MoveHistory([{", ".join(str(move) for move in self)}])'
+
+
+def _move_history_property(name: str, doc: str) -> property:
+    """
+    Returns a property of GameState that stores a list of moves as a MoveHistory.
+    """
+    def get(self) -> MoveHistory:
+        return getattr(self, name)
+
+    def set(self, moves: Iterable[Move]) -> None:
+        setattr(self, name, moves if isinstance(moves, MoveHistory) else MoveHistory(moves))
+
+    return property(get, set, doc=doc)
+
+
+class SquareView(object):
+    """
+    A set of squares that is stored as a bit in a byte array with one byte per square of the board, see
+    GameState.owners. Membership and adding a square take constant time. Like the lists that were used before,
+    the view keeps the squares in the order in which they were added, such that they can be indexed and iterated
+    in that order; append is a synonym of add. The byte array should only be changed through the views.
+    """
+
+    __slots__ = ('cells', 'bit', 'N', 'squares')
+
+    def __init__(self, cells: bytearray, bit: int, N: int):
+        """
+        @param cells: The byte array, indexed by N * row + column. Squares that are already in it are added in
+         board order.
+        @param bit: The bit of the byte of a square that marks the squares in the set.
+        @param N: The number of rows and columns of the board.
+        """
+        self.cells = cells
+        self.bit = bit
+        self.N = N
+        self.squares: List[Square] = [(k // N, k % N) for k, flags in enumerate(cells) if flags & bit]  # in insertion order
+
+    def _index(self, square: Square) -> int:
+        i, j = square
+        if not (0 <= i < self.N and 0 <= j < self.N):
+            raise ValueError(f'square {square} is not on the board')
+        return self.N * i + j
+
+    def __contains__(self, square) -> bool:
+        try:
+            i, j = square
+        except (TypeError, ValueError):
+            return False
+        N = self.N
+        return 0 <= i < N and 0 <= j < N and self.cells[N * i + j] & self.bit != 0
+
+    def __iter__(self) -> Iterator[Square]:
+        return iter(self.squares)
+
+    def __len__(self) -> int:
+        return len(self.squares)
+
+    def __getitem__(self, index):
+        return self.squares[index]
+
+    def add(self, square: Square) -> None:
+        k = self._index(square)
+        if not self.cells[k] & self.bit:
+            self.cells[k] |= self.bit
+            self.squares.append((k // self.N, k % self.N))
+
+    append = add
+
+    def extend(self, squares: Iterable[Square]) -> None:
+        for square in squares:
+            self.add(square)
+
+    def remove(self, square: Square) -> None:
+        if square not in self:
+            raise ValueError(f'square {square} is not in the set')
+        self.discard(square)
+
+    def discard(self, square: Square) -> None:
+        if square in self:
+            k = self._index(square)
+            self.cells[k] &= ~self.bit
+            self.squares.remove((k // self.N, k % self.N))
+
+    def clear(self) -> None:
+        bit = self.bit
+        cells = self.cells
+        N = self.N
+        for i, j in self.squares:
+            cells[N * i + j] &= ~bit
+        self.squares = []
+
+    def detach(self) -> None:
+        """
+        Moves the squares of the view from the shared byte array to a byte array of its own. The view keeps its
+        squares, but it is no longer a view on the game state.
+        """
+        cells = bytearray(len(self.cells))
+        N = self.N
+        for i, j in self.squares:
+            cells[N * i + j] = self.bit
+        squares = self.squares
+        self.clear()
+        self.cells = cells
+        self.squares = squares
+
+    def __eq__(self, other) -> bool:
+        try:
+            return set(self) == set(other)
+        except TypeError:
+            return NotImplemented
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+
+def _square_view_property(name: str, cells: str, bit: int, doc: str) -> property:
+    """
+    Returns a property of GameState that stores a list of squares, or None, as a SquareView on a byte array. A
+    view that was taken before an assignment keeps its squares, like a list that was assigned before.
+    """
+    def get(self) -> Optional[SquareView]:
+        return getattr(self, name)
+
+    def set(self, squares: Optional[Iterable[Square]]) -> None:
+        squares = None if squares is None else list(squares)
+        previous = getattr(self, name, None)
+        if previous is not None:
+            previous.detach()
+        view = None
+        if squares is not None:
+            view = SquareView(getattr(self, cells), bit, self.board.N)
+            view.extend(squares)
+        setattr(self, name, view)
+
+    return property(get, set, doc=doc)
+
+
 class SudokuBoard(object):
     """
     A simple board class for Sudoku. It supports arbitrary rectangular regions.
@@ -154,15 +423,19 @@ def pretty_print_sudoku_board(board: SudokuBoard, gamestate = None) -> str:
     N = board.N
     out = io.StringIO()
 
+    # the occupied squares of a GameState are views with a constant time membership test
+    occupied_squares1 = () if gamestate is None or gamestate.occupied_squares1 is None else gamestate.occupied_squares1
+    occupied_squares2 = () if gamestate is None or gamestate.occupied_squares2 is None else gamestate.occupied_squares2
+
     def print_square(square: Square):
         value = board.get(square)
         s = ' -' if value == 0 else f'{value:2}'
         
         if gamestate == None:
             return s + ' '
-        if square in gamestate.occupied_squares1:
+        if square in occupied_squares1:
             return s + '+'
-        elif square in gamestate.occupied_squares2:
+        elif square in occupied_squares2:
             return s + '-'
         else:
             return s + ' '
@@ -287,8 +560,9 @@ class GameState(object):
         """
         @param initial_board: A sudoku board. It contains the start position of a game.
         @param board: A sudoku board. It contains the current position of a game.
-        @param taboo_moves: A list of taboo moves. Moves in this list cannot be played.
-        @param moves: The history of a sudoku game, starting in initial_board. The history includes taboo moves.
+        @param taboo_moves: A list of taboo moves. Moves in this list cannot be played. It is stored as a MoveHistory.
+        @param moves: The history of a sudoku game, starting in initial_board. The history includes taboo moves. It
+         is stored as a MoveHistory.
         @param scores: The cumulative rewards of the first and the second player.
         @param current_player: The current player (1 or 2).
         @param allowed_squares1: The squares where player1 is always allowed to play (None if all squares are allowed).
@@ -319,11 +593,29 @@ class GameState(object):
         self.moves = moves
         self.scores = scores
         self.current_player = current_player
+        # The owner of every square (0, 1 or 2), indexed by board.square2index. It is updated by occupied_squares1
+        # and occupied_squares2, which are views on it.
+        self.owners = bytearray(board.N * board.N)
+        # The players that are always allowed to play on a square (bit 1 and bit 2), indexed like owners
+        self.allowed = bytearray(board.N * board.N)
         self.allowed_squares1 = allowed_squares1
         self.allowed_squares2 = allowed_squares2
         self.occupied_squares1 = occupied_squares1
         self.occupied_squares2 = occupied_squares2
 
+    taboo_moves = _move_history_property('_taboo_moves', 'The taboo moves, that cannot be played.')
+    moves = _move_history_property('_moves', 'The history of the game, including taboo moves.')
+    allowed_squares1 = _square_view_property('_allowed_squares1', 'allowed', 1, 'The squares where player1 is always allowed to play, or None.')
+    allowed_squares2 = _square_view_property('_allowed_squares2', 'allowed', 2, 'The squares where player2 is always allowed to play, or None.')
+    occupied_squares1 = _square_view_property('_occupied_squares1', 'owners', 1, 'The squares occupied by player1, or None.')
+    occupied_squares2 = _square_view_property('_occupied_squares2', 'owners', 2, 'The squares occupied by player2, or None.')
+
+    def owner(self, square: Square) -> int:
+        """
+        Returns the player that occupies a square, or 0 if it is not occupied.
+        """
+        return self.owners[self.board.square2index(square)]
+
     def is_classic_game(self):
         """
         Returns True if the game is classic, i.e. all squares are allowed.
@@ -422,13 +714,14 @@ def print_game_state(game_state: GameState) -> str:
     m = board.m
     n = board.n
     N = board.N
+    occupied_squares1 = () if is_classic_game else game_state.occupied_squares1
 
     def print_square(square: Square):
         value = board.get(square)
         if is_classic_game:
             s = '   .' if value == 0 else f'{value:>4}'
         else:
-            occupied = '+' if square in game_state.occupied_squares1 else '-'
+            occupied = '+' if square in occupied_squares1 else '-'
             s = '     .' if value == 0 else f' {value:>4}{occupied}'
         out.write(s)
 
@@ -2,23 +2,134 @@
 #  Software License, (See accompanying file LICENSE or copy at
 #  https://www.gnu.org/licenses/gpl-3.0.txt)
 
-from typing import List
+from typing import List, Optional, Tuple
+from competitive_sudoku.logstore import LogStore
 from competitive_sudoku.sudoku import GameState, Move
+import mmap
 import os
 import pickle
 import math
+import time
 from datetime import datetime
 
 
+class Preempted(BaseException):
+    """
+    Raised in compute_best_move or ponder when the referee reaches the soft deadline of a turn, see
+    SudokuAI.on_preempt. Like KeyboardInterrupt it derives from BaseException, such that it is not caught by
+    the handlers of type Exception of an engine.
+    """
+    pass
+
+
+class SearchBudget(object):
+    """
+    The resources that a player has for computing a move. The framework sets it as SudokuAI.budget before every
+    move. Times are measured with time.monotonic, which is shared by all processes.
+    """
+
+    def __init__(self,
+                 deadline: Optional[float] = None,
+                 time_remaining: Optional[float] = None,
+                 time_increment: Optional[float] = None
+                 ):
+        """
+        @param deadline: The time.monotonic() value at which the turn ends and the player process is stopped, or None
+         if there is no deadline. With a clock, this is the moment at which the clock of the player runs out.
+        @param time_remaining: The remaining time on the clock of the player, or None if no clock is used.
+        @param time_increment: The time that is added to the clock after the move, or None if no clock is used.
+        """
+        self.deadline = deadline
+        self.time_remaining = time_remaining
+        self.time_increment = time_increment
+        self.start_time = time.monotonic()
+        self.iteration_start: Optional[float] = None
+        self.iteration_times: List[float] = []
+
+    def time_left(self) -> float:
+        """
+        Returns the time in seconds until the deadline, or infinity if there is no deadline.
+        """
+        if self.deadline is None:
+            return math.inf
+        return self.deadline - time.monotonic()
+
+    def allocate(self, moves_to_go: int = 20) -> None:
+        """
+        With a clock, moves the deadline forward such that the player uses an equal share of its remaining time
+        for each of the next moves_to_go moves, plus the increment. Without a clock, nothing changes.
+        @param moves_to_go: The number of moves for which the remaining time must suffice.
+        """
+        if self.time_remaining is None:
+            return
+        share = self.time_remaining / max(1, moves_to_go) + (self.time_increment or 0.0)
+        deadline = self.start_time + min(share, self.time_remaining)
+        self.deadline = deadline if self.deadline is None else min(self.deadline, deadline)
+
+    def should_continue(self, estimated_time: float = 0.0) -> bool:
+        """
+        Returns True if work that takes estimated_time seconds can be done before the deadline.
+        @param estimated_time: The estimated duration in seconds of the work.
+        """
+        return self.time_left() > estimated_time
+
+    def start_iteration(self) -> None:
+        """
+        Marks the start of an iteration of an iterative deepening search.
+        """
+        self.iteration_start = time.monotonic()
+
+    def finish_iteration(self) -> None:
+        """
+        Marks the end of an iteration that was started with start_iteration.
+        """
+        if self.iteration_start is not None:
+            self.iteration_times.append(time.monotonic() - self.iteration_start)
+            self.iteration_start = None
+
+    def next_iteration_time(self) -> float:
+        """
+        Estimates the duration of the next iteration, assuming that it grows by the same factor as the last one.
+        Returns 0 if no iteration was finished yet.
+        """
+        if not self.iteration_times:
+            return 0.0
+        last = self.iteration_times[-1]
+        if len(self.iteration_times) < 2 or self.iteration_times[-2] <= 0:
+            return last
+        return last * max(1.0, last / self.iteration_times[-2])
+
+    def should_start_iteration(self) -> bool:
+        """
+        Returns True if the next iteration of an iterative deepening search is expected to finish before the
+        deadline.
+        """
+        return self.should_continue(self.next_iteration_time())
+
+
 class SudokuAI(object):
     """
     Sudoku AI that computes the best move in a given sudoku configuration.
     """
 
+    # The names of the phases of the search for which the time can be reported with report
+    telemetry_phases: Tuple[str, ...] = ()
+
     def __init__(self):
         self.best_move: List[int] = [0, 0, 0]
         self.lock = None
         self.player_number = -1
+        # When the game is played with a clock, these are set by the framework before every move: the remaining
+        # time in seconds of this player, and the time that is added to it after the move.
+        self.time_remaining: Optional[float] = None
+        self.time_increment: Optional[float] = None
+        # The deadline and budget of the current move, see SearchBudget. It is set by the framework before every move.
+        self.budget = SearchBudget()
+        # The shared block in which statistics of the search are reported, see report. It is set by the framework.
+        self.telemetry = None
+        # The directory in which data is kept across games that start from the same position, see save_path. It is
+        # set by the framework if the game is played with a knowledge cache, and None otherwise.
+        self.cache_dir: Optional[str] = None
 
     def compute_best_move(self, game_state: GameState) -> None:
         """
@@ -27,10 +138,84 @@ class SudokuAI(object):
         propose_move. This function is run by a game playing framework in a
         separate thread, that will be killed after a specific amount of time.
         The last reported move is the one that will be played.
+        When the game is played with a clock, the turn ends as soon as this
+        function returns, and self.time_remaining contains the time that is
+        left on the clock of this player.
         @param game_state: A Game state.
         """
         raise NotImplementedError
 
+    def prepare(self, game_state: GameState) -> None:
+        """
+        This function may be overridden to build static data before a game,
+        such as lookup tables of the units of the board, Zobrist keys or an
+        opening book, and to import modules that are used during the search.
+        It is called once before the first move of every game, in the process
+        from which the player processes are forked. Every move then starts
+        with this data already in memory, instead of computing it again. The
+        time spent here is not counted as thinking time, but the call is
+        interrupted after simulate_game.PREPARE_TIME_LIMIT seconds. With a
+        memory limit, the memory allocated here counts against the limit of
+        this player only.
+        By default nothing is done.
+        @param game_state: The start position of the game. It must not be modified.
+        """
+        pass
+
+    def ponder(self, game_state: GameState) -> None:
+        """
+        This function may be overridden to search while the opponent is
+        thinking. If pondering is enabled, it is run by the game playing
+        framework in a separate process during the turn of the opponent, and
+        it is killed as soon as the opponent has moved. Typically an engine
+        predicts the replies of the opponent and searches the resulting
+        positions. The results can be stored with save(..., name='ponder'),
+        and be loaded in the next call of compute_best_move, which can
+        inspect game_state.moves to see which move was actually played.
+        By default nothing is done.
+        @param game_state: A Game state in which the opponent is to move.
+        """
+        pass
+
+    def on_preempt(self, game_state: GameState) -> None:
+        """
+        This function may be overridden to save the results of a search that
+        was interrupted. If the game is played with a grace period, the
+        framework interrupts compute_best_move (and ponder) at the end of the
+        turn by raising Preempted, and then calls this function in the same
+        process. The move that was proposed before the interruption is
+        played; proposals made during the grace period are ignored. The
+        process is killed when the grace period is over, so the saved data
+        should be small enough to be written in time, e.g. with
+        save(..., name='tree').
+        By default nothing is done.
+        @param game_state: The game state of the interrupted search.
+        """
+        pass
+
+    def report(self,
+               nodes: Optional[int] = None,
+               depth: Optional[int] = None,
+               tt_probes: Optional[int] = None,
+               tt_hits: Optional[int] = None,
+               **phase_times: float
+               ) -> None:
+        """
+        Reports statistics of the search to the referee, which logs the last reported values of every turn, see
+        simulate_game.py --metrics. The values are totals for the current move; values that are None are not
+        changed. This is cheap, so it may be called after every iteration of a search.
+        @param nodes: The number of nodes searched.
+        @param depth: The depth of the last completed iteration.
+        @param tt_probes: The number of lookups in the transposition table.
+        @param tt_hits: The number of successful lookups in the transposition table.
+        @param phase_times: The time in seconds spent in phases of the search, with names that are declared in
+         telemetry_phases, e.g. report(nodes=n, movegen=0.12).
+        """
+        if self.telemetry is None:
+            return
+        values = dict(phase_times, nodes=nodes, depth=depth, tt_probes=tt_probes, tt_hits=tt_hits)
+        self.telemetry.report(values)
+
     def propose_move(self, move: Move) -> None:
         """
         Updates the best move that has been found so far.
@@ -47,15 +232,33 @@ class SudokuAI(object):
         if self.lock:
             self.lock.release()
 
-    def save(self, object):
+    def save_path(self, name: Optional[str] = None, extension: str = 'pkl', cache=False) -> str:
+        """
+        Returns the location of the save file of this player.
+        @param name: An optional name to distinguish multiple save files.
+        @param extension: The extension of the file, 'pkl' for save, 'npy' for save_array, 'bin' for save_bytes
+         and 'log' for open_store.
+        @param cache: If True, the file is located in the knowledge cache (see cache_dir), where it is kept across
+         games that start from the same position. It is shared by both players and by simultaneous games of the
+         same engine. If the game is played without a knowledge cache, the usual save file is used.
+        """
+        if cache and self.cache_dir is not None:
+            return os.path.join(self.cache_dir, '{}.{}'.format('cache' if name is None else name, extension))
+        if name is None:
+            return os.path.join(os.getcwd(), '{}.{}'.format(self.player_number, extension))
+        return os.path.join(os.getcwd(), '{}-{}.{}'.format(self.player_number, name, extension))
+
+    def save(self, object, name: Optional[str] = None, cache=False):
         if self.lock:
             self.lock.acquire()
-        save_path = os.path.join(os.getcwd(),
-                                 '{}.pkl'.format(self.player_number))
+        save_path = self.save_path(name, cache=cache)
         start_time = datetime.now()
-        with open(save_path, 'wb') as handle:
+        # the file is replaced atomically, since files in the knowledge cache may be read by other games
+        temporary_path = '{}.{}.tmp'.format(save_path, os.getpid())
+        with open(temporary_path, 'wb') as handle:
             pickle.dump(object, handle)
             handle.close()
+        os.replace(temporary_path, save_path)
         end_time = datetime.now()
         duration = end_time - start_time
         print('Saving data took {} seconds and {} milliseconds'.format(
@@ -64,11 +267,10 @@ class SudokuAI(object):
         if self.lock:
             self.lock.release()
 
-    def load(self):
+    def load(self, name: Optional[str] = None, cache=False):
         if self.lock:
             self.lock.acquire()
-        load_path = os.path.join(os.getcwd(),
-                                 '{}.pkl'.format(self.player_number))
+        load_path = self.save_path(name, cache=cache)
         start_time = datetime.now()
         if not os.path.isfile(load_path):
             if self.lock:
@@ -86,3 +288,101 @@ class SudokuAI(object):
         if self.lock:
             self.lock.release()
         return contents
+
+    def save_array(self, array, name: Optional[str] = None) -> None:
+        """
+        Saves a NumPy array to a .npy file. If the array was returned by load_array with the same name, it is a
+        view on the file itself, and only the pages that were modified are written.
+        @param array: A NumPy array.
+        @param name: An optional name to distinguish multiple save files.
+        """
+        import numpy as np
+        if self.lock:
+            self.lock.acquire()
+        try:
+            save_path = self.save_path(name, 'npy')
+            if isinstance(array, np.memmap) and array.filename == save_path:
+                array.flush()
+            else:
+                # the file is replaced instead of overwritten, such that arrays returned by load_array stay valid
+                temporary_path = '{}.{}.tmp'.format(save_path, os.getpid())
+                with open(temporary_path, 'wb') as handle:
+                    np.save(handle, array)
+                os.replace(temporary_path, save_path)
+        finally:
+            if self.lock:
+                self.lock.release()
+
+    def load_array(self, name: Optional[str] = None, writable=True):
+        """
+        Loads an array that was saved with save_array, without copying it: the array is a memory mapped view on
+        the file, and the operating system reads its pages when they are accessed.
+        @param name: An optional name to distinguish multiple save files.
+        @param writable: If True, the array can be modified and saved again with save_array.
+        @return: A numpy.memmap, or None if the file does not exist.
+        """
+        import numpy as np
+        load_path = self.save_path(name, 'npy')
+        if not os.path.isfile(load_path):
+            return None
+        return np.load(load_path, mmap_mode='r+' if writable else 'r')
+
+    def save_bytes(self, data, name: Optional[str] = None) -> None:
+        """
+        Saves a byte buffer to a .bin file. If the buffer was returned by load_bytes with the same name, it is a
+        view on the file itself, and only the pages that were modified are written. Otherwise the file is replaced;
+        buffers that were loaded before remain valid, but they keep the old contents.
+        @param data: A bytes-like object.
+        @param name: An optional name to distinguish multiple save files.
+        """
+        if self.lock:
+            self.lock.acquire()
+        try:
+            save_path = self.save_path(name, 'bin')
+            mappings = getattr(self, '_mappings', {})
+            mapping = mappings.get(save_path)
+            if mapping is not None and isinstance(data, memoryview) and data.obj is mapping:
+                mapping.flush()
+            else:
+                # Truncating a file that is mapped by load_bytes makes the mapped pages invalid, and accessing
+                # them raises SIGBUS. Hence the file is replaced, and an earlier buffer keeps the old contents.
+                temporary_path = '{}.{}.tmp'.format(save_path, os.getpid())
+                with open(temporary_path, 'wb') as handle:
+                    handle.write(data)
+                os.replace(temporary_path, save_path)
+                mappings.pop(save_path, None)
+        finally:
+            if self.lock:
+                self.lock.release()
+
+    def load_bytes(self, name: Optional[str] = None) -> Optional[memoryview]:
+        """
+        Loads a byte buffer that was saved with save_bytes, without copying it: the buffer is a writable memory
+        mapped view on the file, that can be saved again with save_bytes.
+        @param name: An optional name to distinguish multiple save files.
+        @return: A memoryview, or None if the file does not exist.
+        """
+        load_path = self.save_path(name, 'bin')
+        if not os.path.isfile(load_path):
+            return None
+        if os.path.getsize(load_path) == 0:
+            return memoryview(bytearray())
+        with open(load_path, 'r+b') as handle:
+            mapping = mmap.mmap(handle.fileno(), 0)
+        if not hasattr(self, '_mappings'):
+            self._mappings = {}
+        self._mappings[load_path] = mapping
+        return memoryview(mapping)
+
+    def open_store(self, name: Optional[str] = None, cache=False) -> LogStore:
+        """
+        Opens a dictionary that is kept across moves in an append-only log file, e.g. a transposition table. The
+        entries of earlier moves are read when it is opened, and flush appends only the entries that were changed
+        since then. Keys and values must be picklable.
+            store = self.open_store('table')
+            store[key] = value
+            store.flush()
+        @param name: An optional name to distinguish multiple save files.
+        @param cache: If True, the store is kept in the knowledge cache, see save_path.
+        """
+        return LogStore(self.save_path(name, 'log', cache), self.lock)
@@ -0,0 +1,71 @@
+#  (C) Copyright Wieger Wesselink 2024. Distributed under the GPL-3.0-or-later
+#  Software License, (See accompanying file LICENSE or copy at
+#  https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import multiprocessing
+from typing import Any, Dict, Optional, Sequence
+
+# The statistics that every engine can report, see SudokuAI.report
+TELEMETRY_FIELDS = ('nodes', 'depth', 'tt_probes', 'tt_hits')
+
+
+class Telemetry(object):
+    """
+    A block of shared memory in which a player process reports statistics of its search to the referee. Only the
+    player process writes to it, and a value is written with a single store, so no lock is needed. The block keeps
+    the last reported values, also when the process is killed at the end of the turn.
+    """
+
+    def __init__(self, phases: Sequence[str] = ()):
+        """
+        @param phases: The names of the phases of the search for which the player reports the time spent.
+        """
+        self.phases = tuple(phases)
+        self.names = TELEMETRY_FIELDS + self.phases
+        self.values = multiprocessing.RawArray('d', len(self.names) + 1)  # the last slot counts the reports
+        self.index = {name: i for i, name in enumerate(self.names)}
+
+    def report(self, values: Dict[str, float]) -> None:
+        """
+        Stores values, that are indexed by the names in TELEMETRY_FIELDS and phases.
+        """
+        for name, value in values.items():
+            if value is not None:
+                try:
+                    self.values[self.index[name]] = value
+                except KeyError:
+                    raise ValueError(f'Unknown telemetry field {name!r}; phases must be declared in SudokuAI.telemetry_phases') from None
+        self.values[-1] += 1
+
+    def reset(self) -> None:
+        self.values[:] = [0.0] * len(self.values)
+
+    def snapshot(self, think_time: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Returns the reported values, together with the derived nodes per second and transposition table hit rate.
+        @param think_time: The duration of the turn in seconds, that is used for the nodes per second.
+        @return: The values, or None if nothing was reported.
+        """
+        if not self.values[-1]:
+            return None
+        values = list(self.values)
+        result: Dict[str, Any] = {name: int(values[self.index[name]]) for name in TELEMETRY_FIELDS}
+        result['nps'] = round(result['nodes'] / think_time) if think_time else None
+        result['tt_hit_rate'] = round(result['tt_hits'] / result['tt_probes'], 4) if result['tt_probes'] else None
+        if self.phases:
+            result['phases'] = {name: round(values[self.index[name]], 6) for name in self.phases}
+        return result
+
+
+def format_telemetry(values: Dict[str, Any]) -> str:
+    """
+    Formats a snapshot of the telemetry of a turn as a single line.
+    """
+    text = f'depth {values["depth"]} nodes {values["nodes"]}'
+    if values.get('nps') is not None:
+        text += f' nps {values["nps"]}'
+    if values.get('tt_hit_rate') is not None:
+        text += f' tt-hits {100 * values["tt_hit_rate"]:.1f}%'
+    for name, seconds in values.get('phases', {}).items():
+        text += f' {name} {seconds:.3f}s'
+    return text
@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+
+#  (C) Copyright Wieger Wesselink 2024. Distributed under the GPL-3.0-or-later
+#  Software License, (See accompanying file LICENSE or copy at
+#  https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import argparse
+import collections
+import ipaddress
+import multiprocessing
+import os
+import random
+import socket
+import tempfile
+import threading
+import time
+from multiprocessing.connection import Client, Connection, Listener
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+from competitive_sudoku.checkpoint import Checkpoint
+from competitive_sudoku.clock import TimeControl, parse_time_control
+from play_match import print_score
+from play_tournament import TournamentGame, checkpoint_key, format_crosstable, run_game, schedule_games
+from simulate_game import GameResult, init_worker
+
+Address = Union[str, Tuple[str, int]]
+
+# The interval in seconds at which workers report that they are still alive
+HEARTBEAT_INTERVAL = 2.0
+
+
+def parse_address(text: str) -> Address:
+    """
+    Parses the address of a coordinator. An address of the form 'HOST:PORT' is a TCP address, any other address is
+    the path of a Unix socket.
+    """
+    host, separator, port = text.rpartition(':')
+    if separator and port.isdigit() and '/' not in text:
+        return host, int(port)
+    return text
+
+
+def is_loopback(address: Address) -> bool:
+    """
+    Returns True if an address can only be reached from the local host, i.e. it is a Unix socket or a loopback
+    address.
+    """
+    if isinstance(address, str):
+        return True
+    host = address[0]
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        pass
+    try:
+        return ipaddress.ip_address(socket.gethostbyname(host)).is_loopback
+    except (OSError, ValueError):
+        return False
+
+
+class Coordinator(object):
+    """
+    Hands out the games of a tournament to workers that connect over a socket. Workers pull one game at a time, such
+    that fast workers automatically take over work from slow ones. The game of a worker that disconnects, stops
+    sending heartbeats or exceeds the job timeout is handed out again, at most max_retries times.
+    """
+
+    def __init__(self,
+                 games: List[TournamentGame],
+                 calculation_time: float,
+                 time_control: Optional[TimeControl],
+                 checkpoint: Checkpoint,
+                 seed: int = 0,
+                 max_retries: int = 2,
+                 job_timeout: Optional[float] = None,
+                 heartbeat_timeout: float = 10.0
+                ):
+        """
+        @param games: The games that have to be played.
+        @param calculation_time: The amount of time in seconds for computing a move.
+        @param time_control: If set, the games are played with a clock instead of a fixed time per move.
+        @param checkpoint: The checkpoint file to which the results are written.
+        @param seed: The seed from which the random seeds of the games are derived.
+        @param max_retries: The number of times a game is handed out again after its worker was lost.
+        @param job_timeout: The maximum time in seconds a worker may spend on a game before it is considered lost.
+        @param heartbeat_timeout: The time in seconds without a message after which a worker is considered lost. Note
+         that a connection is not closed when a worker dies, if the processes it forked are still running.
+        """
+        self.games = games
+        self.calculation_time = calculation_time
+        self.time_control = time_control
+        self.checkpoint = checkpoint
+        rng = random.Random(seed)
+        self.seeds = {game.game_id: rng.getrandbits(32) for game in games}
+        self.max_retries = max_retries
+        self.job_timeout = job_timeout
+        self.heartbeat_timeout = heartbeat_timeout
+        self.pending = collections.deque(games)
+        self.attempts: Dict[int, int] = collections.defaultdict(int)
+        self.results: Dict[int, GameResult] = {}
+        self.failed = set()
+        self.condition = threading.Condition()
+
+    def finished(self) -> bool:
+        return len(self.results) + len(self.failed) == len(self.games)
+
+    def next_job(self) -> Optional[TournamentGame]:
+        """
+        Returns the next game that should be played, or None if all games are finished. If no games are pending, it
+        waits until a game is handed back by a lost worker, or until all games are finished.
+        """
+        with self.condition:
+            while not self.pending and not self.finished():
+                self.condition.wait()
+            return self.pending.popleft() if self.pending else None
+
+    def complete(self, game: TournamentGame, result: GameResult, worker: str) -> None:
+        with self.condition:
+            if game.game_id not in self.results and game.game_id not in self.failed:
+                self.results[game.game_id] = result
+                self.checkpoint.add(checkpoint_key(game), list(result))
+                print(f'Game {game.game_id}: {game} {print_score(result[0])}-{print_score(result[1])} ({worker})')
+            self.condition.notify_all()
+
+    def requeue(self, game: TournamentGame, reason: str) -> None:
+        with self.condition:
+            if game.game_id not in self.results:
+                self.attempts[game.game_id] += 1
+                if self.attempts[game.game_id] > self.max_retries:
+                    self.failed.add(game.game_id)
+                    print(f'Error: game {game.game_id} {game} failed {self.attempts[game.game_id]} times, the last time because {reason}')
+                else:
+                    print(f'Game {game.game_id} {game} is rescheduled, because {reason}')
+                    self.pending.appendleft(game)
+            self.condition.notify_all()
+
+    def serve_worker(self, connection: Connection) -> None:
+        """
+        Hands out games to a single worker connection until all games are finished or the worker is lost.
+        """
+        game = None
+        worker = 'unknown worker'
+        try:
+            _, worker = connection.recv()
+            connection.send(('config', self.calculation_time, self.time_control))
+            while True:
+                game = self.next_job()
+                if game is None:
+                    connection.send(('done',))
+                    return
+                connection.send(('job', game, self.seeds[game.game_id]))
+                started = time.monotonic()
+                while True:
+                    if not connection.poll(self.heartbeat_timeout):
+                        raise TimeoutError(f'{worker} stopped sending heartbeats')
+                    message = connection.recv()
+                    if message[0] != 'alive':
+                        break
+                    if self.job_timeout is not None and time.monotonic() - started > self.job_timeout:
+                        raise TimeoutError(f'{worker} exceeded the job timeout')
+                if message[0] == 'result':
+                    self.complete(game, message[2], worker)
+                else:
+                    self.requeue(game, f'{worker} reported an error:\n{message[2]}')
+                game = None
+        except (EOFError, OSError) as err:
+            if game is not None:
+                self.requeue(game, f'the connection with {worker} was lost ({err or type(err).__name__})')
+        finally:
+            connection.close()
+
+    def run(self, address: Address, authkey: bytes) -> Dict[int, GameResult]:
+        """
+        Accepts worker connections until all games are finished.
+        @return: The results of the games, indexed by game id.
+        """
+        if not is_loopback(address):
+            # the messages are pickles, so everyone who knows the authkey can run code on the coordinator and workers
+            print(f'Warning: listening on the non-loopback address {address[0]}:{address[1]}. Everyone who can reach '
+                  f'it and knows the authkey can run code on this host and on the workers; use a strong authkey.')
+        listener = Listener(address, authkey=authkey)
+        print(f'Coordinator listening on {listener.address}, {len(self.games)} games to play')
+        threads = []
+
+        def accept_workers():
+            while True:
+                try:
+                    connection = listener.accept()
+                except multiprocessing.AuthenticationError:
+                    continue
+                except OSError:
+                    return
+                thread = threading.Thread(target=self.serve_worker, args=(connection,), daemon=True)
+                thread.start()
+                threads.append(thread)
+
+        threading.Thread(target=accept_workers, daemon=True).start()
+        with self.condition:
+            while not self.finished():
+                self.condition.wait()
+        for thread in list(threads):
+            thread.join(1.0)  # give the waiting workers the chance to receive 'done'
+        listener.close()
+        return self.results
+
+
+def run_worker(address: Address, authkey: bytes, name: str, base_directory: str, connect_timeout: float) -> None:
+    """
+    Plays the games handed out by a coordinator, until the coordinator reports that all games are finished.
+    @param address: The address of the coordinator.
+    @param authkey: The shared secret of the coordinator and its workers.
+    @param name: The name of the worker, that is used in the output of the coordinator.
+    @param base_directory: The directory against which relative board files are resolved.
+    @param connect_timeout: The time in seconds during which a refused connection is retried.
+    """
+    deadline = time.monotonic() + connect_timeout
+    while True:
+        try:
+            connection = Client(address, authkey=authkey)
+            break
+        except (ConnectionRefusedError, FileNotFoundError):
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.5)
+
+    lock = threading.Lock()
+    stopped = threading.Event()
+
+    def send(message: tuple) -> None:
+        with lock:
+            connection.send(message)
+
+    def send_heartbeats():
+        while not stopped.wait(HEARTBEAT_INTERVAL):
+            try:
+                send(('alive',))
+            except OSError:
+                return
+
+    with connection:
+        send(('hello', name))
+        _, calculation_time, time_control = connection.recv()
+        threading.Thread(target=send_heartbeats, daemon=True).start()
+        try:
+            while True:
+                message = connection.recv()
+                if message[0] == 'done':
+                    return
+                _, game, seed = message
+                game.board_file = os.path.join(base_directory, game.board_file)
+                random.seed(seed)
+                try:
+                    _, result = run_game(game, calculation_time, time_control)
+                    send(('result', game.game_id, result))
+                except Exception as err:
+                    send(('error', game.game_id, repr(err)))
+        finally:
+            stopped.set()
+
+
+def worker_process(address: Address, authkey: bytes, base_directory: str, connect_timeout: float, directory: str) -> None:
+    init_worker(directory)
+    run_worker(address, authkey, f'{socket.gethostname()}:{os.getpid()}', base_directory, connect_timeout)
+
+
+def start_workers(address: Address, authkey: bytes, count: int, connect_timeout: float) -> None:
+    """
+    Starts count worker processes on this host, and waits until they are finished.
+    """
+    base_directory = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix='sudoku_worker_') as directory:
+        processes = []
+        for _ in range(count):
+            process = multiprocessing.Process(target=worker_process, args=(address, authkey, base_directory, connect_timeout, directory))
+            process.start()
+            processes.append(process)
+        for process in processes:
+            process.join()
+
+
+def coordinate_tournament(address: Address,
+                          authkey: bytes,
+                          players: List[str],
+                          boards: List[str],
+                          playmodes: List[str],
+                          rounds: int,
+                          calculation_time: float,
+                          time_control: Optional[TimeControl] = None,
+                          gauntlet: Optional[str] = None,
+                          output_file: str = 'tournament-result.txt',
+                          seed: int = 0,
+                          max_retries: int = 2,
+                          job_timeout: Optional[float] = None,
+                          heartbeat_timeout: float = 10.0,
+                          resume: bool = False,
+                          restart: bool = False
+                         ) -> None:
+    """
+    Plays a round robin or gauntlet tournament on workers that connect to the given address. The board files are
+    passed to the workers as they are given, so relative paths are resolved against the working directory of the
+    workers. The remaining parameters are the same as in play_tournament.
+    """
+    if gauntlet is not None and gauntlet not in players:
+        players = [gauntlet] + players
+    schedule = schedule_games(players, boards, playmodes, rounds, gauntlet)
+    outcomes = []
+    with Checkpoint(str(Path(output_file).with_suffix('.checkpoint.jsonl')), resume, restart) as checkpoint:
+        remaining = [game for game in schedule if checkpoint_key(game) not in checkpoint]
+        if len(remaining) < len(schedule):
+            print(f'Restored {len(schedule) - len(remaining)} games from {checkpoint.path}')
+        coordinator = Coordinator(remaining, calculation_time, time_control, checkpoint, seed, max_retries, job_timeout, heartbeat_timeout)
+        if remaining:
+            coordinator.run(address, authkey)
+        for game in schedule:
+            result = checkpoint.result(checkpoint_key(game))
+            if result is not None:
+                outcomes.append((game.first, game.second, result[0]))
+
+    crosstable = format_crosstable(players, outcomes)
+    print(crosstable)
+    Path(output_file).write_text(crosstable)
+
+
+def main():
+    multiprocessing.set_start_method('fork')
+    cmdline_parser = argparse.ArgumentParser(description='Play a tournament between sudoku players on several hosts.')
+    cmdline_parser.add_argument('--authkey', type=str, default=os.environ.get('SUDOKU_AUTHKEY'), help='The shared secret of the coordinator and the workers; it is required, since the hosts exchange pickled messages (default: $SUDOKU_AUTHKEY)')
+    subparsers = cmdline_parser.add_subparsers(dest='mode', required=True)
+
+    coordinator_parser = subparsers.add_parser('coordinator', help='Hand out the games of a tournament to workers')
+    coordinator_parser.add_argument('players', help="The module names of the players' SudokuAI classes", nargs='+')
+    coordinator_parser.add_argument('--listen', metavar='ADDRESS', type=parse_address, default=('localhost', 6000), help='HOST:PORT or the path of a Unix socket (default: localhost:6000)')
+    coordinator_parser.add_argument('--gauntlet', metavar='PLAYER', type=str, help='Only play the games of PLAYER against the other players')
+    coordinator_parser.add_argument('--boards', metavar='FILE', nargs='+', default=['boards/empty-2x2.txt'], help='The text files containing the start positions (default: boards/empty-2x2.txt)')
+    coordinator_parser.add_argument('--playmodes', nargs='+', choices=['classic', 'rows', 'border', 'random'], default=['rows'], help='The playing modes (default: rows)')
+    coordinator_parser.add_argument('--rounds', type=int, default=1, help='The number of games of every pairing with each colour, per board and playing mode (default: 1)')
+    coordinator_parser.add_argument('--time', type=float, default=1.0, help="The time (in seconds) for computing a move (default: 1.0)")
+    coordinator_parser.add_argument('--clock', metavar='TOTAL[+INCREMENT]', type=parse_time_control, help="Use a bank of TOTAL seconds per player, plus INCREMENT seconds per move, instead of a fixed time per move")
+    coordinator_parser.add_argument('--seed', type=int, default=0, help='The seed from which the random seeds of the games are derived (default: 0)')
+    coordinator_parser.add_argument('--retries', type=int, default=2, help='The number of times the game of a lost worker is handed out again (default: 2)')
+    coordinator_parser.add_argument('--job-timeout', metavar='SECONDS', type=float, help='Consider a worker lost if it does not return a result within SECONDS')
+    coordinator_parser.add_argument('--heartbeat-timeout', metavar='SECONDS', type=float, default=10.0, help='Consider a worker lost if it sends no heartbeat within SECONDS (default: 10)')
+    coordinator_parser.add_argument('--output', metavar='FILE', type=str, default='tournament-result.txt', help='The file to which the crosstable is written (default: tournament-result.txt)')
+    coordinator_parser.add_argument('--resume', help='Continue an interrupted tournament with the same settings, using the results in its checkpoint file', action='store_true')
+    coordinator_parser.add_argument('--restart', help='Discard the checkpoint file of an earlier tournament with the same output file', action='store_true')
+
+    worker_parser = subparsers.add_parser('worker', help='Play the games handed out by a coordinator')
+    worker_parser.add_argument('--connect', metavar='ADDRESS', type=parse_address, default=('localhost', 6000), help='HOST:PORT or the path of a Unix socket (default: localhost:6000)')
+    worker_parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='The number of games that are played simultaneously (default: the number of cores)')
+    worker_parser.add_argument('--connect-timeout', metavar='SECONDS', type=float, default=30.0, help='Keep trying to connect for SECONDS if the coordinator is not running yet (default: 30)')
+    args = cmdline_parser.parse_args()
+
+    if not args.authkey:
+        cmdline_parser.error('an authkey is required: use --authkey or set $SUDOKU_AUTHKEY')
+    authkey = args.authkey.encode()
+    if args.mode == 'coordinator':
+        if args.resume and args.restart:
+            coordinator_parser.error('--resume and --restart cannot be combined')
+        try:
+            coordinate_tournament(args.listen, authkey, args.players, args.boards, args.playmodes, args.rounds, args.time, args.clock, args.gauntlet, args.output, args.seed, args.retries, args.job_timeout, args.heartbeat_timeout, args.resume, args.restart)
+        except FileExistsError as err:
+            coordinator_parser.error(str(err))
+    else:
+        start_workers(args.connect, authkey, args.workers, args.connect_timeout)
+
+
+if __name__ == '__main__':
+    main()
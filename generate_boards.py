@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+
+#  (C) Copyright Wieger Wesselink 2024. Distributed under the GPL-3.0-or-later
+#  Software License, (See accompanying file LICENSE or copy at
+#  https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import argparse
+from pathlib import Path
+
+from competitive_sudoku.positions import generate_positions, write_corpus
+from competitive_sudoku.sudoku import print_game_state
+
+
+def main():
+    cmdline_parser = argparse.ArgumentParser(description='Generate random solvable start positions for benchmarks.')
+    cmdline_parser.add_argument('--rows', type=int, default=3, help='The number of rows of a region (default: 3)')
+    cmdline_parser.add_argument('--columns', type=int, default=3, help='The number of columns of a region (default: 3)')
+    cmdline_parser.add_argument('--count', type=int, default=10, help='The number of positions (default: 10)')
+    cmdline_parser.add_argument('--fill', metavar=('MIN', 'MAX'), type=float, nargs=2, default=[0.1, 0.3], help='The range of the fraction of filled squares (default: 0.1 0.3)')
+    cmdline_parser.add_argument('--playmode', type=str, choices=['classic', 'rows', 'border', 'random'], default='rows', help='The playing mode, which determines the ownership of the filled squares (default: rows)')
+    cmdline_parser.add_argument('--seed', type=int, help='The seed of the random number generator')
+    cmdline_parser.add_argument('--output', metavar='DIRECTORY', type=str, default='boards/generated', help='The directory to which the board files are written (default: boards/generated)')
+    cmdline_parser.add_argument('--corpus', metavar='FILE', type=str, help='Write the positions to a single corpus file with one position per line, instead of separate board files')
+    args = cmdline_parser.parse_args()
+
+    if not 0 <= args.fill[0] <= args.fill[1] < 1:
+        cmdline_parser.error('The fill range must satisfy 0 <= MIN <= MAX < 1.')
+    positions = generate_positions(args.rows, args.columns, args.count, (args.fill[0], args.fill[1]), args.playmode, args.seed)
+
+    if args.corpus:
+        count = write_corpus(args.corpus, positions, args.playmode)
+        print(f'Wrote {count} positions to {args.corpus}')
+        return
+
+    directory = Path(args.output)
+    directory.mkdir(parents=True, exist_ok=True)
+    width = len(str(args.count))
+    for k, game_state in enumerate(positions, 1):
+        path = directory / f'{args.playmode}-{args.rows}x{args.columns}-{k:0{width}}.txt'
+        path.write_text(print_game_state(game_state))
+    print(f'Wrote {args.count} positions to {directory}')
+
+
+if __name__ == '__main__':
+    main()
@@ -7,7 +7,14 @@
 import argparse
 import multiprocessing
 from pathlib import Path
-from simulate_game import play_game
+from typing import Optional
+from competitive_sudoku.checkpoint import Checkpoint
+from competitive_sudoku.clock import TimeControl, parse_time_control
+from competitive_sudoku.knowledge import KnowledgeCache
+from competitive_sudoku.limits import ResourceLimits
+from competitive_sudoku.rating import SPRT
+from competitive_sudoku.records import GameRecorder
+from simulate_game import GameConfig, close_sessions, run_game_config
 
 
 # Prints 1 instead of 1.0
@@ -15,35 +22,79 @@ def print_score(x: float) -> str:
     return '0' if x == 0 else str(x).rstrip('0').rstrip('.')
 
 
-# Play a match between player and opponent.
-def play_match(player: str, opponent: str, count: int, board_file: str, calculation_time: float, verbose=False, warmup=False) -> None:
+# Play a match between player and opponent. If sprt is set, the match is stopped as soon as the test accepts a
+# hypothesis about the Elo difference between player and opponent, and count is the maximum number of games.
+# The results of completed games are written to a checkpoint file; if resume is set, the games in this file are
+# not played again, and if restart is set, the file is discarded. Without either, an existing checkpoint file with
+# results is an error.
+def play_match(player: str, opponent: str, count: int, board_file: str, calculation_time: float, verbose=False, warmup=False, record_file: Optional[str] = None, time_control: Optional[TimeControl] = None, ponder=False, sprt: Optional[SPRT] = None, resume=False, limits: Optional[ResourceLimits] = None, grace_period: float = 0.0, profile_dir: Optional[str] = None, cache: Optional[KnowledgeCache] = None, restart=False) -> None:
     player_score = 0.0
     opponent_score = 0.0
+    wins, draws, losses = 0, 0, 0
     result_lines = []
-
-    for i in range(1, count+1):
-        print(f'Playing game {i}')
-        player_starts = i % 2 == 1
-        first = player if player_starts else opponent
-        second = opponent if player_starts else player
-        result = play_game(board_file, first, second, calculation_time, verbose, warmup and i == 1)
-
-        result_line = f'{first} - {second} {print_score(result[0])}-{print_score(result[1])}\n'
-        result_lines.append(result_line)
-        print(result_line)
-
-        if player_starts:
-            player_score += result[0]
-            opponent_score += result[1]
-        else:
-            player_score += result[1]
-            opponent_score += result[0]
+    time_text = f'clock={time_control}' if time_control else f'time={calculation_time}'
+    output_file = f'{player}-{opponent}-board={Path(board_file).stem}-{time_text}-match-result.txt'
+    checkpoint = Checkpoint(output_file.replace('-match-result.txt', '-match-checkpoint.jsonl'), resume, restart)
+    recorder = GameRecorder(record_file) if record_file else None
+    warmed_up = False
+
+    try:
+        for i in range(1, count+1):
+            player_starts = i % 2 == 1
+            first = player if player_starts else opponent
+            second = opponent if player_starts else player
+            key = f'{i}: {first} - {second}'
+            if key in checkpoint:
+                print(f'Game {i} was restored from {checkpoint.path}')
+                result = tuple(checkpoint.result(key))
+            else:
+                print(f'Playing game {i}')
+                config = GameConfig(first, second, board_file, 'rows', calculation_time, time_control, ponder, warmup and not warmed_up, limits, grace_period, i, profile_dir, cache)
+                records = run_game_config(config, verbose)
+                # without --verbose the output of the game only tells why it ended
+                print(records[-1].get('output', ''), end='')
+                if recorder:
+                    for record in records:
+                        recorder.append(record)
+                result = tuple(records[-1]['result'])
+                warmed_up = True
+                checkpoint.add(key, list(result))
+
+            result_line = f'{first} - {second} {print_score(result[0])}-{print_score(result[1])}\n'
+            result_lines.append(result_line)
+            print(result_line)
+
+            if player_starts:
+                player_score += result[0]
+                opponent_score += result[1]
+            else:
+                player_score += result[1]
+                opponent_score += result[0]
+
+            if sprt:
+                game_score = result[0] if player_starts else result[1]
+                wins += game_score == 1
+                draws += game_score == 0.5
+                losses += game_score == 0
+                status = sprt.status(wins, draws, losses)
+                print(f'SPRT: W-D-L {wins}-{draws}-{losses}, LLR {sprt.llr(wins, draws, losses):.2f} [{sprt.lower_bound:.2f}, {sprt.upper_bound:.2f}]')
+                if status:
+                    elo = sprt.elo1 if status == 'H1' else sprt.elo0
+                    result_line = f'SPRT: {status} (elo = {elo:g}) accepted after {i} games\n'
+                    result_lines.append(result_line)
+                    print(result_line)
+                    break
+    finally:
+        # the checkpoint is also closed when a game fails, such that its last results are on disk
+        close_sessions()
+        checkpoint.close()
+        if recorder:
+            recorder.close()
 
     result_line = f'Match result: {player} - {opponent} {print_score(player_score)}-{print_score(opponent_score)}'
     result_lines.append(result_line)
     print(result_line)
 
-    output_file = f'{player}-{opponent}-board={Path(board_file).stem}-time={calculation_time}-match-result.txt'
     Path(output_file).write_text('\n'.join(result_lines))
 
 
@@ -55,11 +106,31 @@ def main():
     cmdline_parser.add_argument('--count', type=int, default=6, help='The number of games (default: 6)')
     cmdline_parser.add_argument('--board', type=str, default='boards/empty-2x2.txt', help='The text file containing the start position (default: boards/empty-2x2.txt)')
     cmdline_parser.add_argument('--time', type=float, default=3.0, help="The time (in seconds) for computing a move (default: 3.0)")
+    cmdline_parser.add_argument('--clock', metavar='TOTAL[+INCREMENT]', type=parse_time_control, help="Use a bank of TOTAL seconds per player, plus INCREMENT seconds per move, instead of a fixed time per move")
+    cmdline_parser.add_argument('--ponder', help="Let players that implement SudokuAI.ponder search during the opponent's turn", action='store_true')
+    cmdline_parser.add_argument('--sprt', metavar=('ELO0', 'ELO1'), type=float, nargs=2, help="Stop the match as soon as a sequential probability ratio test accepts H0: elo = ELO0 or H1: elo = ELO1 for the first player; --count is then the maximum number of games")
+    cmdline_parser.add_argument('--alpha', type=float, default=0.05, help="The probability of accepting H1 when H0 is true (default: 0.05)")
+    cmdline_parser.add_argument('--beta', type=float, default=0.05, help="The probability of accepting H0 when H1 is true (default: 0.05)")
     cmdline_parser.add_argument('--verbose', help="Give verbose output", action="store_true")
     cmdline_parser.add_argument('--warm-up', help='Let the engines play a move before the start of the game', action='store_true')
+    cmdline_parser.add_argument('--record', metavar='FILE', type=str, help='Append a structured record of every game to a JSON lines file')
+    cmdline_parser.add_argument('--memory-limit', metavar='MB', type=float, help='Limit the address space of the player processes to MB megabytes')
+    cmdline_parser.add_argument('--cpu-limit', metavar='SECONDS', type=float, help='Limit the CPU time of each player to SECONDS per game')
+    cmdline_parser.add_argument('--grace', metavar='SECONDS', type=float, default=0.0, help='Interrupt the players at the end of a turn and give them SECONDS to save their data before they are killed (default: 0)')
+    cmdline_parser.add_argument('--profile', metavar='DIR', type=str, help='Sample the call stacks of the players, and add them to DIR/PLAYER.folded in the collapsed stack format of flamegraph.pl')
+    cmdline_parser.add_argument('--cache', metavar='DIR', type=str, help='Let the players keep data in DIR across games and matches that start from the same position')
+    cmdline_parser.add_argument('--cache-size', metavar='MB', type=float, default=100.0, help='The maximum size of the knowledge cache in megabytes (default: 100)')
+    cmdline_parser.add_argument('--resume', help='Continue an interrupted match with the same settings, using the results in its checkpoint file', action='store_true')
+    cmdline_parser.add_argument('--restart', help='Discard the checkpoint file of an earlier match with the same settings', action='store_true')
     args = cmdline_parser.parse_args()
-
-    play_match(args.first, args.second, args.count, args.board, args.time, args.verbose, args.warm_up)
+    if args.resume and args.restart:
+        cmdline_parser.error('--resume and --restart cannot be combined')
+
+    sprt = SPRT(args.sprt[0], args.sprt[1], args.alpha, args.beta) if args.sprt else None
+    try:
+        play_match(args.first, args.second, args.count, args.board, args.time, args.verbose, args.warm_up, args.record, args.clock, args.ponder, sprt, args.resume, ResourceLimits.from_options(args.memory_limit, args.cpu_limit), args.grace, args.profile, KnowledgeCache.from_options(args.cache, args.cache_size), args.restart)
+    except FileExistsError as err:
+        cmdline_parser.error(str(err))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+
+#  (C) Copyright Wieger Wesselink 2024. Distributed under the GPL-3.0-or-later
+#  Software License, (See accompanying file LICENSE or copy at
+#  https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import argparse
+import io
+import itertools
+import multiprocessing
+import os
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from competitive_sudoku.checkpoint import Checkpoint
+from competitive_sudoku.clock import TimeControl, parse_time_control
+from competitive_sudoku.limits import ResourceLimits
+from competitive_sudoku.rating import GameOutcome, SPRT, estimate_elo
+from play_match import print_score
+from simulate_game import GameConfig, GameResult, run_game_config, stream_games
+
+
+class TournamentGame(object):
+    """
+    A game in the schedule of a tournament.
+    """
+
+    def __init__(self, game_id: int, first: str, second: str, board_file: str, playmode: str, pairing: Tuple[str, str]):
+        """
+        @param game_id: The number of the game in the schedule.
+        @param first: The module name of the first player.
+        @param second: The module name of the second player.
+        @param board_file: A text file containing the start position.
+        @param playmode: The playing mode (classic, rows, border, random).
+        @param pairing: The pairing to which the game belongs, regardless of the colours.
+        """
+        self.game_id = game_id
+        self.first = first
+        self.second = second
+        self.board_file = board_file
+        self.playmode = playmode
+        self.pairing = pairing
+
+    def __str__(self):
+        return f'{self.first} - {self.second} (board={Path(self.board_file).stem}, playmode={self.playmode})'
+
+
+def schedule_games(players: List[str], boards: List[str], playmodes: List[str], rounds: int, gauntlet: Optional[str] = None) -> List[TournamentGame]:
+    """
+    Creates the schedule of a tournament. Every pairing is played with both colours, on every board and in every
+    playing mode.
+    @param players: The module names of the players.
+    @param boards: The text files containing the start positions.
+    @param playmodes: The playing modes.
+    @param rounds: The number of times each pairing is played with each colour.
+    @param gauntlet: If set, only the pairings of this player against the other players are played.
+    """
+    if gauntlet is None:
+        pairings = list(itertools.combinations(players, 2))
+    else:
+        pairings = [(gauntlet, player) for player in players if player != gauntlet]
+    games = []
+    for _ in range(rounds):
+        for board_file in boards:
+            for playmode in playmodes:
+                for player, opponent in pairings:
+                    for first, second in ((player, opponent), (opponent, player)):
+                        games.append(TournamentGame(len(games) + 1, first, second, board_file, playmode, (player, opponent)))
+    return games
+
+
+def checkpoint_key(game: TournamentGame) -> str:
+    """
+    Returns the key that identifies a game in a checkpoint file.
+    """
+    return f'{game.game_id}: {game}'
+
+
+def game_config(game: TournamentGame, calculation_time: float, time_control: Optional[TimeControl], limits: Optional[ResourceLimits] = None) -> GameConfig:
+    """
+    Returns the settings of a game of a tournament.
+    """
+    return GameConfig(game.first, game.second, game.board_file, game.playmode, calculation_time, time_control,
+                      limits=limits, game_id=game.game_id)
+
+
+def run_game(game: TournamentGame, calculation_time: float, time_control: Optional[TimeControl], limits: Optional[ResourceLimits] = None) -> Tuple[int, GameResult]:
+    """
+    Plays a game of a tournament in the current process. The output of the game is discarded.
+    @return: The number of the game and its result.
+    """
+    records = run_game_config(game_config(game, calculation_time, time_control, limits))
+    return game.game_id, tuple(records[-1]['result'])
+
+
+def format_crosstable(players: List[str], outcomes: List[GameOutcome]) -> str:
+    """
+    Formats the results of a tournament as a crosstable, ordered by Elo rating.
+    @param players: The module names of the players.
+    @param outcomes: The results of the games that were played.
+    """
+    ratings = estimate_elo(outcomes)
+    points = {(a, b): 0.0 for a in players for b in players}
+    games = {(a, b): 0 for a in players for b in players}
+    for player1, player2, score1 in outcomes:
+        points[player1, player2] += score1
+        points[player2, player1] += 1 - score1
+        games[player1, player2] += 1
+        games[player2, player1] += 1
+    players = sorted(players, key=lambda player: -ratings.get(player, (0.0, 0.0))[0])
+
+    width = max(len(player) for player in players)
+    out = io.StringIO()
+    out.write(f'{"":3} {"player":{width}} {"elo":>6} {"+/-":>6} {"games":>6} {"score":>6}')
+    for k in range(len(players)):
+        out.write(f' {k + 1:>7}')
+    out.write('\n')
+    for rank, player in enumerate(players, 1):
+        elo, error = ratings.get(player, (0.0, float('inf')))
+        total_games = sum(games[player, opponent] for opponent in players)
+        total_points = sum(points[player, opponent] for opponent in players)
+        percentage = f'{100 * total_points / total_games:.0f}%' if total_games else '-'
+        out.write(f'{rank:>3} {player:{width}} {elo:>6.0f} {error:>6.0f} {total_games:>6} {percentage:>6}')
+        for opponent in players:
+            if opponent == player:
+                cell = '*'
+            elif games[player, opponent] == 0:
+                cell = '-'
+            else:
+                cell = f'{print_score(points[player, opponent])}/{games[player, opponent]}'
+            out.write(f' {cell:>7}')
+        out.write('\n')
+    return out.getvalue()
+
+
+def play_tournament(players: List[str],
+                    boards: List[str],
+                    playmodes: List[str],
+                    rounds: int,
+                    calculation_time: float,
+                    time_control: Optional[TimeControl] = None,
+                    gauntlet: Optional[str] = None,
+                    workers: Optional[int] = None,
+                    output_file: str = 'tournament-result.txt',
+                    sprt: Optional[SPRT] = None,
+                    resume: bool = False,
+                    limits: Optional[ResourceLimits] = None,
+                    restart: bool = False
+                   ) -> List[GameOutcome]:
+    """
+    Plays a round robin or gauntlet tournament, using a pool of worker processes.
+    @param players: The module names of the players.
+    @param boards: The text files containing the start positions.
+    @param playmodes: The playing modes.
+    @param rounds: The number of times each pairing is played with each colour.
+    @param calculation_time: The amount of time in seconds for computing a move.
+    @param time_control: If set, the games are played with a clock instead of a fixed time per move.
+    @param gauntlet: If set, only the pairings of this player against the other players are played.
+    @param workers: The number of games that are played simultaneously (default: the number of cores).
+    @param output_file: The file to which the crosstable is written.
+    @param sprt: If set, the remaining games of a pairing are cancelled as soon as the test accepts a hypothesis
+     about the Elo difference between the two players of the pairing.
+    @param resume: If True, the games in the checkpoint file of an interrupted tournament are not played again. The
+     checkpoint file is named after output_file.
+    @param limits: If set, the memory and CPU time of the players are limited in every game.
+    @param restart: If True, an existing checkpoint file is discarded. Without resume or restart, an existing
+     checkpoint file with results raises a FileExistsError.
+    @return: The results of the games.
+    """
+    if gauntlet is not None and gauntlet not in players:
+        players = [gauntlet] + players
+    boards = [os.path.abspath(board_file) for board_file in boards]
+    schedule = schedule_games(players, boards, playmodes, rounds, gauntlet)
+    workers = workers or os.cpu_count() or 1
+    print(f'Playing {len(schedule)} games with {workers} workers')
+
+    outcomes = []
+    records = {}  # the wins, draws and losses of the first player of every pairing
+    decided = set()  # the pairings for which the SPRT accepted a hypothesis
+    verdicts = []
+
+    def add_outcome(game: TournamentGame, result: GameResult) -> None:
+        outcomes.append((game.first, game.second, result[0]))
+        print(f'Game {game.game_id}: {game} {print_score(result[0])}-{print_score(result[1])}')
+        if sprt and game.pairing not in decided:
+            score = result[0] if game.first == game.pairing[0] else result[1]
+            wins, draws, losses = records.get(game.pairing, (0, 0, 0))
+            wins, draws, losses = wins + (score == 1), draws + (score == 0.5), losses + (score == 0)
+            records[game.pairing] = (wins, draws, losses)
+            status = sprt.status(wins, draws, losses)
+            if status:
+                decided.add(game.pairing)
+                elo = sprt.elo1 if status == 'H1' else sprt.elo0
+                verdict = f'SPRT {game.pairing[0]} - {game.pairing[1]}: {status} (elo = {elo:g}) accepted, W-D-L {wins}-{draws}-{losses}'
+                verdicts.append(verdict)
+                print(verdict)
+
+    with Checkpoint(str(Path(output_file).with_suffix('.checkpoint.jsonl')), resume, restart) as checkpoint:
+        remaining = []
+        for game in schedule:
+            if checkpoint_key(game) in checkpoint:
+                add_outcome(game, tuple(checkpoint.result(checkpoint_key(game))))
+            else:
+                remaining.append(game)
+        if len(remaining) < len(schedule):
+            print(f'Restored {len(schedule) - len(remaining)} games from {checkpoint.path}')
+
+        games = {game.game_id: game for game in remaining}
+        configs = (game_config(game, calculation_time, time_control, limits) for game in remaining)
+        # the games of a pairing that is decided by the SPRT are not started anymore
+        for record in stream_games(configs, workers, skip=lambda config: games[config.game_id].pairing in decided):
+            game = games[record['game']]
+            if record['type'] == 'game-error':
+                print(f'Error: game {game.game_id} {game} failed:\n{record["error"]}')
+            elif record['type'] == 'game-end':
+                result = tuple(record['result'])
+                checkpoint.add(checkpoint_key(game), list(result))
+                add_outcome(game, result)
+
+    crosstable = format_crosstable(players, outcomes) + ''.join(verdict + '\n' for verdict in verdicts)
+    print(crosstable)
+    Path(output_file).write_text(crosstable)
+    return outcomes
+
+
+def main():
+    multiprocessing.set_start_method('fork')
+    cmdline_parser = argparse.ArgumentParser(description='Play a round robin tournament between sudoku players.')
+    cmdline_parser.add_argument('players', help="The module names of the players' SudokuAI classes", nargs='+')
+    cmdline_parser.add_argument('--gauntlet', metavar='PLAYER', type=str, help='Only play the games of PLAYER against the other players')
+    cmdline_parser.add_argument('--boards', metavar='FILE', nargs='+', default=['boards/empty-2x2.txt'], help='The text files containing the start positions (default: boards/empty-2x2.txt)')
+    cmdline_parser.add_argument('--playmodes', nargs='+', choices=['classic', 'rows', 'border', 'random'], default=['rows'], help='The playing modes (default: rows)')
+    cmdline_parser.add_argument('--rounds', type=int, default=1, help='The number of games of every pairing with each colour, per board and playing mode (default: 1)')
+    cmdline_parser.add_argument('--time', type=float, default=1.0, help="The time (in seconds) for computing a move (default: 1.0)")
+    cmdline_parser.add_argument('--clock', metavar='TOTAL[+INCREMENT]', type=parse_time_control, help="Use a bank of TOTAL seconds per player, plus INCREMENT seconds per move, instead of a fixed time per move")
+    cmdline_parser.add_argument('--workers', type=int, help='The number of games that are played simultaneously (default: the number of cores)')
+    cmdline_parser.add_argument('--sprt', metavar=('ELO0', 'ELO1'), type=float, nargs=2, help="Stop a pairing as soon as a sequential probability ratio test accepts H0: elo = ELO0 or H1: elo = ELO1; --rounds is then the maximum")
+    cmdline_parser.add_argument('--alpha', type=float, default=0.05, help="The probability of accepting H1 when H0 is true (default: 0.05)")
+    cmdline_parser.add_argument('--beta', type=float, default=0.05, help="The probability of accepting H0 when H1 is true (default: 0.05)")
+    cmdline_parser.add_argument('--output', metavar='FILE', type=str, default='tournament-result.txt', help='The file to which the crosstable is written (default: tournament-result.txt)')
+    cmdline_parser.add_argument('--memory-limit', metavar='MB', type=float, help='Limit the address space of the player processes to MB megabytes')
+    cmdline_parser.add_argument('--cpu-limit', metavar='SECONDS', type=float, help='Limit the CPU time of each player to SECONDS per game')
+    cmdline_parser.add_argument('--resume', help='Continue an interrupted tournament with the same settings, using the results in its checkpoint file', action='store_true')
+    cmdline_parser.add_argument('--restart', help='Discard the checkpoint file of an earlier tournament with the same output file', action='store_true')
+    args = cmdline_parser.parse_args()
+    if args.resume and args.restart:
+        cmdline_parser.error('--resume and --restart cannot be combined')
+
+    sprt = SPRT(args.sprt[0], args.sprt[1], args.alpha, args.beta) if args.sprt else None
+    try:
+        play_tournament(args.players, args.boards, args.playmodes, args.rounds, args.time, args.clock, args.gauntlet, args.workers, args.output, sprt, args.resume, ResourceLimits.from_options(args.memory_limit, args.cpu_limit), args.restart)
+    except FileExistsError as err:
+        cmdline_parser.error(str(err))
+
+
+if __name__ == '__main__':
+    main()
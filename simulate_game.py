@@ -5,26 +5,49 @@
 #  https://www.gnu.org/licenses/gpl-3.0.txt)
 
 import argparse
+import concurrent.futures
+import contextlib
 import copy
 import importlib
+import io
 import multiprocessing
 import platform
 import re
+import signal
+import sys
+import tempfile
+import threading
 import time
 import os
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
 from competitive_sudoku.execute import solve_sudoku
-from competitive_sudoku.sudoku import GameState, SudokuBoard, Move, TabooMove, parse_game_state, \
-    SudokuSettings, print_game_state, pretty_print_game_state, allowed_squares
-from competitive_sudoku.sudokuai import SudokuAI
+from competitive_sudoku.sudoku import GameState, SudokuBoard, Move, TabooMove, Square, parse_game_state, \
+    SudokuSettings, allowed_squares, parse_properties
+from competitive_sudoku.sudokuai import SearchBudget, SudokuAI
+from competitive_sudoku.bestmove import BestMoveSlot
+from competitive_sudoku.clock import Clock, TimeControl, parse_time_control
+from competitive_sudoku.knowledge import KnowledgeCache
+from competitive_sudoku.limits import LIMIT_CPU, LIMIT_MEMORY, ResourceLimits, address_space_size
+from competitive_sudoku.metrics import TurnMeter, TurnMetrics
+from competitive_sudoku.preemption import preempt, run_preemptible
+from competitive_sudoku.profiler import merge_profile, profiling_supported
+from competitive_sudoku.telemetry import Telemetry, format_telemetry
+from competitive_sudoku.gamelog import GameLog, LOG_LEVELS, LOG_QUIET, LOG_MOVES, LOG_BOARDS, render_game_state, \
+    render_move_diff
+from competitive_sudoku.records import GameRecorder, RecordCollector, VERDICT_ACCEPTED, VERDICT_TABOO, VERDICT_TABOO_PLAYED, \
+    VERDICT_INVALID, VERDICT_ILLEGAL, VERDICT_NO_MOVE, VERDICT_CANNOT_MOVE, VERDICT_TIME_FORFEIT, VERDICT_MEMORY_LIMIT, \
+    VERDICT_CPU_LIMIT
 
 SUDOKU_SOLVER = 'bin\\solve_sudoku.exe' if platform.system() == 'Windows' else 'bin/solve_sudoku'
 #SUDOKU_SOLVER = 'bin\\Windows\\solve_sudoku.exe' if platform.system() == 'Windows' else 'bin/solve_sudoku'
 
 GameResult = Tuple[float, float]
 
+# The maximum time in seconds that SudokuAI.prepare may take before every game
+PREPARE_TIME_LIMIT = 10.0
+
 
 def check_oracle() -> None:
     board_text = '''2 2
@@ -43,36 +66,124 @@ def check_oracle() -> None:
 
 
 def warmup_players(player1: SudokuAI, player2: SudokuAI, calculation_time: float = 2.0) -> None:
+    """
+    Lets the players compute moves on an empty board, such that the start of the player processes is fast during
+    the game. This is only needed with the spawn start method (Windows, macOS): forked processes start from this
+    process, in which the players have been imported and prepared already, see SudokuAI.prepare. With the fork
+    start method the warm-up is skipped.
+    """
+    if multiprocessing.get_start_method() == 'fork':
+        print('-- skipped warm-up, since the player processes are forked from the prepared players --')
+        return
+    print('-- started warm-up --')
     initial_board = SudokuBoard(3, 3)
     game_state = GameState(initial_board, copy.deepcopy(initial_board))
     move_number = 0
     number_of_moves = 2
 
-    with multiprocessing.Manager() as manager:
-        # use a lock to protect assignments to best_move
-        lock = multiprocessing.Lock()
-        player1.lock = lock
-        player2.lock = lock
-
-        # use shared variables to store the best move
-        player1.best_move = manager.list([0, 0, 0])
-        player2.best_move = manager.list([0, 0, 0])
-
-        while move_number < number_of_moves:
-            player, player_number = (player1, 1) if len(game_state.moves) % 2 == 0 else (player2, 2)
-            player.best_move[0] = 0
-            player.best_move[1] = 0
-            player.best_move[2] = 0
-            try:
-                process = multiprocessing.Process(target=player.compute_best_move, args=(game_state,))
-                process.start()
-                time.sleep(calculation_time)
-                lock.acquire()
-                process.terminate()
-                lock.release()
-            except Exception as err:
-                print(f'Error: an exception occurred during warm-up:\n{err}')
-            move_number = move_number + 1
+    # use a lock per player to protect its save files
+    player1.lock = multiprocessing.Lock()
+    player2.lock = multiprocessing.Lock()
+
+    # use shared memory to store the best move
+    player1.best_move = BestMoveSlot()
+    player2.best_move = BestMoveSlot()
+
+    while move_number < number_of_moves:
+        player, player_number = (player1, 1) if len(game_state.moves) % 2 == 0 else (player2, 2)
+        player.best_move.publish(0, 0, 0)
+        try:
+            process = multiprocessing.Process(target=player.compute_best_move, args=(game_state,))
+            process.start()
+            time.sleep(calculation_time)
+            player.lock.acquire()
+            process.terminate()
+            player.lock.release()
+        except Exception as err:
+            print(f'Error: an exception occurred during warm-up:\n{err}')
+        move_number = move_number + 1
+    print('-- finished warm-up --')
+
+
+class PrepareTimeout(BaseException):
+    """
+    Raised in SudokuAI.prepare when it takes more than PREPARE_TIME_LIMIT seconds, see prepare_player.
+    """
+    pass
+
+
+def prepare_player(player: SudokuAI, game_state: GameState, time_limit: float) -> None:
+    """
+    Calls SudokuAI.prepare in the current process, such that the player processes inherit the data that it builds.
+    The player gets a copy of game_state, such that it cannot change the game. The call is interrupted with
+    PrepareTimeout after time_limit seconds (not on Windows, and only in the main thread).
+    """
+    def on_timeout(signum, frame):
+        raise PrepareTimeout()
+
+    game_state = copy.deepcopy(game_state)
+
+    use_timer = hasattr(signal, 'setitimer') and threading.current_thread() is threading.main_thread()
+    if use_timer:
+        previous = signal.signal(signal.SIGALRM, on_timeout)
+        signal.setitimer(signal.ITIMER_REAL, time_limit)
+    try:
+        player.prepare(game_state)
+    finally:
+        if use_timer:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+
+
+def player_name(player: SudokuAI) -> str:
+    """
+    Returns the module name of a player, e.g. 'random_player'.
+    """
+    module = type(player).__module__
+    return module[:-len('.sudokuai')] if module.endswith('.sudokuai') else module
+
+
+def can_ponder(player: SudokuAI) -> bool:
+    """
+    Returns True if the player overrides SudokuAI.ponder.
+    """
+    return type(player).ponder is not SudokuAI.ponder
+
+
+def oracle_input(game_state: GameState, move: Move, player_squares: Optional[List[Square]]) -> Tuple[str, str]:
+    """
+    Returns the board text and the command line options for checking a move with the sudoku solver.
+    @param game_state: The game state before the move.
+    @param move: The move that is checked.
+    @param player_squares: The squares where the player is allowed to play, or None if all squares are allowed.
+    """
+    board_text = str(game_state.board)
+    options = f'--move "{game_state.board.square2index(move.square)} {move.value}"'
+    if player_squares is not None:
+        allowed = ' '.join(str(game_state.board.square2index(square)) for square in player_squares)
+        options += f' --allowed="{allowed}"'
+    return board_text, options
+
+
+def oracle_verdict(output: str) -> Tuple[Optional[str], int]:
+    """
+    Interprets the output of the sudoku solver for a move.
+    @param output: The output of the sudoku solver.
+    @return: The verdict of the move (VERDICT_INVALID, VERDICT_ILLEGAL, VERDICT_TABOO or VERDICT_ACCEPTED, or None
+     if the output contains none of them) and its reward.
+    """
+    if 'Invalid move' in output:
+        return VERDICT_INVALID, 0
+    if 'Illegal move' in output:
+        return VERDICT_ILLEGAL, 0
+    if 'has no solution' in output:
+        return VERDICT_TABOO, 0
+    if 'The score is' in output:
+        match = re.search(r'The score is ([-\d]+)', output)
+        if match:
+            return VERDICT_ACCEPTED, int(match.group(1))
+        raise RuntimeError(f'Unexpected output of sudoku solver: "{output}".')
+    return None, 0
 
 
 def simulate_game(game_state: GameState,
@@ -81,7 +192,16 @@ def simulate_game(game_state: GameState,
                   calculation_time: float = 0.5,
                   verbose=True,
                   warmup=False,
-                  playmode='rows'
+                  playmode='rows',
+                  recorder: Optional[GameRecorder] = None,
+                  log_level: Optional[int] = None,
+                  time_control: Optional[TimeControl] = None,
+                  ponder=False,
+                  metrics: Optional[Callable[[TurnMetrics], None]] = None,
+                  limits: Optional[ResourceLimits] = None,
+                  grace_period: float = 0.0,
+                  profile_dir: Optional[str] = None,
+                  cache: Optional[KnowledgeCache] = None
                   ) -> GameResult:
     """
     Simulates a game between two instances of SudokuAI.
@@ -90,125 +210,383 @@ def simulate_game(game_state: GameState,
     @param player2: The AI of the second player.
     @param calculation_time: The amount of time in seconds for computing the best move.
     @param verbose: Print the positions and the moves.
-    @param warmup: Let the engines play a move before the start of the game.
+    @param warmup: Let the engines play a move before the start of the game. This is skipped with the fork start
+     method, see warmup_players.
+    @param playmode: The playing mode (classic, rows, border, random).
+    @param recorder: If set, a structured record of every move and of the result is written to it.
+    @param log_level: The log level (LOG_QUIET, LOG_MOVES or LOG_BOARDS). If it is None, it is derived from verbose.
+    @param time_control: If set, each player gets a bank of time for the whole game instead of a fixed time per move.
+     A player may use its time until compute_best_move returns, and loses the game if its time runs out.
+    @param ponder: Let a player that implements SudokuAI.ponder search during the turn of its opponent.
+    @param metrics: If set, it is called with the CPU, memory and overhead measurements of every turn. The
+     measurements are also written to the recorder, if it is set.
+    @param limits: If set, the memory and CPU time of the players are limited. A player that exceeds a limit loses
+     the game. The limits also apply to pondering, and the CPU time of pondering counts against the budget.
+    @param grace_period: If positive, the players are interrupted at the end of a turn instead of being killed, and
+     get at most grace_period seconds to save their data in SudokuAI.on_preempt. The move that was proposed before
+     the interruption is played.
+    @param profile_dir: If set, the call stacks of the player processes are sampled, and the samples of every player
+     are added to the file {profile_dir}/{module name}.folded in the collapsed stack format of flamegraph.pl.
+    @param cache: If set, the players can keep data across games that start from the same position, see
+     SudokuAI.cache_dir. The least recently played positions are removed from the cache at the end of the game.
     @return The result of the game.
     """
 
-    def log(text):
-        if verbose:
-            print(text)
+    game_log = GameLog((LOG_BOARDS if verbose else LOG_QUIET) if log_level is None else log_level)
+
+    def log(message, level=LOG_BOARDS):
+        game_log.log(level, message)
+
+    def record_move(player_number, move, verdict, reward, think_time, player_squares, turn_metrics=None):
+        if game_log.level == LOG_MOVES:
+            log(lambda: render_move_diff(game_state, player_number, move, verdict, reward), LOG_MOVES)
+        if turn_metrics:
+            turn_metrics.think_time = think_time
+            if metrics:
+                metrics(turn_metrics)
+        if recorder:
+            recorder.record_move(player_number, move, verdict, reward, think_time, game_state.scores,
+                                 None if player_squares is None else len(player_squares),
+                                 None if clock is None else clock.remaining,
+                                 None if turn_metrics is None else turn_metrics.as_dict())
+
+    def end_game(result: GameResult, reason: str) -> GameResult:
+        if recorder:
+            recorder.end_game(result, reason, game_state.scores)
+        if cache:
+            for path in cache.evict([player1.cache_dir, player2.cache_dir]):
+                log(f'Removed {path} from the knowledge cache')
+            cache.release([player1.cache_dir, player2.cache_dir])
+        return result
 
     move_number = 0
     number_of_moves = game_state.board.squares.count(SudokuBoard.empty)
+    clock = Clock(time_control) if time_control else None
+    # only meter the players when it is asked for, since the metered runtime changes how the player processes run
+    meter = TurnMeter(limits) if metrics or limits else None
+    # the pondering processes run under the same limits, and their CPU time is counted against the budget of the opponent
+    ponder_meter = TurnMeter(limits) if meter and ponder else None
+    cpu_budget = limits.cpu_time if limits else None
+    cpu_used = [0.0, 0.0]
+    ply = 0
+    if profile_dir and not profiling_supported():
+        print('Warning: profiling is not supported on this platform.')
+        profile_dir = None
+    if profile_dir:
+        profile_dir = os.path.abspath(profile_dir)
+        os.makedirs(profile_dir, exist_ok=True)
+
+    if recorder:
+        recorder.start_game(game_state, player_name(player1), player_name(player2), playmode, calculation_time,
+                            None if time_control is None else str(time_control))
+
+    for player in (player1, player2):
+        player.cache_dir = cache.directory_for(player_name(player), game_state, playmode) if cache else None
 
     log('Initial state')
-    if SudokuSettings.print_ascii_states:
-        log(print_game_state(game_state))
-    else:
-        log(pretty_print_game_state(game_state))
+    log(lambda: render_game_state(game_state))
+
+    # build the static data of the players once, such that it is inherited by the player processes; the memory that
+    # it takes is not counted against the memory limit of the opponent
+    prepared_memory = [0, 0]
+    for player_number, player in ((1, player1), (2, player2)):
+        prepare_start = time.perf_counter()
+        size = address_space_size()
+        try:
+            prepare_player(player, game_state, PREPARE_TIME_LIMIT)
+        except PrepareTimeout:
+            log(f'Error: preparing {player_name(player)} took more than {PREPARE_TIME_LIMIT:g}s and was interrupted')
+        except Exception as err:
+            log(f'Error: an exception occurred while preparing {player_name(player)}:\n{err}')
+        if size is not None:
+            prepared_memory[player_number - 1] = max(0, address_space_size() - size)
+        log(f'Prepared {player_name(player)} in {time.perf_counter() - prepare_start:.3f}s')
 
     if warmup:
-        print('-- started warm-up --')
         warmup_players(player1, player2, 2.0)
-        print('-- finished warm-up --')
-
-    with multiprocessing.Manager() as manager:
-        # use a lock to protect assignments to best_move
-        lock = multiprocessing.Lock()
-        player1.lock = lock
-        player2.lock = lock
-
-        # use shared variables to store the best move
-        player1.best_move = manager.list([0, 0, 0])
-        player2.best_move = manager.list([0, 0, 0])
-
-        # used to detect if the game has ended
-        finished_players = set()
-
-        while move_number < number_of_moves and len(finished_players) < 2:
-            player_number = game_state.current_player
-            player = player1 if player_number == 1 else player2
-            log(f'-----------------------------\nCalculate a move for player {player_number}')
-            player_squares = None if playmode == 'classic' else game_state.player_squares()
-            if player_squares == []:
-                log(f'Player {player_number} cannot move')
-                finished_players.add(player_number)
-                game_state.current_player = 3 - game_state.current_player
-                continue
+
+    # use a lock per player to protect its save files; the best move is read without a lock, see BestMoveSlot
+    player1.lock = multiprocessing.Lock()
+    player2.lock = multiprocessing.Lock()
+
+    # use shared memory to store the best move, see BestMoveSlot
+    player1.best_move = BestMoveSlot()
+    player2.best_move = BestMoveSlot()
+
+    # use shared memory for the statistics of the search
+    player1.telemetry = Telemetry(player1.telemetry_phases)
+    player2.telemetry = Telemetry(player2.telemetry_phases)
+
+    # used to detect if the game has ended
+    finished_players = set()
+
+    while move_number < number_of_moves and len(finished_players) < 2:
+        player_number = game_state.current_player
+        player = player1 if player_number == 1 else player2
+        ply = ply + 1
+        log(f'-----------------------------\nCalculate a move for player {player_number}')
+        player_squares = None if playmode == 'classic' else game_state.player_squares()
+        if player_squares == []:
+            log(f'Player {player_number} cannot move')
+            record_move(player_number, None, VERDICT_CANNOT_MOVE, 0, 0.0, player_squares)
+            finished_players.add(player_number)
+            game_state.current_player = 3 - game_state.current_player
+            continue
+        else:
+            player.best_move.publish(0, 0, 0)
+            player.telemetry.reset()
+            if clock:
+                player.time_remaining = clock.remaining_time(player_number)
+                player.time_increment = time_control.increment
+            opponent = player2 if player_number == 1 else player1
+            ponder_process = None
+            turn_metrics = TurnMetrics(player_number, ply) if meter else None
+            ponder_metrics = None
+            process = None
+            proposed_move = [0, 0, 0]
+            start_time = time.perf_counter()
+            end_time = None
+            if clock:
+                player.budget = SearchBudget(time.monotonic() + player.time_remaining, player.time_remaining, player.time_increment)
             else:
-                player.best_move[0] = 0
-                player.best_move[1] = 0
-                player.best_move[2] = 0
-                try:
-                    process = multiprocessing.Process(target=player.compute_best_move, args=(game_state,))
+                player.budget = SearchBudget(time.monotonic() + calculation_time)
+            # the samples files contain the process id of the referee, since simultaneous games share profile_dir
+            profile_path = os.path.join(profile_dir, f'.{os.getpid()}-player{player_number}-turn.folded') if profile_dir else None
+            ponder_profile_path = os.path.join(profile_dir, f'.{os.getpid()}-player{3-player_number}-ponder.folded') if profile_dir else None
+            try:
+                if meter:
+                    cpu_remaining = None if cpu_budget is None else cpu_budget - cpu_used[player_number-1]
+                    process = meter.start(player, game_state, cpu_remaining, profile_path, prepared_memory[2 - player_number])
+                else:
+                    process = multiprocessing.Process(target=run_preemptible, args=(player.compute_best_move, player, game_state, profile_path))
                     process.start()
+                if ponder and can_ponder(opponent):
+                    if ponder_meter:
+                        ponder_metrics = TurnMetrics(3 - player_number, ply)
+                        cpu_remaining = None if cpu_budget is None else cpu_budget - cpu_used[2 - player_number]
+                        ponder_process = ponder_meter.start(opponent, game_state, cpu_remaining, ponder_profile_path, prepared_memory[player_number - 1], ponder=True)
+                    else:
+                        ponder_process = multiprocessing.Process(target=run_preemptible, args=(opponent.ponder, opponent, game_state, ponder_profile_path))
+                        ponder_process.start()
+                if clock:
+                    # the turn ends when compute_best_move returns, or when the clock runs out
+                    process.join(clock.remaining_time(player_number))
+                else:
                     time.sleep(calculation_time)
+                end_time = time.perf_counter()
+                proposed_move = player.best_move.read()
+                # a player process is not stopped while it writes its save files
+                locks = [player.lock, opponent.lock] if ponder_process else [player.lock]
+                for lock in locks:
                     lock.acquire()
-                    process.terminate()
+                if grace_period > 0:
+                    preempt([process, ponder_process], locks, grace_period)
+                process.terminate()
+                if ponder_process:
+                    ponder_process.terminate()
+                for lock in locks:
                     lock.release()
-                except Exception as err:
-                    log(f'Error: an exception occurred:\n{err}')
-                i, j, value = player.best_move
-                square = (i, j)
-                best_move = Move(square, value)
-                log(f'Best move: {best_move}')
-                player_score = 0
-                if (i, j, value) != (0, 0, 0):
-                    if TabooMove(square, value) in game_state.taboo_moves:
-                        print(f'Error: {best_move} is a taboo move. Player {3-player_number} wins the game.')
-                        return (0, 1) if player_number == 1 else (1, 0)
-                    board_text = str(game_state.board)
-                    options = f'--move "{game_state.board.square2index(square)} {value}"'
-                    if player_squares is not None:
-                       allowed = ' '.join(str(game_state.board.square2index(square)) for square in player_squares)
-                       options += f' --allowed="{allowed}"'
-                    output = solve_sudoku(SUDOKU_SOLVER, board_text, options)
-                    if 'Invalid move' in output:
-                        print(f'Error: {best_move} is not a valid move. Player {3-player_number} wins the game.')
-                        return (0, 1) if player_number == 1 else (1, 0)
-                    if 'Illegal move' in output:
-                        print(f'Error: {best_move} is not a legal move. Player {3-player_number} wins the game.')
-                        return (0, 1) if player_number == 1 else (1, 0)
-                    if 'has no solution' in output:
-                        log(f'The sudoku has no solution after the move {best_move}.')
-                        player_score = 0
-                        game_state.moves.append(TabooMove(square, value))
-                        game_state.taboo_moves.append(TabooMove(square, value))
-                    if 'The score is' in output:
-                        match = re.search(r'The score is ([-\d]+)', output)
-                        if match:
-                            player_score = int(match.group(1))
-                            game_state.board.put(square, value)
-                            game_state.moves.append(best_move)
-                            if playmode != 'classic':
-                                game_state.occupied_squares().append(square)
-                            move_number = move_number + 1
-                        else:
-                            raise RuntimeError(f'Unexpected output of sudoku solver: "{output}".')
-                else:
-                    print(f'No move was supplied. Player {3-player_number} wins the game.')
-                    return (0, 1) if player_number == 1 else (1, 0)
-            game_state.scores[player_number-1] = game_state.scores[player_number-1] + player_score
-            game_state.current_player = 3 - game_state.current_player
-            log(f'Reward: {player_score}')
-            if SudokuSettings.print_ascii_states:
-                log(print_game_state(game_state))
+            except Exception as err:
+                log(f'Error: an exception occurred:\n{err}')
+            # the grace period is not counted as thinking time
+            think_time = (end_time or time.perf_counter()) - start_time
+            bank_exhausted = clock is not None and clock.is_exhausted(player_number, think_time)
+            search = player.telemetry.snapshot(think_time)
+            if search:
+                log(f'Search: {format_telemetry(search)}')
+                if turn_metrics:
+                    turn_metrics.search = search
+            if profile_dir:
+                # the samples are written by the player processes when they are terminated
+                for sampled_process, sampled_player, samples_path in ((process, player, profile_path), (ponder_process, opponent, ponder_profile_path)):
+                    if sampled_process:
+                        sampled_process.join(1.0)
+                        merge_profile(samples_path, os.path.join(profile_dir, f'{player_name(sampled_player)}.folded'))
+            if meter and process:
+                meter.collect(process, turn_metrics)
+                cpu_used[player_number-1] += turn_metrics.cpu_time or 0.0
+                limit_exceeded = turn_metrics.limit_exceeded
+                if limit_exceeded is None and cpu_budget is not None and cpu_used[player_number-1] > cpu_budget:
+                    limit_exceeded = LIMIT_CPU
+                if limit_exceeded:
+                    print(f'Player {player_number} exceeded its {limit_exceeded} limit. Player {3-player_number} wins the game.')
+                    verdict = VERDICT_MEMORY_LIMIT if limit_exceeded == LIMIT_MEMORY else VERDICT_CPU_LIMIT
+                    record_move(player_number, None, verdict, 0, think_time, player_squares, turn_metrics)
+                    return end_game((0, 1) if player_number == 1 else (1, 0), f'{limit_exceeded} limit')
+            if ponder_metrics and ponder_process:
+                ponder_meter.collect(ponder_process, ponder_metrics)
+                cpu_used[2 - player_number] += ponder_metrics.cpu_time or 0.0
+                limit_exceeded = ponder_metrics.limit_exceeded
+                if limit_exceeded is None and cpu_budget is not None and cpu_used[2 - player_number] > cpu_budget:
+                    limit_exceeded = LIMIT_CPU
+                if limit_exceeded:
+                    print(f'Player {3-player_number} exceeded its {limit_exceeded} limit while pondering. Player {player_number} wins the game.')
+                    verdict = VERDICT_MEMORY_LIMIT if limit_exceeded == LIMIT_MEMORY else VERDICT_CPU_LIMIT
+                    record_move(3 - player_number, None, verdict, 0, 0.0, None, ponder_metrics)
+                    return end_game((1, 0) if player_number == 1 else (0, 1), f'{limit_exceeded} limit')
+            # when the bank runs out the proposed move is played, like at the end of a turn without a clock
+            if clock and (not clock.punch(player_number, think_time) or (bank_exhausted and tuple(proposed_move) == (0, 0, 0))):
+                print(f'Player {player_number} ran out of time. Player {3-player_number} wins the game.')
+                record_move(player_number, None, VERDICT_TIME_FORFEIT, 0, think_time, player_squares, turn_metrics)
+                return end_game((0, 1) if player_number == 1 else (1, 0), 'time forfeit')
+            i, j, value = proposed_move
+            square = (i, j)
+            best_move = Move(square, value)
+            log(f'Best move: {best_move}')
+            player_score = 0
+            verdict = None
+            if (i, j, value) != (0, 0, 0):
+                if TabooMove(square, value) in game_state.taboo_moves:
+                    print(f'Error: {best_move} is a taboo move. Player {3-player_number} wins the game.')
+                    record_move(player_number, best_move, VERDICT_TABOO_PLAYED, 0, think_time, player_squares, turn_metrics)
+                    return end_game((0, 1) if player_number == 1 else (1, 0), 'taboo move')
+                board_text, options = oracle_input(game_state, best_move, player_squares)
+                oracle_start = time.perf_counter()
+                output = solve_sudoku(SUDOKU_SOLVER, board_text, options)
+                if turn_metrics:
+                    turn_metrics.oracle_time = time.perf_counter() - oracle_start
+                verdict, player_score = oracle_verdict(output)
+                if verdict == VERDICT_INVALID:
+                    print(f'Error: {best_move} is not a valid move. Player {3-player_number} wins the game.')
+                    record_move(player_number, best_move, VERDICT_INVALID, 0, think_time, player_squares, turn_metrics)
+                    return end_game((0, 1) if player_number == 1 else (1, 0), 'invalid move')
+                if verdict == VERDICT_ILLEGAL:
+                    print(f'Error: {best_move} is not a legal move. Player {3-player_number} wins the game.')
+                    record_move(player_number, best_move, VERDICT_ILLEGAL, 0, think_time, player_squares, turn_metrics)
+                    return end_game((0, 1) if player_number == 1 else (1, 0), 'illegal move')
+                if verdict == VERDICT_TABOO:
+                    log(f'The sudoku has no solution after the move {best_move}.')
+                    game_state.moves.append(TabooMove(square, value))
+                    game_state.taboo_moves.append(TabooMove(square, value))
+                if verdict == VERDICT_ACCEPTED:
+                    game_state.board.put(square, value)
+                    game_state.moves.append(best_move)
+                    if playmode != 'classic':
+                        game_state.occupied_squares().append(square)
+                    move_number = move_number + 1
             else:
-                log(pretty_print_game_state(game_state))
-        if not verbose:
-            print(f'Score: {game_state.scores[0]} - {game_state.scores[1]}')
-        if game_state.scores[0] > game_state.scores[1]:
-            print('Player 1 wins the game.')
-            return 1, 0
-        elif game_state.scores[0] == game_state.scores[1]:
-            print('The game ends in a draw.')
-            return 0.5, 0.5
-        elif game_state.scores[0] < game_state.scores[1]:
-            print('Player 2 wins the game.')
-            return 0, 1
-
-
-def play_game(board_file: Optional[str], name1: str, name2: str, calculation_time: float, verbose=True, warmup=False, playmode='rows') -> GameResult:
+                print(f'No move was supplied. Player {3-player_number} wins the game.')
+                record_move(player_number, None, VERDICT_NO_MOVE, 0, think_time, player_squares, turn_metrics)
+                return end_game((0, 1) if player_number == 1 else (1, 0), 'no move')
+        game_state.scores[player_number-1] = game_state.scores[player_number-1] + player_score
+        game_state.current_player = 3 - game_state.current_player
+        log(f'Reward: {player_score}')
+        if clock:
+            log(f'Clock: {clock}')
+        render_start = time.perf_counter()
+        log(lambda: render_game_state(game_state))
+        if turn_metrics:
+            turn_metrics.render_time = time.perf_counter() - render_start
+        record_move(player_number, best_move, verdict, player_score, think_time, player_squares, turn_metrics)
+    if not game_log.enabled(LOG_BOARDS):
+        print(f'Score: {game_state.scores[0]} - {game_state.scores[1]}')
+    if game_state.scores[0] > game_state.scores[1]:
+        print('Player 1 wins the game.')
+        return end_game((1, 0), 'finished')
+    elif game_state.scores[0] == game_state.scores[1]:
+        print('The game ends in a draw.')
+        return end_game((0.5, 0.5), 'finished')
+    elif game_state.scores[0] < game_state.scores[1]:
+        print('Player 2 wins the game.')
+        return end_game((0, 1), 'finished')
+
+
+def remove_save_files() -> None:
+    """
+    Removes the files that are created by SudokuAI.save, save_array, save_bytes and open_store, see
+    SudokuAI.save_path.
+    """
+    for player_number in (-1, 1, 2):
+        for extension in ('pkl', 'npy', 'bin', 'log'):
+            for path in [Path(f'{player_number}.{extension}')] + list(Path().glob(f'{player_number}-*.{extension}')):
+                if path.is_file():
+                    os.remove(path)
+
+
+def load_game_state(board_file: Optional[str], playmode: str) -> GameState:
+    """
+    Loads the start position of a game.
+    @param board_file: A text file containing a game state. If it is None, an empty board with 2x2 regions is used.
+    @param playmode: The playing mode (classic, rows, border, random)
+    """
+    if board_file:
+        text = Path(board_file).read_text()
+        return parse_game_state(text, playmode)
+    elif playmode == 'classic':
+        return GameState()
+    else:
+        initial_board = SudokuBoard(2, 2)
+        allowed_squares1, allowed_squares2 = allowed_squares(initial_board, playmode)
+        return GameState(allowed_squares1=allowed_squares1, occupied_squares1=[], allowed_squares2=allowed_squares2, occupied_squares2=[])
+
+
+class MatchSession(object):
+    """
+    Plays a series of games on the same start position. The board file is parsed once, every player module is
+    imported once, and the SudokuAI instances are reused for all games.
+    """
+
+    def __init__(self, board_file: Optional[str], playmode='rows'):
+        """
+        @param board_file: A text file containing a game state.
+        @param playmode: The playing mode (classic, rows, border, random)
+        """
+        self.playmode = playmode
+        self.game_state = load_game_state(board_file, playmode)
+        # in random mode, the allowed squares are drawn again for every game, unless they are given in the file
+        properties = parse_properties(Path(board_file).read_text()) if board_file else {}
+        self.random_squares = playmode == 'random' and 'allowed-squares1' not in properties
+        self.players = {}
+
+    def new_game_state(self) -> GameState:
+        """
+        Returns a fresh copy of the start position.
+        """
+        game_state = copy.deepcopy(self.game_state)
+        if self.random_squares:
+            game_state.allowed_squares1, game_state.allowed_squares2 = allowed_squares(game_state.board, 'random')
+        return game_state
+
+    def player(self, name: str, player_number: int) -> SudokuAI:
+        """
+        Returns the SudokuAI instance of the module name that plays as the given player.
+        @param name: The module name of the player.
+        @param player_number: The player number (1 or 2).
+        """
+        key = (name, player_number)
+        if key not in self.players:
+            module = importlib.import_module(name + '.sudokuai')
+            player = module.SudokuAI()
+            player.player_number = player_number
+            if name in ('random_player', 'greedy_player', 'random_save_player'):
+                player.solve_sudoku_path = SUDOKU_SOLVER
+            self.players[key] = player
+        player = self.players[key]
+        player.time_remaining = None
+        player.time_increment = None
+        return player
+
+    def play_game(self, name1: str, name2: str, calculation_time: float, verbose=True, warmup=False, recorder: Optional[GameRecorder] = None, log_level: Optional[int] = None, time_control: Optional[TimeControl] = None, ponder=False, metrics: Optional[Callable[[TurnMetrics], None]] = None, limits: Optional[ResourceLimits] = None, grace_period: float = 0.0, profile_dir: Optional[str] = None, cache: Optional[KnowledgeCache] = None) -> GameResult:
+        """
+        Plays a game on the start position of the session. See play_game for the parameters.
+        """
+        game_state = self.new_game_state()
+        player1 = self.player(name1, 1)
+        player2 = self.player(name2, 2)
+        remove_save_files()
+        return simulate_game(game_state, player1, player2, calculation_time=calculation_time, verbose=verbose, warmup=warmup, playmode=self.playmode, recorder=recorder, log_level=log_level, time_control=time_control, ponder=ponder, metrics=metrics, limits=limits, grace_period=grace_period, profile_dir=profile_dir, cache=cache)
+
+    def close(self) -> None:
+        self.players.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def play_game(board_file: Optional[str], name1: str, name2: str, calculation_time: float, verbose=True, warmup=False, playmode='rows', recorder: Optional[GameRecorder] = None, log_level: Optional[int] = None, time_control: Optional[TimeControl] = None, ponder=False, metrics: Optional[Callable[[TurnMetrics], None]] = None, limits: Optional[ResourceLimits] = None, grace_period: float = 0.0, profile_dir: Optional[str] = None, cache: Optional[KnowledgeCache] = None) -> GameResult:
     """
     Simulates a game between two instances of SudokuAI.
     @param board_file: A text file containing a game state.
@@ -218,38 +596,174 @@ def play_game(board_file: Optional[str], name1: str, name2: str, calculation_tim
     @param verbose: Print the positions and the moves.
     @param warmup: Let the engines play a move before the start of the game.
     @param playmode: The playing mode (classic, rows, random)
+    @param recorder: If set, a structured record of every move and of the result is written to it.
+    @param log_level: The log level (LOG_QUIET, LOG_MOVES or LOG_BOARDS). If it is None, it is derived from verbose.
+    @param time_control: If set, each player gets a bank of time for the whole game instead of a fixed time per move.
+    @param ponder: Let a player that implements SudokuAI.ponder search during the turn of its opponent.
+    @param metrics: If set, it is called with the CPU, memory and overhead measurements of every turn.
+    @param limits: If set, the memory and CPU time of the players are limited.
+    @param grace_period: The time in seconds that players get to save their data after the end of a turn.
+    @param profile_dir: If set, the call stacks of the players are sampled and written to this directory.
+    @param cache: If set, the players can keep data across games that start from the same position.
     """
-    
-    if board_file:
-        text = Path(board_file).read_text()
-        game_state = parse_game_state(text, playmode)
-    elif playmode == 'classic':
-        game_state = GameState()
-    else:
-        initial_board = SudokuBoard(2, 2)
-        allowed_squares1, allowed_squares2 = allowed_squares(initial_board, playmode)
-        game_state = GameState(allowed_squares1=allowed_squares1, occupied_squares1=[], allowed_squares2=allowed_squares2, occupied_squares2=[])
-
-    module1 = importlib.import_module(name1 + '.sudokuai')
-    module2 = importlib.import_module(name2 + '.sudokuai')
-    player1 = module1.SudokuAI()
-    player2 = module2.SudokuAI()
-    player1.player_number = 1
-    player2.player_number = 2
-    if name1 in ('random_player', 'greedy_player', 'random_save_player'):
-        player1.solve_sudoku_path = SUDOKU_SOLVER
-    if name2 in ('random_player', 'greedy_player', 'random_save_player'):
-        player2.solve_sudoku_path = SUDOKU_SOLVER
-
-    # clean up pickle files
-    if os.path.isfile(os.path.join(os.getcwd(), '-1.pkl')):
-        os.remove(os.path.join(os.getcwd(), '-1.pkl'))
-    if os.path.isfile(os.path.join(os.getcwd(), '1.pkl')):
-        os.remove(os.path.join(os.getcwd(), '1.pkl'))
-    if os.path.isfile(os.path.join(os.getcwd(), '2.pkl')):
-        os.remove(os.path.join(os.getcwd(), '2.pkl'))
-
-    return simulate_game(game_state, player1, player2, calculation_time=calculation_time, verbose=verbose, warmup=warmup, playmode=playmode)
+    with MatchSession(board_file, playmode) as session:
+        return session.play_game(name1, name2, calculation_time, verbose=verbose, warmup=warmup, recorder=recorder, log_level=log_level, time_control=time_control, ponder=ponder, metrics=metrics, limits=limits, grace_period=grace_period, profile_dir=profile_dir, cache=cache)
+
+
+class GameConfig(object):
+    """
+    The settings of a single game, see play_game for the meaning of the fields.
+    """
+
+    def __init__(self,
+                 first: str,
+                 second: str,
+                 board_file: Optional[str] = None,
+                 playmode: str = 'rows',
+                 calculation_time: float = 0.5,
+                 time_control: Optional[TimeControl] = None,
+                 ponder=False,
+                 warmup=False,
+                 limits: Optional[ResourceLimits] = None,
+                 grace_period: float = 0.0,
+                 game_id: Optional[int] = None,
+                 profile_dir: Optional[str] = None,
+                 cache: Optional[KnowledgeCache] = None
+                 ):
+        """
+        @param game_id: The number of the game in the records. If it is None, stream_games numbers the games
+         consecutively.
+        """
+        self.first = first
+        self.second = second
+        self.board_file = board_file
+        self.playmode = playmode
+        self.calculation_time = calculation_time
+        self.time_control = time_control
+        self.ponder = ponder
+        self.warmup = warmup
+        self.limits = limits
+        self.grace_period = grace_period
+        self.game_id = game_id
+        # an absolute path, since the workers of stream_games run in directories of their own
+        self.profile_dir = None if profile_dir is None else os.path.abspath(profile_dir)
+        self.cache = cache
+
+    def __str__(self):
+        board = Path(self.board_file).stem if self.board_file else 'empty'
+        return f'{self.first} - {self.second} (board={board}, playmode={self.playmode})'
+
+
+# The match sessions of the current process, indexed by board file and playing mode
+_sessions: Dict[Tuple[Optional[str], str], MatchSession] = {}
+
+
+def close_sessions() -> None:
+    """
+    Shuts down the match sessions that were started by run_game_config in the current process.
+    """
+    for session in _sessions.values():
+        session.close()
+    _sessions.clear()
+
+
+def run_game_config(config: GameConfig, verbose=False) -> List[Dict[str, Any]]:
+    """
+    Plays a game in the current process. The match session of the board file and playing mode is reused by later
+    games in the same process.
+    @param config: The settings of the game.
+    @param verbose: Print the positions and the moves. If it is False, the output of the game, i.e. the reason why
+     it ended, is captured and added to the 'game-end' record as the field 'output'. If the game fails, the captured
+     output is printed before the exception is passed on.
+    @return: The records of the game: a 'game-start' record, a 'move' record for every turn and a 'game-end'
+     record, as written by GameRecorder.
+    """
+    key = (config.board_file, config.playmode)
+    if key not in _sessions:
+        _sessions[key] = MatchSession(config.board_file, config.playmode)
+    collector = RecordCollector(config.game_id or 1)
+    output = io.StringIO()
+    try:
+        with contextlib.nullcontext() if verbose else contextlib.redirect_stdout(output):
+            _sessions[key].play_game(config.first, config.second, config.calculation_time, verbose=verbose,
+                                     warmup=config.warmup, recorder=collector, time_control=config.time_control,
+                                     ponder=config.ponder, limits=config.limits, grace_period=config.grace_period,
+                                     profile_dir=config.profile_dir, cache=config.cache)
+    except Exception:
+        print(output.getvalue(), end='')
+        raise
+    if not verbose:
+        collector.records[-1]['output'] = output.getvalue()
+    return collector.records
+
+
+def init_worker(directory: str) -> None:
+    """
+    Initializes a worker process. Every worker plays its games in a directory of its own, such that the save
+    files of simultaneous games do not collide.
+    @param directory: The directory in which the working directories of the workers are created.
+    """
+    global SUDOKU_SOLVER
+    SUDOKU_SOLVER = os.path.abspath(SUDOKU_SOLVER)
+    sys.path = [os.path.abspath(path) for path in sys.path]
+    os.chdir(tempfile.mkdtemp(prefix='worker_', dir=directory))
+
+
+def stream_games(configs: Iterable[GameConfig], workers: int = 0, verbose=False, skip: Optional[Callable[[GameConfig], bool]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Plays a series of games, and yields their records as soon as a game is finished. The records of a game are
+    yielded together: a 'game-start' record, a 'move' record for every turn and a 'game-end' record, see
+    GameRecorder. If a game fails, a record {'type': 'game-error', 'game': ID, 'error': MESSAGE} is yielded instead.
+    @param configs: The settings of the games. They are consumed lazily, so it may be a generator.
+    @param workers: The number of games that are played simultaneously in a pool of worker processes. If it is 0,
+     the games are played one after another in the current process.
+    @param verbose: Print the positions and the moves.
+    @param skip: If set, a game is not played if skip(config) is True when it is its turn to be started. This can be
+     used to cancel the remaining games of a pairing, based on the results that were yielded so far.
+    """
+    def numbered_configs() -> Iterator[GameConfig]:
+        for game_id, config in enumerate(configs, 1):
+            if config.game_id is None:
+                config = copy.copy(config)
+                config.game_id = game_id
+            if skip is None or not skip(config):
+                yield config
+
+    if workers <= 0:
+        for config in numbered_configs():
+            try:
+                yield from run_game_config(config, verbose)
+            except Exception as err:
+                yield {'type': 'game-error', 'game': config.game_id, 'error': str(err)}
+        return
+
+    with tempfile.TemporaryDirectory(prefix='sudoku_games_') as directory:
+        executor = concurrent.futures.ProcessPoolExecutor(workers, initializer=init_worker, initargs=(directory,))
+        try:
+            pending = {}
+            pending_configs = numbered_configs()
+            exhausted = False
+            while True:
+                # keep a small queue of games, such that skip is applied to games that are started late
+                while not exhausted and len(pending) < 2 * workers:
+                    config = next(pending_configs, None)
+                    if config is None:
+                        exhausted = True
+                    else:
+                        pending[executor.submit(run_game_config, config, verbose)] = config
+                if not pending:
+                    break
+                done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    config = pending.pop(future)
+                    try:
+                        records = future.result()
+                    except Exception as err:
+                        yield {'type': 'game-error', 'game': config.game_id, 'error': str(err)}
+                        continue
+                    yield from records
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
 
 
 def main():
@@ -257,11 +771,22 @@ def main():
     cmdline_parser.add_argument('--first', help="the module name of the first player's SudokuAI class (default: random_player)", default='random_player')
     cmdline_parser.add_argument('--second', help="the module name of the second player's SudokuAI class (default: random_player)", default='random_player')
     cmdline_parser.add_argument('--time', help="the time (in seconds) for computing a move (default: 0.5)", type=float, default=0.5)
+    cmdline_parser.add_argument('--clock', metavar='TOTAL[+INCREMENT]', type=parse_time_control, help="use a bank of TOTAL seconds per player, plus INCREMENT seconds per move, instead of a fixed time per move")
+    cmdline_parser.add_argument('--ponder', help="let players that implement SudokuAI.ponder search during the opponent's turn", action='store_true')
     cmdline_parser.add_argument('--check', help="check if the solve_sudoku program works", action='store_true')
     cmdline_parser.add_argument('--board', metavar='FILE', type=str, help='a text file containing a game state')
     cmdline_parser.add_argument('--quiet', help='print minimal output', action='store_true')
-    cmdline_parser.add_argument('--warm-up', help='let the engines play a move before the start of the game', action='store_true')
+    cmdline_parser.add_argument('--log-level', type=str, choices=list(LOG_LEVELS), help='the amount of output: quiet, moves (one line per move) or boards (default: boards)')
+    cmdline_parser.add_argument('--warm-up', help='let the engines play a move before the start of the game (only needed on Windows and macOS)', action='store_true')
     cmdline_parser.add_argument('--playmode', type=str, choices=['classic', 'rows', 'border', 'random'], default='rows', help='Choose the playing mode (classic, rows, border, random). Defaults to rows.')
+    cmdline_parser.add_argument('--record', metavar='FILE', type=str, help='append a structured record of the game to a JSON lines file')
+    cmdline_parser.add_argument('--memory-limit', metavar='MB', type=float, help='limit the address space of the player processes to MB megabytes')
+    cmdline_parser.add_argument('--cpu-limit', metavar='SECONDS', type=float, help='limit the CPU time of each player to SECONDS for the whole game')
+    cmdline_parser.add_argument('--grace', metavar='SECONDS', type=float, default=0.0, help='interrupt the players at the end of a turn and give them SECONDS to save their data before they are killed (default: 0)')
+    cmdline_parser.add_argument('--profile', metavar='DIR', type=str, help='sample the call stacks of the players, and add them to DIR/PLAYER.folded in the collapsed stack format of flamegraph.pl')
+    cmdline_parser.add_argument('--cache', metavar='DIR', type=str, help='let the players keep data in DIR across games that start from the same position')
+    cmdline_parser.add_argument('--cache-size', metavar='MB', type=float, default=100.0, help='the maximum size of the knowledge cache in megabytes (default: 100)')
+    cmdline_parser.add_argument('--metrics', help='print the CPU time, peak memory and referee overhead of every turn', action='store_true')
     cmdline_parser.add_argument('--ascii', help=argparse.SUPPRESS, action='store_true')
     args = cmdline_parser.parse_args()
 
@@ -270,7 +795,13 @@ def main():
     if args.check:
         check_oracle()
     else:
-        play_game(args.board, args.first, args.second, args.time, verbose = not args.quiet, warmup=args.warm_up, playmode=args.playmode)
+        recorder = GameRecorder(args.record) if args.record else None
+        log_level = LOG_LEVELS[args.log_level] if args.log_level else None
+        try:
+            play_game(args.board, args.first, args.second, args.time, verbose = not args.quiet, warmup=args.warm_up, playmode=args.playmode, recorder=recorder, log_level=log_level, time_control=args.clock, ponder=args.ponder, metrics=print if args.metrics else None, limits=ResourceLimits.from_options(args.memory_limit, args.cpu_limit), grace_period=args.grace, profile_dir=args.profile, cache=KnowledgeCache.from_options(args.cache, args.cache_size))
+        finally:
+            if recorder:
+                recorder.close()
 
 
 if __name__ == '__main__':
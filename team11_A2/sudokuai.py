@@ -3,7 +3,7 @@
 #  https://www.gnu.org/licenses/gpl-3.0.txt)
 
 # import random
-# import time
+import time
 # import copy
 # from competitive_sudoku.sudoku import TabooMove, SudokuBoard
 from competitive_sudoku.sudoku import GameState, Move
@@ -17,13 +17,25 @@ class SudokuAI(competitive_sudoku.sudokuai.SudokuAI):
     Sudoku AI that computes a move for a given sudoku configuration.
     """
 
+    # the time spent on generating children is reported to the referee
+    telemetry_phases = ('children',)
+
     def __init__(self):
         super().__init__()
+        self.nodes = 0
+        self.children_time = 0.0
 
     def evaluate(self, game_state: GameState):
         return game_state.scores[0] - game_state.scores[1]
     
     def getChildren(self, game_state: GameState):
+        start_time = time.perf_counter()
+        try:
+            return self.generate_children(game_state)
+        finally:
+            self.children_time += time.perf_counter() - start_time
+
+    def generate_children(self, game_state: GameState):
         valid_entries = ValidEntryFinder(game_state).get_pos_entries()
 
         if valid_entries is None:
@@ -47,6 +59,7 @@ class SudokuAI(competitive_sudoku.sudokuai.SudokuAI):
         return children
     
     def minimax(self, game_state: GameState, depth, alpha, beta, maximizingPlayer):
+        self.nodes += 1
         # set the boolean for game_finished to True if there are no empty squares left
         game_finished = not any([game_state.board.squares[i] == 0 for i in range(game_state.board.N * game_state.board.N)])
 
@@ -79,6 +92,8 @@ class SudokuAI(competitive_sudoku.sudokuai.SudokuAI):
     
     def compute_best_move(self, game_state: GameState) -> None:
         is_maximizing = self.player_number == 1
+        self.nodes = 0
+        self.children_time = 0.0
 
         valid_entries = ValidEntryFinder(game_state).get_pos_entries()
         moves = [[(i, j), value] for (i, j) in valid_entries for value in valid_entries[(i, j)]]
@@ -100,12 +115,16 @@ class SudokuAI(competitive_sudoku.sudokuai.SudokuAI):
 
         current_stage = get_game_stage(len(moves))
 
+        # with a clock, spend at most a share of the remaining time on this move
+        self.budget.allocate(max(1, len(moves) // 2))
+
         # set the maximum depth for iterative deepening
         max_depth = 25
         global_best_move = None
         global_best_score = -float('inf') if is_maximizing else float('inf')
 
         for depth in range(0, max_depth + 1):
+            self.budget.start_iteration()
 
             best_score = -float('inf') if is_maximizing else float('inf')
             best_move = None
@@ -161,6 +180,12 @@ class SudokuAI(competitive_sudoku.sudokuai.SudokuAI):
             self.propose_move(best_move)
             global_best_move = best_move
             global_best_score = best_score
+            self.budget.finish_iteration()
+            self.report(nodes=self.nodes, depth=depth, children=self.children_time)
+
+            # stop when the next depth is not expected to finish before the deadline
+            if not self.budget.should_start_iteration():
+                break
 
 
 def get_game_stage(n_moves) -> str:
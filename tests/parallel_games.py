@@ -6,9 +6,13 @@ from typing import List, Dict
 from collections import Counter
 import os
 import re
-import psutil
 from pathlib import Path
 
+# add the parent directory to the path to make importing modules work
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from competitive_sudoku.records import read_records
+
 
 def run_game(game_id: int, game_args: List[str], output_file: str):
     """Run a single game in a new console window"""
@@ -24,7 +28,7 @@ echo Game ID: {game_id} > "{output_file}"
 echo First Player: {game_args[game_args.index('--first') + 1]} >> "{output_file}"
 echo Second Player: {game_args[game_args.index('--second') + 1]} >> "{output_file}"
 echo. >> "{output_file}"
-python simulate_game.py {args_str} >> "{output_file}" 2>&1
+python simulate_game.py {args_str} --record "{output_file}.records.jsonl" --metrics >> "{output_file}" 2>&1
 set EXIT_CODE=%errorlevel%
 echo. >> "{output_file}"
 echo Exit Code: %EXIT_CODE% >> "{output_file}"
@@ -57,8 +61,51 @@ exit /b %EXIT_CODE%
         return None
 
 
+def analyze_game_records(game_id: int, records_file: str, first_player: str, second_player: str) -> Dict:
+    """Analyze a game using the structured records written by simulate_game.py"""
+    records = list(read_records(records_file))
+    moves = sum(1 for record in records if record['type'] == 'move' and record['move'] is not None)
+    end = next((record for record in records if record['type'] == 'game-end'), None)
+    if end is None:
+        return {"id": game_id, "winner": "Unknown", "moves": moves, "score": "0-0", "status": "Failed"}
+    result = end['result']
+    winner = first_player if result[0] > result[1] else second_player if result[0] < result[1] else "Draw"
+    return {
+        "id": game_id,
+        "winner": winner,
+        "moves": moves,
+        "score": f"{end['scores'][0]}-{end['scores'][1]}",
+        "status": "Completed",
+        "metrics": {first_player: summarize_metrics(records, 1), second_player: summarize_metrics(records, 2)}
+    }
+
+
+def summarize_metrics(records: List[Dict], player_number: int) -> Dict:
+    """Summarize the per-turn measurements of a player in the records of a game"""
+    metrics = [record['metrics'] for record in records
+               if record['type'] == 'move' and record['player'] == player_number and record.get('metrics')]
+
+    def values(key):
+        return [m[key] for m in metrics if m.get(key) is not None]
+
+    cpu = values('cpu_time')
+    think = values('think_time')
+    return {
+        "turns": len(metrics),
+        "cpu_time": sum(cpu),
+        "cpu_share": sum(cpu) / sum(think) if sum(think) > 0 else None,
+        "peak_rss": max(values('peak_rss'), default=None),
+        "oracle_time": sum(values('oracle_time')),
+        "overhead": sum(values('spawn_time')) + sum(values('render_time'))
+    }
+
+
 def analyze_game_output(game_id: int, output_file: str, first_player: str, second_player: str) -> Dict:
     """Analyze a game's output file with improved parsing"""
+    records_file = f"{output_file}.records.jsonl"
+    if Path(records_file).exists():
+        return analyze_game_records(game_id, records_file, first_player, second_player)
+
     try:
         content = Path(output_file).read_text(encoding='utf-8')
 
@@ -215,6 +262,22 @@ def print_summary(results: List[Dict]):
         percentage = (count / total_games) * 100
         print(f"{winner}: {count} games ({percentage:.1f}%)")
 
+    # Print resource usage, if the games were recorded with metrics
+    players = {player for game in results for player in game.get("metrics", {})}
+    for player in sorted(players):
+        summaries = [game["metrics"][player] for game in results if player in game.get("metrics", {})]
+        turns = sum(summary["turns"] for summary in summaries)
+        if turns == 0:
+            continue
+        cpu_time = sum(summary["cpu_time"] for summary in summaries)
+        shares = [summary["cpu_share"] for summary in summaries if summary["cpu_share"] is not None]
+        peak_rss = max((summary["peak_rss"] for summary in summaries if summary["peak_rss"] is not None), default=0)
+        oracle_time = sum(summary["oracle_time"] for summary in summaries)
+        overhead = sum(summary["overhead"] for summary in summaries)
+        print(f"{player}: {turns} turns, CPU {cpu_time / turns:.3f}s per turn "
+              f"({100 * sum(shares) / max(len(shares), 1):.0f}% of the time), peak RSS {peak_rss / 2**20:.0f} MB, "
+              f"oracle {oracle_time / turns:.3f}s and referee overhead {overhead / turns:.3f}s per turn")
+
 
 
 
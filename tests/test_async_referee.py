@@ -0,0 +1,43 @@
+import asyncio
+import os
+
+import simulate_game
+from async_referee import play_game
+from competitive_sudoku.execute import solve_sudoku_async
+from competitive_sudoku.player_host import decode_game_state, encode_game_state
+from competitive_sudoku.sudoku import Move, TabooMove, print_game_state
+from simulate_game import load_game_state
+
+BOARDS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'boards')
+
+
+def stand_in_oracle(directory, output: str) -> str:
+    """Creates a script that prints output for every move, instead of the sudoku solver."""
+    path = os.path.join(directory, 'solve_sudoku')
+    with open(path, 'w') as f:
+        f.write(f'#!/bin/sh\necho "{output}"\n')
+    os.chmod(path, 0o755)
+    return path
+
+
+def test_encode_game_state_round_trips():
+    game_state = load_game_state(os.path.join(BOARDS, 'empty-2x3.txt'), 'rows')
+    game_state.moves.append(Move((0, 1), 2))
+    game_state.taboo_moves.append(TabooMove((0, 2), 3))
+    decoded = decode_game_state(encode_game_state(game_state))
+    assert print_game_state(decoded) == print_game_state(game_state)
+
+
+def test_solve_sudoku_async(tmp_path):
+    oracle = stand_in_oracle(str(tmp_path), 'The score is 3')
+    assert asyncio.run(solve_sudoku_async(oracle, 'board')) == 'The score is 3'
+    assert os.listdir(tmp_path) == ['solve_sudoku']
+
+
+def test_play_game_with_player_hosts(tmp_path, monkeypatch):
+    monkeypatch.setattr(simulate_game, 'SUDOKU_SOLVER', stand_in_oracle(str(tmp_path), 'The score is 1'))
+    game_state = load_game_state(None, 'rows')
+    result, reason = asyncio.run(play_game(game_state, 'naive_player', 'naive_player', 0.2, str(tmp_path)))
+    assert reason == 'finished'
+    assert result in ((1, 0), (0.5, 0.5), (0, 1))
+    assert len(game_state.moves) == sum(game_state.scores) > 0
@@ -0,0 +1,83 @@
+import multiprocessing
+
+import simulate_game
+from competitive_sudoku.bestmove import BestMoveSlot
+from competitive_sudoku.records import RecordCollector
+from competitive_sudoku.sudoku import GameState, Move, SudokuBoard, allowed_squares
+from competitive_sudoku.sudokuai import SudokuAI
+
+
+def test_move_is_published_when_its_value_is_assigned():
+    slot = BestMoveSlot()
+    slot[0] = 1
+    slot[1] = 2
+    assert list(slot) == [0, 0, 0]
+    slot[2] = 3
+    assert list(slot) == [1, 2, 3]
+    assert slot[1] == 2
+
+
+def test_propose_move_publishes_the_move():
+    player = SudokuAI()
+    player.best_move = BestMoveSlot()
+    player.propose_move(Move((1, 2), 3))
+    player.propose_move(Move((3, 0), 4))
+    assert list(player.best_move) == [3, 0, 4]
+    player.best_move.publish(0, 0, 0)
+    assert list(player.best_move) == [0, 0, 0]
+
+
+def square_value(i: int, j: int) -> int:
+    """The value that the writers below propose on square (i, j), such that a torn move can be detected."""
+    return 1 + (i + 2 * j) % 4
+
+
+def propose_forever(player: SudokuAI) -> None:
+    squares = [(i, j) for i in range(4) for j in range(4)]
+    while True:
+        for i, j in squares:
+            player.propose_move(Move((i, j), square_value(i, j)))
+
+
+def test_concurrent_writer_and_reader():
+    multiprocessing.set_start_method('fork', force=True)
+    player = SudokuAI()
+    player.lock = multiprocessing.Lock()
+    player.best_move = BestMoveSlot()
+    process = multiprocessing.Process(target=propose_forever, args=(player,))
+    process.start()
+    try:
+        moves = set()
+        for _ in range(20000):
+            i, j, value = player.best_move.read()
+            moves.add((i, j, value))
+            assert (i, j, value) == (0, 0, 0) or value == square_value(i, j)
+    finally:
+        process.terminate()
+        process.join()
+    assert len(moves) > 1
+
+
+class ProposingPlayer(SudokuAI):
+    """Keeps proposing moves on its allowed squares until the end of the turn."""
+    def compute_best_move(self, game_state: GameState) -> None:
+        while True:
+            for i, j in game_state.player_squares():
+                self.propose_move(Move((i, j), square_value(i, j)))
+
+
+def test_referee_reads_the_moves_without_the_lock(monkeypatch):
+    multiprocessing.set_start_method('fork', force=True)
+    monkeypatch.setattr(simulate_game, 'solve_sudoku', lambda *args: 'The score is 1')
+    allowed_squares1, allowed_squares2 = allowed_squares(SudokuBoard(2, 2), 'rows')
+    game_state = GameState(allowed_squares1=allowed_squares1, allowed_squares2=allowed_squares2,
+                           occupied_squares1=[], occupied_squares2=[])
+    player1, player2 = ProposingPlayer(), ProposingPlayer()
+    collector = RecordCollector()
+    simulate_game.simulate_game(game_state, player1, player2, calculation_time=0.05, verbose=False,
+                                recorder=collector)
+    assert player1.lock is not player2.lock
+    moves = [record['move'] for record in collector.records if record['type'] == 'move' and record['move']]
+    assert moves
+    for i, j, value in moves:
+        assert value == square_value(i, j)
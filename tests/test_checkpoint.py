@@ -0,0 +1,61 @@
+import pytest
+
+from competitive_sudoku.checkpoint import Checkpoint
+
+
+def test_resume_restores_results(tmp_path):
+    path = str(tmp_path / 'match.checkpoint.jsonl')
+    with Checkpoint(path) as checkpoint:
+        checkpoint.add('1: a - b', [1, 0])
+    with Checkpoint(path, resume=True) as checkpoint:
+        assert '1: a - b' in checkpoint
+        assert checkpoint.result('1: a - b') == [1, 0]
+        checkpoint.add('2: b - a', [0.5, 0.5])
+    with Checkpoint(path, resume=True) as checkpoint:
+        assert len(checkpoint) == 2
+
+
+def test_existing_results_are_not_overwritten(tmp_path):
+    path = tmp_path / 'match.checkpoint.jsonl'
+    with Checkpoint(str(path)) as checkpoint:
+        checkpoint.add('1: a - b', [1, 0])
+    text = path.read_text()
+    with pytest.raises(FileExistsError):
+        Checkpoint(str(path))
+    assert path.read_text() == text
+    with Checkpoint(str(path), restart=True) as checkpoint:
+        assert len(checkpoint) == 0
+    assert path.read_text() == ''
+    # an empty checkpoint file can be reused without --restart
+    Checkpoint(str(path)).close()
+
+
+def test_line_cut_off_by_an_interrupted_run(tmp_path):
+    path = tmp_path / 'match.checkpoint.jsonl'
+    path.write_text('{"key":"1: a - b","result":[1,0]}\n{"key":"2: b - a","res')
+    with Checkpoint(str(path), resume=True) as checkpoint:
+        assert len(checkpoint) == 1
+        checkpoint.add('2: b - a', [0, 1])
+    with Checkpoint(str(path), resume=True) as checkpoint:
+        assert checkpoint.result('2: b - a') == [0, 1]
+
+
+def test_match_closes_the_checkpoint_when_a_game_fails(tmp_path, monkeypatch):
+    import play_match
+
+    checkpoints = []
+
+    class RecordedCheckpoint(Checkpoint):
+        def __init__(self, *args):
+            super().__init__(*args)
+            checkpoints.append(self)
+
+    def failing_game(config, verbose=False):
+        raise RuntimeError('the oracle crashed')
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(play_match, 'Checkpoint', RecordedCheckpoint)
+    monkeypatch.setattr(play_match, 'run_game_config', failing_game)
+    with pytest.raises(RuntimeError):
+        play_match.play_match('a', 'b', 2, 'empty.txt', 0.1)
+    assert checkpoints[0].file.closed
@@ -0,0 +1,69 @@
+import multiprocessing
+import time
+
+import pytest
+
+import simulate_game
+from competitive_sudoku.clock import Clock, TimeControl, parse_time_control
+from competitive_sudoku.records import RecordCollector
+from competitive_sudoku.sudoku import GameState, Move, SudokuBoard, allowed_squares
+from competitive_sudoku.sudokuai import SudokuAI
+
+
+class ProposeAndThinkPlayer(SudokuAI):
+    """Proposes a move, and keeps thinking until it is stopped."""
+    def compute_best_move(self, game_state: GameState) -> None:
+        self.propose_move(Move(game_state.player_squares()[0], 1))
+        time.sleep(60)
+
+
+class SilentPlayer(SudokuAI):
+    """Never proposes a move."""
+    def compute_best_move(self, game_state: GameState) -> None:
+        time.sleep(60)
+
+
+def test_parse_time_control():
+    time_control = parse_time_control('60+0.5')
+    assert (time_control.total, time_control.increment) == (60.0, 0.5)
+    assert parse_time_control('3').increment == 0.0
+    with pytest.raises(ValueError):
+        parse_time_control('0')
+
+
+def test_punch_adds_increment():
+    clock = Clock(TimeControl(10, 1))
+    assert clock.punch(1, 4)
+    assert clock.remaining_time(1) == 7
+    assert clock.remaining_time(2) == 10
+
+
+def test_punch_within_margin_keeps_the_increment():
+    clock = Clock(TimeControl(3, 0.5), margin=0.1)
+    assert clock.is_exhausted(1, 3.05)
+    assert clock.punch(1, 3.05)
+    assert clock.remaining_time(1) == 0.5
+
+
+def test_punch_beyond_margin_forfeits():
+    clock = Clock(TimeControl(3, 0.5), margin=0.1)
+    assert not clock.punch(1, 3.5)
+    assert clock.remaining_time(1) == 0.0
+
+
+def test_exhausted_bank_plays_proposed_move_and_forfeits_without_move(monkeypatch):
+    multiprocessing.set_start_method('fork', force=True)
+    # a stand-in for the oracle that accepts every move
+    monkeypatch.setattr(simulate_game, 'solve_sudoku', lambda *args: 'The score is 0')
+    board = SudokuBoard(2, 2)
+    allowed_squares1, allowed_squares2 = allowed_squares(board, 'rows')
+    game_state = GameState(allowed_squares1=allowed_squares1, allowed_squares2=allowed_squares2,
+                           occupied_squares1=[], occupied_squares2=[])
+    collector = RecordCollector()
+    result = simulate_game.simulate_game(game_state, ProposeAndThinkPlayer(), SilentPlayer(), verbose=False,
+                                         recorder=collector, time_control=TimeControl(0.5))
+    moves = [record for record in collector.records if record['type'] == 'move']
+    assert moves[0]['verdict'] == simulate_game.VERDICT_ACCEPTED
+    assert moves[1]['verdict'] == simulate_game.VERDICT_TIME_FORFEIT
+    assert result == (1, 0)
+    assert collector.records[-1]['reason'] == 'time forfeit'
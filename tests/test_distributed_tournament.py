@@ -0,0 +1,73 @@
+import json
+import multiprocessing
+import os
+import threading
+import time
+from multiprocessing.connection import Client
+
+import pytest
+
+import distributed_tournament
+from competitive_sudoku.checkpoint import Checkpoint
+from distributed_tournament import Coordinator, is_loopback, parse_address, run_worker
+from play_tournament import schedule_games
+
+AUTHKEY = b'test-authkey'
+
+
+def test_parse_address():
+    assert parse_address('localhost:6000') == ('localhost', 6000)
+    assert parse_address('0.0.0.0:6000') == ('0.0.0.0', 6000)
+    assert parse_address('/tmp/sudoku.sock') == '/tmp/sudoku.sock'
+
+
+def test_is_loopback():
+    assert is_loopback(('localhost', 6000))
+    assert is_loopback(('127.0.0.1', 6000))
+    assert is_loopback('/tmp/sudoku.sock')
+    assert not is_loopback(('0.0.0.0', 6000))
+    assert not is_loopback(('192.168.1.10', 6000))
+
+
+def test_tournament_on_localhost(tmp_path, monkeypatch):
+    multiprocessing.set_start_method('fork', force=True)
+    address = str(tmp_path / 'coordinator.sock')
+    crashed = multiprocessing.RawValue('i', 0)
+
+    def stand_in_game(game, calculation_time, time_control, limits=None):
+        # the first game kills its worker halfway; the games last longer than the heartbeat timeout
+        if not crashed.value:
+            crashed.value = 1
+            os._exit(1)
+        time.sleep(0.3)
+        return game.game_id, (1.0, 0.0)
+
+    monkeypatch.setattr(distributed_tournament, 'run_game', stand_in_game)
+    monkeypatch.setattr(distributed_tournament, 'HEARTBEAT_INTERVAL', 0.05)
+    games = schedule_games(['a', 'b'], ['board.txt'], ['rows'], rounds=3)
+    workers = [multiprocessing.Process(target=run_worker, args=(address, AUTHKEY, f'worker{k}', str(tmp_path), 10.0))
+               for k in range(2)]
+    for worker in workers:
+        worker.start()
+
+    checkpoint_path = str(tmp_path / 'tournament.checkpoint.jsonl')
+    with Checkpoint(checkpoint_path) as checkpoint:
+        coordinator = Coordinator(games, 0.1, None, checkpoint, heartbeat_timeout=0.2)
+        results = {}
+        thread = threading.Thread(target=lambda: results.update(coordinator.run(address, AUTHKEY)))
+        thread.start()
+        while not os.path.exists(address):
+            time.sleep(0.01)
+        with pytest.raises(multiprocessing.AuthenticationError):
+            Client(address, authkey=b'wrong authkey')
+        thread.join(30)
+        assert not thread.is_alive()
+    for worker in workers:
+        worker.join(10)
+
+    assert sorted(results) == [game.game_id for game in games]
+    assert coordinator.attempts == {games[0].game_id: 1}
+    assert sorted(worker.exitcode for worker in workers) == [0, 1]
+    with open(checkpoint_path) as f:
+        keys = [json.loads(line)['key'] for line in f]
+    assert len(keys) == len(set(keys)) == len(games)
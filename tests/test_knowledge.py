@@ -0,0 +1,47 @@
+import os
+import pickle
+import random
+
+from competitive_sudoku.knowledge import KnowledgeCache
+from competitive_sudoku.positions import random_position
+
+
+def positions(count: int):
+    rng = random.Random(5)
+    return [random_position(2, 2, 0.25, 'rows', rng) for _ in range(count)]
+
+
+def fill(path: str, size: int) -> None:
+    with open(os.path.join(path, 'data.bin'), 'wb') as f:
+        f.write(bytes(size))
+
+
+def test_least_recently_played_positions_are_removed(tmp_path):
+    cache = KnowledgeCache(str(tmp_path), max_size=2500)
+    paths = []
+    for k, game_state in enumerate(positions(3)):
+        path = cache.directory_for('player', game_state, 'rows')
+        fill(path, 1000)
+        os.utime(os.path.dirname(path), (k, k))
+        paths.append(path)
+    cache.release(paths)
+    removed = cache.evict()
+    assert removed == [os.path.dirname(paths[0])]
+    assert all(os.path.isdir(path) for path in paths[1:])
+
+
+def test_positions_in_use_are_not_removed(tmp_path):
+    cache = KnowledgeCache(str(tmp_path), max_size=0)
+    game_state, other_state = positions(2)
+    path = cache.directory_for('player', game_state, 'rows')
+    fill(path, 1000)
+    # another game, that has its own file locks
+    other = pickle.loads(pickle.dumps(cache))
+    assert other.locks == {}
+    other_path = other.directory_for('player', other_state, 'rows')
+    assert cache.evict() == []
+    assert os.path.isdir(path) and os.path.isdir(other_path)
+    other.release([other_path])
+    assert cache.evict() == [os.path.dirname(other_path)]
+    cache.release([path])
+    assert other.evict() == [os.path.dirname(path)]
@@ -0,0 +1,104 @@
+import multiprocessing
+from typing import Optional
+
+import pytest
+
+import simulate_game
+from competitive_sudoku.limits import ResourceLimits, address_space_size
+from competitive_sudoku.records import RecordCollector
+from competitive_sudoku.sudoku import GameState, Move, SudokuBoard, allowed_squares
+from competitive_sudoku.sudokuai import SudokuAI
+
+resource = pytest.importorskip('resource')
+
+
+def apply_and_report(limits: ResourceLimits, allowance: int, result) -> None:
+    limits.apply(None, allowance)
+    result.value = resource.getrlimit(resource.RLIMIT_AS)[0]
+
+
+def test_memory_allowance_is_added_to_the_limit():
+    multiprocessing.set_start_method('fork', force=True)
+    result = multiprocessing.RawValue('q', 0)
+    process = multiprocessing.Process(target=apply_and_report, args=(ResourceLimits(2 ** 32), 2 ** 20, result))
+    process.start()
+    process.join()
+    assert result.value == 2 ** 32 + 2 ** 20
+
+
+def test_address_space_grows_with_allocations():
+    size = address_space_size()
+    if size is None:
+        pytest.skip('the size of the address space is unknown on this platform')
+    data = bytearray(64 * 2 ** 20)
+    assert address_space_size() - size >= 32 * 2 ** 20
+    del data
+
+
+class AllocatingPlayer(SudokuAI):
+    """Proposes a move, and then allocates far more memory than it is allowed to."""
+    def compute_best_move(self, game_state: GameState) -> None:
+        self.propose_move(Move(game_state.player_squares()[0], 1))
+        self.table = bytearray(2 ** 31)
+
+
+class BusyPlayer(SudokuAI):
+    """Proposes a move, and then keeps the CPU busy."""
+    def compute_best_move(self, game_state: GameState) -> None:
+        self.propose_move(Move(game_state.player_squares()[0], 1))
+        while True:
+            pass
+
+
+class FirstSquarePlayer(SudokuAI):
+    def compute_best_move(self, game_state: GameState) -> None:
+        self.propose_move(Move(game_state.player_squares()[0], 1))
+
+
+class AllocatingPonderer(FirstSquarePlayer):
+    """Allocates far more memory than it is allowed to while the opponent is thinking."""
+    def ponder(self, game_state: GameState) -> None:
+        self.table = bytearray(2 ** 31)
+
+
+def play_with_limits(player1: SudokuAI, limits: ResourceLimits, calculation_time: float, monkeypatch,
+                     player2: Optional[SudokuAI] = None, ponder=False):
+    multiprocessing.set_start_method('fork', force=True)
+    monkeypatch.setattr(simulate_game, 'solve_sudoku', lambda *args: 'The score is 1')
+    allowed_squares1, allowed_squares2 = allowed_squares(SudokuBoard(2, 2), 'rows')
+    game_state = GameState(allowed_squares1=allowed_squares1, allowed_squares2=allowed_squares2,
+                           occupied_squares1=[], occupied_squares2=[])
+    collector = RecordCollector()
+    result = simulate_game.simulate_game(game_state, player1, player2 or FirstSquarePlayer(),
+                                         calculation_time=calculation_time, verbose=False, recorder=collector,
+                                         limits=limits, ponder=ponder)
+    return result, collector.records
+
+
+def test_player_that_exceeds_the_memory_limit_loses(monkeypatch):
+    size = address_space_size()
+    if size is None:
+        pytest.skip('the size of the address space is unknown on this platform')
+    result, records = play_with_limits(AllocatingPlayer(), ResourceLimits(memory=size + 256 * 2 ** 20), 0.5, monkeypatch)
+    assert result == (0, 1)
+    assert records[-1]['reason'] == 'memory limit'
+    assert records[-2]['verdict'] == simulate_game.VERDICT_MEMORY_LIMIT
+
+
+def test_player_that_exceeds_the_cpu_limit_loses(monkeypatch):
+    result, records = play_with_limits(BusyPlayer(), ResourceLimits(cpu_time=1.0), 1.5, monkeypatch)
+    assert result == (0, 1)
+    assert records[-1]['reason'] == 'cpu limit'
+    assert records[-2]['verdict'] == simulate_game.VERDICT_CPU_LIMIT
+
+
+def test_player_that_exceeds_the_memory_limit_while_pondering_loses(monkeypatch):
+    size = address_space_size()
+    if size is None:
+        pytest.skip('the size of the address space is unknown on this platform')
+    result, records = play_with_limits(FirstSquarePlayer(), ResourceLimits(memory=size + 256 * 2 ** 20), 0.5,
+                                       monkeypatch, player2=AllocatingPonderer(), ponder=True)
+    assert result == (1, 0)
+    assert records[-1]['reason'] == 'memory limit'
+    assert records[-2]['player'] == 2
+    assert records[-2]['verdict'] == simulate_game.VERDICT_MEMORY_LIMIT
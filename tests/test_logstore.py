@@ -0,0 +1,65 @@
+import os
+
+from competitive_sudoku.logstore import LogStore
+
+
+def test_entries_are_kept_across_opens(tmp_path):
+    path = str(tmp_path / 'table.log')
+    with LogStore(path) as store:
+        store['a'] = 1
+        store['b'] = 2
+    with LogStore(path) as store:
+        del store['a']
+        store['c'] = 3
+    assert dict(LogStore(path).items()) == {'b': 2, 'c': 3}
+
+
+def test_torn_frame_is_discarded(tmp_path):
+    path = str(tmp_path / 'table.log')
+    with LogStore(path) as store:
+        store['a'] = 1
+    size = os.path.getsize(path)
+    # a frame that was cut off because the writer was killed
+    with open(path, 'ab') as f:
+        f.write(b'\x40\x00\x00\x00\x80\x05')
+    store = LogStore(path)
+    assert dict(store.items()) == {'a': 1}
+    assert os.path.getsize(path) == size
+    store['b'] = 2
+    store.flush()
+    assert dict(LogStore(path).items()) == {'a': 1, 'b': 2}
+
+
+def test_compaction_keeps_the_live_entries(tmp_path):
+    path = str(tmp_path / 'table.log')
+    store = LogStore(path, minimum_compaction_size=10)
+    for i in range(20):
+        store['key'] = i
+        store[i] = i
+        if i % 2:
+            del store[i]
+        store.flush()
+    assert store.log_entries < 20
+    assert dict(LogStore(path).items()) == dict(store.items())
+    assert [name for name in os.listdir(tmp_path)] == ['table.log']
+
+
+def test_writers_read_each_others_entries(tmp_path):
+    path = str(tmp_path / 'table.log')
+    first = LogStore(path)
+    second = LogStore(path)
+    first['a'] = 1
+    first.flush()
+    second['b'] = 2
+    second.flush()
+    assert dict(second.items()) == {'a': 1, 'b': 2}
+    # the compaction includes the entries of the other writer
+    first.compact()
+    assert dict(first.items()) == {'a': 1, 'b': 2}
+    assert dict(LogStore(path).items()) == {'a': 1, 'b': 2}
+    # a writer notices that the file was replaced by the compaction
+    second['c'] = 3
+    second.flush()
+    first['d'] = 4
+    first.flush()
+    assert dict(LogStore(path).items()) == {'a': 1, 'b': 2, 'c': 3, 'd': 4}
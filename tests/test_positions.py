@@ -0,0 +1,70 @@
+import random
+
+import pytest
+
+from competitive_sudoku.positions import generate_positions, random_position, random_solution, read_corpus, \
+    write_corpus
+from competitive_sudoku.sudoku import SudokuBoard, parse_game_state, print_game_state
+
+
+def units(board: SudokuBoard):
+    """Yields the squares of every row, column and region."""
+    m, n, N = board.m, board.n, board.N
+    for i in range(N):
+        yield [(i, j) for j in range(N)]
+        yield [(j, i) for j in range(N)]
+    for top in range(0, N, m):
+        for left in range(0, N, n):
+            yield [(top + i, left + j) for i in range(m) for j in range(n)]
+
+
+def is_consistent(board: SudokuBoard) -> bool:
+    for unit in units(board):
+        values = [board.get(square) for square in unit if board.get(square) != SudokuBoard.empty]
+        if len(values) != len(set(values)):
+            return False
+    return True
+
+
+def solve(board: SudokuBoard) -> bool:
+    """A simple backtracking solver, that fills board if it is solvable."""
+    for k, value in enumerate(board.squares):
+        if value == SudokuBoard.empty:
+            square = board.index2square(k)
+            for candidate in range(1, board.N + 1):
+                board.put(square, candidate)
+                if is_consistent(board) and solve(board):
+                    return True
+            board.put(square, SudokuBoard.empty)
+            return False
+    return True
+
+
+@pytest.mark.parametrize('m, n', [(2, 2), (2, 3), (3, 2), (3, 3)])
+def test_random_solution_is_a_sudoku(m, n):
+    board = random_solution(m, n, random.Random(m * 10 + n))
+    assert SudokuBoard.empty not in board.squares
+    assert is_consistent(board)
+
+
+@pytest.mark.parametrize('playmode', ['classic', 'rows', 'border', 'random'])
+def test_random_position_is_solvable_and_round_trips(playmode):
+    game_state = random_position(2, 3, 0.3, playmode, random.Random(7))
+    assert game_state.board.squares.count(SudokuBoard.empty) == 36 - round(0.3 * 36)
+    assert solve(game_state.board)
+    game_state = random_position(2, 3, 0.3, playmode, random.Random(7))
+    text = print_game_state(game_state)
+    assert print_game_state(parse_game_state(text, playmode)) == text
+    if playmode != 'classic':
+        occupied = list(game_state.occupied_squares1) + list(game_state.occupied_squares2)
+        filled = [game_state.board.index2square(k) for k, value in enumerate(game_state.board.squares) if value]
+        assert sorted(occupied) == filled
+
+
+def test_generate_positions_is_reproducible_and_distinct(tmp_path):
+    positions = [print_game_state(p) for p in generate_positions(2, 2, 5, (0.2, 0.4), 'rows', seed=3)]
+    assert len(set(positions)) == 5
+    assert positions == [print_game_state(p) for p in generate_positions(2, 2, 5, (0.2, 0.4), 'rows', seed=3)]
+    path = str(tmp_path / 'corpus.jsonl')
+    assert write_corpus(path, generate_positions(2, 2, 5, (0.2, 0.4), 'rows', seed=3), 'rows') == 5
+    assert [print_game_state(state) for _, state in read_corpus(path)] == positions
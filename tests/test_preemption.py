@@ -0,0 +1,56 @@
+import os
+import signal
+import threading
+import time
+
+from competitive_sudoku.preemption import PREEMPT_SIGNAL, run_preemptible
+from competitive_sudoku.sudoku import GameState
+from competitive_sudoku.sudokuai import SudokuAI
+
+
+class BroadExceptPlayer(SudokuAI):
+    """Searches until it is interrupted, and catches every exception of its search."""
+    def __init__(self):
+        super().__init__()
+        self.preempted = False
+
+    def compute_best_move(self, game_state: GameState) -> None:
+        while True:
+            try:
+                time.sleep(0.01)
+            except Exception:
+                pass
+
+    def on_preempt(self, game_state: GameState) -> None:
+        self.preempted = True
+
+
+class QuickPlayer(SudokuAI):
+    def compute_best_move(self, game_state: GameState) -> None:
+        pass
+
+
+def send_preempt_signal(delay: float) -> None:
+    threading.Timer(delay, os.kill, (os.getpid(), PREEMPT_SIGNAL)).start()
+
+
+def test_preempted_is_not_caught_by_except_exception():
+    player = BroadExceptPlayer()
+    previous = signal.getsignal(PREEMPT_SIGNAL)
+    send_preempt_signal(0.1)
+    try:
+        run_preemptible(player.compute_best_move, player, GameState())
+    finally:
+        signal.signal(PREEMPT_SIGNAL, previous)
+    assert player.preempted
+
+
+def test_signal_after_return_is_ignored():
+    player = QuickPlayer()
+    previous = signal.getsignal(PREEMPT_SIGNAL)
+    try:
+        run_preemptible(player.compute_best_move, player, GameState())
+        os.kill(os.getpid(), PREEMPT_SIGNAL)
+        time.sleep(0.05)
+    finally:
+        signal.signal(PREEMPT_SIGNAL, previous)
@@ -0,0 +1,41 @@
+import multiprocessing
+import os
+import signal
+import sys
+import time
+
+from competitive_sudoku.profiler import StackSampler, merge_profile, read_profile, write_profile
+
+
+def search() -> None:
+    while True:
+        sum(range(1000))
+
+
+def busy_until_terminated(path: str) -> None:
+    sampler = StackSampler(path)
+    sampler.start(sys._getframe())
+    search()
+
+
+def test_merge_adds_the_samples(tmp_path):
+    output_path = str(tmp_path / 'player.folded')
+    for _ in range(2):
+        samples_path = str(tmp_path / 'samples.folded')
+        write_profile(samples_path, {'a;b': 2, 'a': 1})
+        assert merge_profile(samples_path, output_path) == 3
+    assert read_profile(output_path) == {'a;b': 4, 'a': 2}
+    assert os.listdir(tmp_path) == ['player.folded']
+    assert merge_profile(str(tmp_path / 'missing.folded'), output_path) is None
+
+
+def test_terminated_process_writes_samples_and_keeps_its_exit_code(tmp_path):
+    multiprocessing.set_start_method('fork', force=True)
+    path = str(tmp_path / 'samples.folded')
+    process = multiprocessing.Process(target=busy_until_terminated, args=(path,))
+    process.start()
+    time.sleep(0.5)
+    process.terminate()
+    process.join(5)
+    assert process.exitcode == -signal.SIGTERM
+    assert any(stack.endswith(':search') for stack in read_profile(path))
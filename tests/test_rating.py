@@ -0,0 +1,86 @@
+import math
+
+import pytest
+
+from competitive_sudoku.rating import SPRT, estimate_elo, expected_score
+from play_tournament import format_crosstable, schedule_games
+
+
+def test_expected_score():
+    assert expected_score(0) == 0.5
+    assert math.isclose(expected_score(400), 10 / 11)
+    assert math.isclose(expected_score(-400), 1 / 11)
+
+
+def test_symmetric_match_gives_zero_elo():
+    games = [('a', 'b', 1.0), ('b', 'a', 1.0), ('a', 'b', 0.5), ('b', 'a', 0.5)]
+    ratings = estimate_elo(games)
+    assert math.isclose(ratings['a'][0], 0.0, abs_tol=1e-6)
+    assert math.isclose(ratings['b'][0], 0.0, abs_tol=1e-6)
+    assert ratings['a'][1] == ratings['b'][1] > 0
+
+
+def test_elo_difference_of_three_to_one_score():
+    # without virtual draws the maximum likelihood estimate of a 3-1 score is 400 * log10(3) Elo
+    games = [('a', 'b', 1.0), ('a', 'b', 1.0), ('b', 'a', 0.0), ('b', 'a', 1.0)]
+    ratings = estimate_elo(games, prior_draws=0)
+    assert math.isclose(ratings['a'][0] - ratings['b'][0], 400 * math.log10(3), rel_tol=1e-6)
+    assert math.isclose(ratings['a'][0] + ratings['b'][0], 0.0, abs_tol=1e-6)
+
+
+def test_perfect_score_has_finite_rating():
+    ratings = estimate_elo([('a', 'b', 1.0)] * 10)
+    assert math.isfinite(ratings['a'][0])
+    assert ratings['a'][0] > ratings['b'][0]
+
+
+def test_no_games():
+    assert estimate_elo([]) == {}
+
+
+def test_crosstable():
+    outcomes = [('a', 'b', 1.0), ('b', 'a', 0.0), ('a', 'c', 0.5), ('c', 'a', 0.5)]
+    lines = format_crosstable(['c', 'b', 'a'], outcomes).splitlines()
+    assert len(lines) == 4
+    # the players are ordered by rating, and a cell contains the points and games against the opponent
+    assert [line.split()[1] for line in lines[1:]] == ['a', 'c', 'b']
+    assert lines[1].split()[4:] == ['4', '75%', '*', '1/2', '2/2']
+    assert lines[3].split()[4:] == ['2', '0%', '0/2', '-', '*']
+
+
+def test_schedule_games():
+    games = schedule_games(['a', 'b', 'c'], ['board1', 'board2'], ['rows'], rounds=2)
+    assert len(games) == 3 * 2 * 2 * 2
+    assert [game.game_id for game in games] == list(range(1, len(games) + 1))
+    gauntlet = schedule_games(['a', 'b', 'c'], ['board1'], ['rows'], rounds=1, gauntlet='a')
+    assert {game.pairing for game in gauntlet} == {('a', 'b'), ('a', 'c')}
+
+
+def test_sprt_bounds():
+    sprt = SPRT(0, 10, alpha=0.05, beta=0.05)
+    assert math.isclose(sprt.lower_bound, math.log(0.05 / 0.95))
+    assert math.isclose(sprt.upper_bound, math.log(0.95 / 0.05))
+    with pytest.raises(ValueError):
+        SPRT(10, 0)
+
+
+def test_sprt_llr_is_zero_halfway_between_the_hypotheses():
+    sprt = SPRT(-20, 20)
+    assert math.isclose(sprt.llr(30, 40, 30), 0.0, abs_tol=1e-12)
+    assert sprt.status(30, 40, 30) is None
+
+
+def test_sprt_accepts_the_hypothesis_that_fits():
+    sprt = SPRT(0, 20)
+    assert sprt.llr(60, 20, 20) > 0 > sprt.llr(20, 20, 60)
+    assert sprt.status(60, 20, 20) == 'H1'
+    assert sprt.status(20, 20, 60) == 'H0'
+    # an equal score supports elo = 0 over elo = 20
+    assert sprt.status(1000, 500, 1000) == 'H0'
+
+
+def test_sprt_first_games():
+    # results without a win, draw or loss must not give a zero variance
+    sprt = SPRT(0, 20)
+    assert math.isfinite(sprt.llr(1, 0, 0))
+    assert sprt.status(0, 0, 0) is None
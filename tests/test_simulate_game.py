@@ -0,0 +1,146 @@
+import multiprocessing
+import os
+import time
+
+import pytest
+
+import simulate_game
+from competitive_sudoku.records import GameRecorder, RecordCollector
+from competitive_sudoku.sudoku import GameState, Move, SudokuBoard, allowed_squares
+from competitive_sudoku.sudokuai import SudokuAI
+from tests.parallel_games import analyze_game_records
+
+BOARDS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'boards')
+
+
+class FirstSquarePlayer(SudokuAI):
+    """Plays the value 1 on the first square where it is allowed to play."""
+    def compute_best_move(self, game_state: GameState) -> None:
+        self.propose_move(Move(game_state.player_squares()[0], 1))
+
+
+class ReportingPlayer(FirstSquarePlayer):
+    """Reports the statistics of a search after proposing its move."""
+    def compute_best_move(self, game_state: GameState) -> None:
+        super().compute_best_move(game_state)
+        self.report(nodes=1234, depth=3)
+
+
+@pytest.fixture(autouse=True)
+def stand_in_oracle(monkeypatch):
+    """Replaces the sudoku solver by an oracle that accepts every move with a reward of 1."""
+    multiprocessing.set_start_method('fork', force=True)
+    monkeypatch.setattr(simulate_game, 'solve_sudoku', lambda *args: 'The score is 1')
+
+
+def new_game_state() -> GameState:
+    allowed_squares1, allowed_squares2 = allowed_squares(SudokuBoard(2, 2), 'rows')
+    return GameState(allowed_squares1=allowed_squares1, allowed_squares2=allowed_squares2,
+                     occupied_squares1=[], occupied_squares2=[])
+
+
+def play(**kwargs):
+    collector = RecordCollector()
+    result = simulate_game.simulate_game(new_game_state(), FirstSquarePlayer(), FirstSquarePlayer(),
+                                         calculation_time=0.05, verbose=False, recorder=collector, **kwargs)
+    return result, collector.records
+
+
+def test_game_is_recorded():
+    result, records = play()
+    moves = [record for record in records if record['type'] == 'move']
+    assert len(moves) == 16
+    assert records[-1]['reason'] == 'finished'
+    assert result == (0.5, 0.5)
+
+
+def test_recording_does_not_meter_the_players():
+    _, records = play()
+    assert all('metrics' not in record for record in records if record['type'] == 'move')
+    measured = []
+    _, records = play(metrics=measured.append)
+    assert len(measured) == 16
+    assert all('metrics' in record for record in records if record['type'] == 'move')
+
+
+def test_parallel_games_summarize_the_recorded_metrics(tmp_path):
+    records_file = str(tmp_path / 'game.records.jsonl')
+    recorder = GameRecorder(records_file)
+    # the games of parallel_games.py are played with --metrics, which passes print as the metrics callback
+    simulate_game.simulate_game(new_game_state(), FirstSquarePlayer(), FirstSquarePlayer(), calculation_time=0.05,
+                                verbose=False, recorder=recorder, metrics=lambda turn_metrics: None)
+    recorder.close()
+    result = analyze_game_records(1, records_file, 'first', 'second')
+    assert result['status'] == 'Completed'
+    for player in ['first', 'second']:
+        summary = result['metrics'][player]
+        assert summary['turns'] == 8
+        assert summary['overhead'] > 0
+        assert summary['peak_rss'] is not None
+
+
+def test_quiet_game_reports_why_it_ended():
+    config = simulate_game.GameConfig('naive_player', 'naive_player', os.path.join(BOARDS, 'empty-2x2.txt'), 'rows', 0.05)
+    try:
+        records = simulate_game.run_game_config(config)
+    finally:
+        simulate_game.close_sessions()
+    assert records[-1]['type'] == 'game-end'
+    assert records[-1]['output'].endswith(('Player 1 wins the game.\n', 'The game ends in a draw.\n',
+                                           'Player 2 wins the game.\n'))
+
+
+class SlowPreparePlayer(FirstSquarePlayer):
+    """Takes too long to prepare, and catches every exception while doing so."""
+    def prepare(self, game_state: GameState) -> None:
+        while True:
+            try:
+                time.sleep(0.01)
+            except Exception:
+                pass
+
+
+def test_prepare_is_interrupted_after_the_time_limit(monkeypatch):
+    monkeypatch.setattr(simulate_game, 'PREPARE_TIME_LIMIT', 0.2)
+    collector = RecordCollector()
+    result = simulate_game.simulate_game(new_game_state(), SlowPreparePlayer(), FirstSquarePlayer(),
+                                         calculation_time=0.05, verbose=False, recorder=collector)
+    assert result == (0.5, 0.5)
+
+
+class MeddlingPreparePlayer(FirstSquarePlayer):
+    """Changes the game state that it gets in prepare."""
+    def prepare(self, game_state: GameState) -> None:
+        square = game_state.player_squares()[0]
+        game_state.board.put(square, 2)
+        game_state.moves.append(Move(square, 2))
+        game_state.occupied_squares().append(square)
+        game_state.scores[0] = 100
+
+
+def test_prepare_cannot_change_the_game():
+    game_state = new_game_state()
+    result = simulate_game.simulate_game(game_state, MeddlingPreparePlayer(), FirstSquarePlayer(),
+                                         calculation_time=0.05, verbose=False)
+    assert result == (0.5, 0.5)
+    assert game_state.scores == [8, 8]
+    assert len(game_state.moves) == 16
+
+
+def test_warm_up_is_skipped_with_fork(capsys):
+    play(warmup=True)
+    assert 'skipped warm-up' in capsys.readouterr().out
+
+
+def test_reported_search_statistics_are_logged_and_recorded(capsys):
+    collector = RecordCollector()
+    simulate_game.simulate_game(new_game_state(), ReportingPlayer(), FirstSquarePlayer(), calculation_time=0.05,
+                                verbose=True, recorder=collector, metrics=lambda turn_metrics: None)
+    moves = [record for record in collector.records if record['type'] == 'move']
+    for record in moves:
+        search = record['metrics']['search']
+        if record['player'] == 1:
+            assert search['nodes'] == 1234 and search['depth'] == 3
+        else:
+            assert search is None
+    assert capsys.readouterr().out.count('Search: depth 3 nodes 1234') == 8
@@ -0,0 +1,160 @@
+import copy
+import pickle
+
+import pytest
+
+from competitive_sudoku.sudoku import GameState, Move, MoveHistory, SquareView, SudokuBoard, TabooMove, \
+    allowed_squares, parse_game_state, print_game_state
+
+
+def history() -> MoveHistory:
+    return MoveHistory([Move((0, 1), 2), TabooMove((1, 2), 3), Move((3, 0), 4)])
+
+
+def test_indexing_and_slicing():
+    moves = history()
+    assert len(moves) == 3
+    assert moves[0] == Move((0, 1), 2)
+    assert isinstance(moves[1], TabooMove)
+    assert moves[-1] == Move((3, 0), 4)
+    assert moves[-3] == moves[0]
+    with pytest.raises(IndexError):
+        moves[3]
+    with pytest.raises(IndexError):
+        moves[-4]
+    assert isinstance(moves[1:], MoveHistory)
+    assert list(moves[1:]) == [TabooMove((1, 2), 3), Move((3, 0), 4)]
+    assert list(moves[::-2]) == [Move((3, 0), 4), Move((0, 1), 2)]
+    assert isinstance(moves[1:][0], TabooMove)
+
+
+def test_changes():
+    moves = history()
+    list(moves)  # the elements are created, and must follow the changes below
+    moves.insert(0, Move((2, 2), 1))
+    moves.insert(-1, TabooMove((3, 3), 1))
+    moves.insert(100, Move((0, 0), 1))
+    assert [move.square for move in moves] == [(2, 2), (0, 1), (1, 2), (3, 3), (3, 0), (0, 0)]
+    moves[-1] = TabooMove((0, 0), 2)
+    assert isinstance(moves[-1], TabooMove)
+    del moves[1:3]
+    assert moves.pop() == Move((0, 0), 2)
+    moves.append(Move((1, 1), 1))
+    assert [move.square for move in moves] == [(2, 2), (3, 3), (3, 0), (1, 1)]
+    moves.clear()
+    assert list(moves) == []
+
+
+def test_appended_move_is_copied():
+    moves = MoveHistory()
+    move = Move((0, 0), 1)
+    moves.append(move)
+    move.value = 2
+    assert moves[0].value == 1
+
+
+def test_membership_ignores_the_taboo_flag():
+    moves = history()
+    assert Move((1, 2), 3) in moves
+    assert TabooMove((0, 1), 2) in moves
+    assert Move((1, 2), 4) not in moves
+    assert 'move' not in moves
+
+
+def test_copies_are_independent():
+    moves = history()
+    for copied in (copy.copy(moves), copy.deepcopy(moves), pickle.loads(pickle.dumps(moves)), moves.copy()):
+        assert copied == moves
+        assert [type(move) for move in copied] == [Move, TabooMove, Move]
+        copied.append(Move((2, 0), 1))
+        assert len(moves) == 3
+
+
+def test_game_state_stores_moves_in_histories():
+    game_state = GameState(moves=[Move((0, 0), 1)], taboo_moves=[TabooMove((0, 1), 1)])
+    assert isinstance(game_state.moves, MoveHistory)
+    assert isinstance(game_state.taboo_moves, MoveHistory)
+    game_state.moves = [Move((0, 0), 1), Move((1, 1), 2)]
+    game_state.taboo_moves = []
+    assert isinstance(game_state.moves, MoveHistory)
+    assert isinstance(game_state.taboo_moves, MoveHistory)
+    copied = copy.deepcopy(game_state)
+    copied.moves.append(Move((2, 2), 3))
+    assert len(game_state.moves) == 2
+
+
+def square_game_state(playmode: str) -> GameState:
+    board = SudokuBoard(2, 2)
+    for square, value in (((0, 1), 1), ((3, 2), 1), ((3, 0), 2)):
+        board.put(square, value)
+    allowed_squares1, allowed_squares2 = allowed_squares(board, playmode)
+    return GameState(board=board, allowed_squares1=allowed_squares1, allowed_squares2=allowed_squares2,
+                     occupied_squares1=[(0, 1)], occupied_squares2=[(3, 2), (3, 0)])
+
+
+def test_square_views_keep_count_and_insertion_order():
+    game_state = square_game_state('rows')
+    view = game_state.occupied_squares2
+    assert isinstance(view, SquareView)
+    assert len(view) == 2
+    assert list(view) == [(3, 2), (3, 0)]
+    assert view[0] == (3, 2) and view[-1] == (3, 0)
+    view.append((1, 1))
+    view.add((1, 1))
+    assert len(view) == 3
+    assert view[-1] == (1, 1)
+    view.remove((3, 0))
+    view.discard((3, 0))
+    assert list(view) == [(3, 2), (1, 1)] and len(view) == 2
+    assert game_state.owner((3, 2)) == 2 and game_state.owner((3, 0)) == 0
+    with pytest.raises(ValueError):
+        view.remove((3, 0))
+    view.clear()
+    assert len(view) == 0 and list(view) == []
+    assert len(game_state.occupied_squares1) == 1
+
+
+def test_square_views_of_copies_are_tied_to_the_copied_arrays():
+    game_state = square_game_state('rows')
+    for copied in (copy.deepcopy(game_state), pickle.loads(pickle.dumps(game_state))):
+        assert copied.occupied_squares1 == [(0, 1)]
+        copied.occupied_squares1.append((0, 2))
+        assert copied.owner((0, 2)) == 1
+        assert copied.occupied_squares1.cells is copied.owners
+        assert copied.allowed_squares2.cells is copied.allowed
+        assert len(copied.occupied_squares1) == 2
+        assert game_state.owner((0, 2)) == 0
+        assert len(game_state.occupied_squares1) == 1
+
+
+@pytest.mark.parametrize('playmode', ['border', 'random'])
+def test_overlapping_allowed_squares(playmode):
+    game_state = square_game_state(playmode)
+    # both players are allowed to play on (0, 0)
+    game_state.allowed_squares1 = list(game_state.allowed_squares1) + [(0, 0)]
+    game_state.allowed_squares2 = list(game_state.allowed_squares2) + [(0, 0)]
+    assert (0, 0) in game_state.allowed_squares1 and (0, 0) in game_state.allowed_squares2
+    assert game_state.allowed[0] == 3
+    count = len(game_state.allowed_squares2)
+    game_state.allowed_squares1 = [(0, 0)]
+    assert list(game_state.allowed_squares1) == [(0, 0)]
+    assert len(game_state.allowed_squares2) == count and (0, 0) in game_state.allowed_squares2
+    text = print_game_state(game_state)
+    parsed = parse_game_state(text, playmode)
+    assert parsed.allowed_squares1 == game_state.allowed_squares1
+    assert parsed.allowed_squares2 == game_state.allowed_squares2
+    # the occupied squares are parsed from the board, so they are in board order
+    assert parsed.occupied_squares2 == game_state.occupied_squares2
+    assert list(parsed.occupied_squares2) == [(3, 0), (3, 2)]
+
+
+def test_square_views_taken_before_an_assignment_keep_their_squares():
+    game_state = square_game_state('rows')
+    view = game_state.occupied_squares2
+    game_state.occupied_squares2 = [(1, 1)]
+    assert list(view) == [(3, 2), (3, 0)] and (3, 0) in view and (1, 1) not in view
+    assert game_state.owner((3, 0)) == 0 and game_state.owner((1, 1)) == 2
+    # changing the old view no longer changes the game state
+    view.add((2, 2))
+    assert game_state.owner((2, 2)) == 0
+    assert list(game_state.occupied_squares2) == [(1, 1)]
@@ -0,0 +1,97 @@
+import math
+
+import pytest
+
+from competitive_sudoku import sudokuai
+from competitive_sudoku.sudokuai import SearchBudget, SudokuAI
+
+
+def new_player(tmp_path, monkeypatch) -> SudokuAI:
+    monkeypatch.chdir(tmp_path)
+    player = SudokuAI()
+    player.player_number = 1
+    return player
+
+
+def test_saving_a_loaded_buffer_writes_it_back(tmp_path, monkeypatch):
+    player = new_player(tmp_path, monkeypatch)
+    player.save_bytes(b'abcd', 'table')
+    data = player.load_bytes('table')
+    data[0:1] = b'x'
+    player.save_bytes(data, 'table')
+    assert (tmp_path / '1-table.bin').read_bytes() == b'xbcd'
+
+
+def test_saving_other_data_keeps_a_loaded_buffer_valid(tmp_path, monkeypatch):
+    player = new_player(tmp_path, monkeypatch)
+    player.save_bytes(b'a' * 100000, 'table')
+    data = player.load_bytes('table')
+    player.save_bytes(b'b', 'table')
+    # the old buffer keeps its contents instead of pointing into a truncated file
+    assert data[-1] == ord('a')
+    assert bytes(player.load_bytes('table')) == b'b'
+    assert [path.name for path in tmp_path.iterdir()] == ['1-table.bin']
+
+
+class FakeClock(object):
+    """Replaces time.monotonic by a clock that only moves when it is advanced."""
+    def __init__(self, now: float = 100.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeClock:
+    clock = FakeClock()
+    monkeypatch.setattr(sudokuai.time, 'monotonic', clock)
+    return clock
+
+
+def test_allocate_uses_a_share_of_the_remaining_time_plus_the_increment(clock):
+    budget = SearchBudget(clock.now + 60.0, 60.0, 2.0)
+    budget.allocate(20)
+    assert budget.deadline == pytest.approx(clock.now + 60.0 / 20 + 2.0)
+    assert budget.time_left() == pytest.approx(5.0)
+    clock.advance(1.0)
+    assert budget.time_left() == pytest.approx(4.0)
+
+
+def test_allocate_does_not_go_past_the_deadline_or_the_remaining_time(clock):
+    budget = SearchBudget(clock.now + 1.0, 60.0, 2.0)
+    budget.allocate(20)
+    assert budget.deadline == pytest.approx(clock.now + 1.0)
+    budget = SearchBudget(None, 3.0, 5.0)
+    budget.allocate(1)
+    assert budget.deadline == pytest.approx(clock.now + 3.0)
+
+
+def test_without_a_clock_allocate_keeps_the_deadline(clock):
+    budget = SearchBudget(clock.now + 0.5)
+    budget.allocate(20)
+    assert budget.deadline == clock.now + 0.5
+    budget = SearchBudget()
+    budget.allocate(20)
+    assert budget.deadline is None
+    assert budget.time_left() == math.inf
+    assert budget.should_start_iteration()
+
+
+def test_next_iteration_is_estimated_from_the_growth_of_the_last_one(clock):
+    budget = SearchBudget(clock.now + 10.0)
+    assert budget.next_iteration_time() == 0.0
+    assert budget.should_start_iteration()
+    for seconds in [0.5, 1.5]:
+        budget.start_iteration()
+        clock.advance(seconds)
+        budget.finish_iteration()
+    # the last iteration took three times as long as the one before it
+    assert budget.next_iteration_time() == pytest.approx(4.5)
+    assert budget.should_start_iteration()
+    clock.advance(4.0)
+    assert not budget.should_start_iteration()
+    assert budget.should_continue(3.5)
@@ -0,0 +1,33 @@
+import pytest
+
+from competitive_sudoku.sudokuai import SudokuAI
+from competitive_sudoku.telemetry import Telemetry, format_telemetry
+
+
+def test_reported_values_are_kept_until_reset():
+    telemetry = Telemetry(['movegen'])
+    assert telemetry.snapshot(1.0) is None
+    telemetry.report({'nodes': 100, 'depth': 2, 'tt_probes': 10, 'tt_hits': 4})
+    # values that are None are not changed
+    telemetry.report({'nodes': 500, 'depth': None, 'movegen': 0.25})
+    assert telemetry.snapshot(2.0) == {'nodes': 500, 'depth': 2, 'tt_probes': 10, 'tt_hits': 4, 'nps': 250,
+                                       'tt_hit_rate': 0.4, 'phases': {'movegen': 0.25}}
+    telemetry.reset()
+    assert telemetry.snapshot(2.0) is None
+
+
+def test_unknown_fields_are_rejected():
+    telemetry = Telemetry()
+    with pytest.raises(ValueError):
+        telemetry.report({'movegen': 0.25})
+
+
+def test_player_reports_to_its_telemetry():
+    player = SudokuAI()
+    player.report(nodes=10)  # without telemetry the report is ignored
+    player.telemetry = Telemetry()
+    player.report(nodes=10, depth=1)
+    values = player.telemetry.snapshot()
+    assert values['nodes'] == 10 and values['depth'] == 1
+    assert values['nps'] is None and values['tt_hit_rate'] is None
+    assert format_telemetry(values) == 'depth 1 nodes 10'